@@ -0,0 +1,136 @@
+"""
+Admission Control
+Limits how many requests parse and score documents at once, with a
+bounded wait queue, and sheds the excess instead of letting it pile up
+"""
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from .metrics import ADMISSION_ACTIVE, ADMISSION_QUEUED, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTIONS
+
+
+class Overloaded(Exception):
+    """No admission slot is available; the client should retry later"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """A place in an AdmissionController's wait queue, see reserve()"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.reserved_at = time.monotonic()
+        self.pending = True  # still counted as queued
+
+    def cancel(self):
+        """Leave the queue if slot() has not taken the reservation yet"""
+        with self.controller._condition:
+            self.controller._dequeue(self)
+
+
+class AdmissionController:
+    """
+    Counting semaphore with a bounded, time-limited wait queue
+
+    At most `limit` requests hold a slot. Up to `queue_size` more wait for
+    one, each for at most `timeout` seconds. A request that finds the queue
+    full, or whose wait times out, gets Overloaded at once, so the server
+    answers 503 rather than stalling every worker behind a spike.
+
+    Usage:
+        with PARSE_ADMISSION.slot():
+            parse and score
+
+    Async views reserve their place in the event loop, before handing the
+    work to a thread, pass the reservation to slot() in that thread and
+    cancel it when they finish, in case the thread never ran.
+    """
+
+    def __init__(self, stage, limit, queue_size, timeout, retry_after):
+        self.stage = stage
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._active = 0
+        self._queued = 0
+        self._condition = threading.Condition()
+        self._publish()
+
+    def reserve(self):
+        """
+        Join the wait queue without blocking
+
+        Returns:
+            Reservation to pass to slot()
+
+        Raises:
+            Overloaded: Every slot is taken and the queue is full
+        """
+        with self._condition:
+            if self._active + self._queued >= self.limit + self.queue_size:
+                ADMISSION_REJECTIONS.inc(self.stage, 'queue_full')
+                raise Overloaded('Server is busy, please retry later', self.retry_after)
+            self._queued += 1
+            self._publish()
+            return Reservation(self)
+
+    @contextmanager
+    def slot(self, reservation=None):
+        """
+        Hold an admission slot for the duration of the block
+
+        Args:
+            reservation: Result of reserve(), or None to reserve now
+
+        Raises:
+            Overloaded: The queue is full or the wait timed out
+        """
+        if reservation is None:
+            reservation = self.reserve()
+        deadline = reservation.reserved_at + self.timeout
+        with self._condition:
+            admitted = self._condition.wait_for(
+                lambda: self._active < self.limit,
+                timeout=max(deadline - time.monotonic(), 0)
+            )
+            self._dequeue(reservation)
+            if admitted:
+                self._active += 1
+                self._publish()
+        if not admitted:
+            ADMISSION_REJECTIONS.inc(self.stage, 'timeout')
+            raise Overloaded('Server is busy, please retry later', self.retry_after)
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - reservation.reserved_at, self.stage)
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._publish()
+                self._condition.notify()
+
+    def _dequeue(self, reservation):
+        # Caller holds the condition
+        if reservation.pending:
+            reservation.pending = False
+            self._queued -= 1
+            self._publish()
+
+    def _publish(self):
+        ADMISSION_ACTIVE.set(self._active, self.stage)
+        ADMISSION_QUEUED.set(self._queued, self.stage)
+
+
+PARSE_ADMISSION = AdmissionController(
+    'parse',
+    limit=settings.CV_PARSE_CONCURRENCY,
+    queue_size=settings.CV_PARSE_QUEUE_SIZE,
+    timeout=settings.CV_PARSE_QUEUE_TIMEOUT,
+    retry_after=settings.CV_PARSE_RETRY_AFTER
+)
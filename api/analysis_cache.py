@@ -0,0 +1,81 @@
+"""
+Analysis Response Cache
+Keeps the serialized payloads of finished analyses in memory so repeated
+reads of GET /api/analysis/<id>/ skip the database
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+class AnalysisCache:
+    """
+    Bounded LRU of serialized analyses, one per process
+
+    Only finished analyses are cached, under the ETag of the row as it was
+    read (its id and its own scorer version). Their content changes only
+    when they are re-scored, usually by another process, so an entry is
+    dropped after `ttl` seconds: re-scored analyses then get their new
+    ETag and deleted ones stop being served. Analyses still on an older
+    scorer version are cached like any other.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # analysis id -> (stored at, ETag, payload)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag(analysis):
+        """Return the strong ETag of an analysis: its id and scorer version"""
+        return f'"{analysis.id.hex}-{analysis.scorer_version}"'
+
+    def get(self, analysis_id):
+        """
+        Return the cached (ETag, payload) of an analysis, or None
+
+        Args:
+            analysis_id: UUID of the analysis
+        """
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry is None:
+                return None
+            stored_at, etag, payload = entry
+            if time.monotonic() - stored_at >= self.ttl:
+                del self._entries[analysis_id]
+                return None
+            self._entries.move_to_end(analysis_id)
+            return etag, payload
+
+    def put(self, analysis, payload):
+        """
+        Cache the serialized payload of a finished analysis
+
+        Returns:
+            The analysis's ETag
+        """
+        etag = AnalysisCache.etag(analysis)
+        with self._lock:
+            self._entries[analysis.id] = (time.monotonic(), etag, payload)
+            self._entries.move_to_end(analysis.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def discard(self, analysis_id):
+        """Drop an analysis from the cache"""
+        with self._lock:
+            self._entries.pop(analysis_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+ANALYSIS_CACHE = AnalysisCache(
+    max_entries=settings.CV_ANALYSIS_CACHE_SIZE,
+    ttl=settings.CV_ANALYSIS_CACHE_TTL
+)
@@ -0,0 +1,219 @@
+"""
+Async Views
+ASGI versions of the upload and retrieval endpoints
+
+A request waits on the event loop, not on a thread, while its body
+arrives and while its document is analyzed. Parsing and scoring run on a
+bounded thread pool (CV_ASYNC_ANALYSIS_WORKERS), so one ASGI worker can
+hold many slow uploads open while a fixed number of documents are
+analyzed at a time; admission control (api/admission.py) sheds requests
+beyond its wait queue. Enabled in api/urls.py with CV_ASYNC_VIEWS.
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, HttpResponseNotModified
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from .models import CVUpload, ATSAnalysis
+from .serializers import ATSAnalysisSerializer
+from .ats_scorer import ATSScorer
+from .services import store_upload, find_cached_analysis, create_analysis, parse_upload
+from .parse_sandbox import ParseLimitExceeded
+from .admission import PARSE_ADMISSION, Overloaded
+from .analysis_cache import ANALYSIS_CACHE
+from .jobs import enqueue_analysis
+from .group_commit import acommit
+from .metrics import (
+    StageTimer, UPLOADS, UPLOAD_ERRORS, CACHE_HITS, PARSE_PEAK_MEMORY, ANALYSIS_READS,
+)
+from .views import _validate_upload, _known_etags, _cacheable, _wants_async
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_analysis_executor():
+    """Return the thread pool that runs blocking analysis work, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CV_ASYNC_ANALYSIS_WORKERS,
+                thread_name_prefix='cv-analysis'
+            )
+        return _executor
+
+
+async def run_blocking(func, *args):
+    """Run blocking, database-free analysis work on the analysis thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(get_analysis_executor(), func, *args)
+
+
+def analyze_file(file, file_type, timer, reservation):
+    """
+    Parse and score an upload (runs on the analysis thread pool)
+
+    Args:
+        reservation: PARSE_ADMISSION.reserve() result taken by the view
+
+    Returns:
+        (ParseResult, analysis_results, feature_fields) tuple
+
+    Raises:
+        Overloaded: No parse slot became free in time
+    """
+    with PARSE_ADMISSION.slot(reservation):
+        with timer.stage('parse'):
+            parse_result = parse_upload(file, file_type)
+        with timer.stage('score_init'):
+            scorer = ATSScorer(parse_result.text)
+        analysis_results = scorer.calculate_overall_score(timer=timer)
+    return parse_result, analysis_results, ATSScorer.feature_fields(scorer.document)
+
+
+def _build_upload(uploaded_file, stored_name, content_hash):
+    # Unsaved: written with its analysis, in one transaction
+    return CVUpload(
+        file=stored_name,
+        filename=uploaded_file.name,
+        file_type=os.path.splitext(uploaded_file.name)[1].lower()[1:],
+        content_hash=content_hash
+    )
+
+
+def _json(data, status):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, safe=False)
+
+
+@csrf_exempt
+@require_POST
+async def upload_and_analyze_cv(request):
+    """
+    Async version of views.upload_and_analyze_cv
+
+    POST /api/upload-cv/
+    """
+    timer = StageTimer()
+
+    if 'file' not in request.FILES:
+        UPLOAD_ERRORS.inc('invalid')
+        return timer.apply(_json({'error': 'No file provided'}, status=400))
+
+    uploaded_file = request.FILES['file']
+    filename = uploaded_file.name
+    file_type = os.path.splitext(filename)[1].lower()[1:]
+
+    validation_error = _validate_upload(uploaded_file)
+    if validation_error:
+        UPLOAD_ERRORS.inc('invalid')
+        return timer.apply(_json({'error': validation_error}, status=400))
+
+    UPLOADS.inc(file_type)
+
+    try:
+        # Store the file (once per distinct content), hashing it on the way;
+        # not on the analysis pool, so it never queues behind parses
+        with timer.stage('store'):
+            stored_name, content_hash = await sync_to_async(store_upload, thread_sensitive=False)(
+                uploaded_file
+            )
+
+        # Identical content already scored by this scorer version
+        with timer.stage('cache_lookup'):
+            cached_analysis = await sync_to_async(find_cached_analysis)(content_hash)
+        if cached_analysis is not None:
+            CACHE_HITS.inc()
+            with timer.stage('serialize'):
+                data = ATSAnalysisSerializer(cached_analysis).data
+            return timer.apply(_json(data, status=200))
+
+        cv_upload = _build_upload(uploaded_file, stored_name, content_hash)
+        if _wants_async(request):
+            with timer.stage('enqueue'):
+                analysis = await acommit(enqueue_analysis, cv_upload)
+            return timer.apply(_json({'id': analysis.id, 'status': analysis.status}, status=202))
+
+        # Analyze before creating any row, so a shed request leaves none
+        reservation = PARSE_ADMISSION.reserve()
+        try:
+            parse_result, analysis_results, feature_fields = await run_blocking(
+                analyze_file, uploaded_file, file_type, timer, reservation
+            )
+        finally:
+            reservation.cancel()
+        extracted_text = parse_result.text
+        if parse_result.peak_memory is not None:
+            PARSE_PEAK_MEMORY.observe(parse_result.peak_memory)
+        logger.info(
+            "Parsed %s: %s pages, %d chars, truncated=%s, peak memory %s bytes",
+            filename, parse_result.pages, len(extracted_text),
+            parse_result.truncated, parse_result.peak_memory
+        )
+
+        # One transaction for the upload, the analysis, its inputs and the
+        # search index (group-committed if enabled)
+        with timer.stage('save_analysis'):
+            analysis = await acommit(
+                create_analysis, cv_upload, extracted_text, analysis_results, feature_fields
+            )
+
+        with timer.stage('serialize'):
+            data = ATSAnalysisSerializer(analysis).data
+        return timer.apply(_json(data, status=201))
+
+    except Overloaded as e:
+        UPLOAD_ERRORS.inc('overloaded')
+        response = _json({'error': str(e)}, status=503)
+        response['Retry-After'] = str(e.retry_after)
+        return timer.apply(response)
+    except ParseLimitExceeded as e:
+        UPLOAD_ERRORS.inc('parse_limit')
+        return timer.apply(_json({'error': str(e)}, status=422))
+    except ValueError as e:
+        UPLOAD_ERRORS.inc('invalid')
+        return timer.apply(_json({'error': str(e)}, status=400))
+    except Exception as e:
+        UPLOAD_ERRORS.inc('internal')
+        return timer.apply(_json({'error': f'Error processing CV: {str(e)}'}, status=500))
+
+
+@require_GET
+async def get_analysis(request, analysis_id):
+    """
+    Async version of views.get_analysis
+
+    GET /api/analysis/<id>/
+    """
+    known_etags = _known_etags(request)
+    cached = ANALYSIS_CACHE.get(analysis_id)
+    if cached is not None:
+        etag, payload = cached
+        if etag in known_etags or '*' in known_etags:
+            ANALYSIS_READS.inc('not_modified')
+            return _cacheable(HttpResponseNotModified(), etag)
+        ANALYSIS_READS.inc('cache')
+        return _cacheable(_json(payload, status=200), etag)
+
+    try:
+        analysis = await ATSAnalysis.objects.select_related('cv_upload').aget(id=analysis_id)
+    except ATSAnalysis.DoesNotExist:
+        return _json({'error': 'Analysis not found'}, status=404)
+    ANALYSIS_READS.inc('database')
+    if analysis.status != ATSAnalysis.STATUS_DONE:
+        response = _json(ATSAnalysisSerializer(analysis).data, status=200)
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    payload = ATSAnalysisSerializer(analysis).data
+    etag = ANALYSIS_CACHE.put(analysis, payload)
+    if etag in known_etags or '*' in known_etags:
+        return _cacheable(HttpResponseNotModified(), etag)
+    return _cacheable(_json(payload, status=200), etag)
@@ -2,56 +2,79 @@
 ATS Scoring Engine
 Analyzes CVs and provides ATS compatibility scores
 """
-import re
-from .cv_parser import CVParser
+from .cv_document import CVDocument, CVFeatureSet
+from .metrics import NULL_TIMER
+from .taxonomy import get_keyword_matcher
 
 
 class ATSScorer:
-    """Service to calculate ATS scores for CVs"""
-    
-    # Common keywords for different industries/roles
-    COMMON_SKILLS = [
-        'python', 'java', 'javascript', 'react', 'angular', 'vue', 'node',
-        'django', 'flask', 'spring', 'sql', 'mongodb', 'aws', 'azure', 'gcp',
-        'docker', 'kubernetes', 'ci/cd', 'git', 'agile', 'scrum', 'project management',
-        'communication', 'leadership', 'teamwork', 'problem solving', 'analytical',
-        'machine learning', 'data analysis', 'ai', 'deep learning', 'tensorflow',
-        'development', 'design', 'testing', 'qa', 'devops', 'security'
-    ]
-    
-    EDUCATION_KEYWORDS = [
-        'bachelor', 'master', 'phd', 'degree', 'diploma', 'bsc', 'msc',
-        'university', 'college', 'institute', 'certification', 'certified'
-    ]
+    """
+    Service to calculate ATS scores for CVs
+
+    Keyword vocabularies ('skills', 'education', 'action_verbs',
+    'technical_skills') come from the taxonomy file, see api/taxonomy.py
+    """
     
-    ACTION_VERBS = [
-        'developed', 'designed', 'implemented', 'created', 'built', 'managed',
-        'led', 'improved', 'increased', 'reduced', 'achieved', 'delivered',
-        'established', 'optimized', 'streamlined', 'coordinated', 'executed'
-    ]
+    # Bump whenever scoring rules or text extraction change so that
+    # analyses cached by content hash are not served stale (vocabulary
+    # changes are covered by the taxonomy version, see scorer_version())
+    VERSION = '3'
     
     def __init__(self, text):
         """
         Initialize scorer with extracted CV text
         
         Args:
-            text: Extracted text from CV
+            text: Extracted text from CV, a CVDocument built by
+                ATSScorer.build_document(), or a CVFeatureSet
         """
-        self.text = text
-        self.text_lower = text.lower()
-        self.sections = CVParser.extract_sections(text)
-        self.email = CVParser.extract_email(text)
-        self.phone = CVParser.extract_phone(text)
-        
+        if isinstance(text, str):
+            text = ATSScorer.build_document(text)
+        self.document = text
+        self.text = text.text
+        self.text_lower = text.text_lower
+        self.matches = text.matches
+        self.sections = text.sections
+        self.email = text.email
+        self.phone = text.phone
+    
+    @staticmethod
+    def scorer_version():
+        """
+        Return the version stored with analyses: the scoring rules VERSION
+        combined with the version of the loaded taxonomy
+        """
+        return f"{ATSScorer.VERSION}.{get_keyword_matcher().version}"
+    
+    @staticmethod
+    def build_document(text):
+        """Build the CVDocument the scorer consumes for extracted text"""
+        return CVDocument(text, get_keyword_matcher())
+    
+    @staticmethod
+    def feature_fields(document):
+        """Return CVFeatures field values for a CVDocument"""
+        return CVFeatureSet.record_fields(document, document.matcher)
+    
+    @staticmethod
+    def features_current(record):
+        """Return True if a CVFeatures record matches the current vocabularies"""
+        return record.vocabulary_version == get_keyword_matcher().version
+    
+    @staticmethod
+    def from_features(record):
+        """
+        Build a scorer from a stored CVFeatures record
+        (check features_current() first)
+        """
+        return ATSScorer(CVFeatureSet.from_record(record, get_keyword_matcher()))
+    
     def score_keywords(self):
         """
         Score based on keyword optimization (25%)
         Returns: (score 0-100, feedback list)
         """
-        found_skills = []
-        for skill in self.COMMON_SKILLS:
-            if skill in self.text_lower:
-                found_skills.append(skill)
+        found_skills = self.matches.terms('skills')
         
         # Calculate score based on number of skills found
         skill_count = len(found_skills)
@@ -69,7 +92,12 @@ class ATSScorer:
         feedback = {
             'score': score,
             'found_skills': found_skills[:10],  # Top 10
-            'skill_count': skill_count
+            'skill_count': skill_count,
+            # Skills recognized despite a typo, e.g. "kubernets"
+            'fuzzy_matches': [
+                {'skill': skill, 'matched': matched, 'distance': distance}
+                for skill, matched, distance in self.matches.fuzzy_terms('skills')
+            ],
         }
         
         return score, feedback
@@ -96,8 +124,7 @@ class ATSScorer:
             issues.append("Missing key sections")
         
         # Check for bullet points or lists (look for common bullet characters)
-        bullet_pattern = r'[•●○■□▪▫–—-]\s'
-        bullet_count = len(re.findall(bullet_pattern, self.text))
+        bullet_count = self.document.bullet_count
         if bullet_count >= 10:
             score += 25
             strengths.append("Good use of bullet points")
@@ -107,7 +134,7 @@ class ATSScorer:
             issues.append("Use more bullet points for better readability")
         
         # Check length (ideal CV is 1-2 pages, roughly 500-1500 words)
-        word_count = len(self.text.split())
+        word_count = self.document.word_count
         if 500 <= word_count <= 1500:
             score += 25
             strengths.append("Appropriate length")
@@ -119,8 +146,7 @@ class ATSScorer:
             issues.append("CV might be too long")
         
         # Check for consistent formatting (capitalization patterns)
-        lines = [line.strip() for line in self.text.split('\n') if line.strip()]
-        if len(lines) > 5:
+        if self.document.nonblank_line_count > 5:
             score += 20
             strengths.append("Well-structured content")
         
@@ -144,7 +170,7 @@ class ATSScorer:
             improvements.append("Add a clear Experience or Work History section")
         
         # Check for action verbs
-        action_verb_count = sum(1 for verb in self.ACTION_VERBS if verb in self.text_lower)
+        action_verb_count = self.matches.count('action_verbs')
         if action_verb_count >= 8:
             score += 35
             strengths.append("Strong use of action verbs")
@@ -156,12 +182,11 @@ class ATSScorer:
             improvements.append("Add action verbs (developed, led, improved, etc.)")
         
         # Check for numbers/metrics (quantifiable achievements)
-        number_pattern = r'\b\d+%|\b\d+\s*(percent|million|thousand|users|projects)\b'
-        metrics = re.findall(number_pattern, self.text_lower)
-        if len(metrics) >= 5:
+        metric_count = self.document.metric_count
+        if metric_count >= 5:
             score += 35
             strengths.append("Quantifiable achievements highlighted")
-        elif len(metrics) >= 2:
+        elif metric_count >= 2:
             score += 20
             improvements.append("Add more quantifiable metrics to achievements")
         else:
@@ -187,7 +212,7 @@ class ATSScorer:
             details.append("Add an Education section")
         
         # Check for education keywords
-        edu_keyword_count = sum(1 for keyword in self.EDUCATION_KEYWORDS if keyword in self.text_lower)
+        edu_keyword_count = self.matches.count('education')
         if edu_keyword_count >= 3:
             score += 50
             details.append("Educational credentials mentioned")
@@ -213,8 +238,7 @@ class ATSScorer:
             feedback.append("Add a dedicated Skills section")
         
         # Check for technical skills mentioned
-        technical_skills = ['python', 'java', 'javascript', 'sql', 'react', 'aws', 'docker', 'git']
-        tech_count = sum(1 for skill in technical_skills if skill in self.text_lower)
+        tech_count = self.matches.count('technical_skills')
         
         if tech_count >= 5:
             score += 60
@@ -253,20 +277,29 @@ class ATSScorer:
         
         return score, {'elements': elements, 'missing': missing}
     
-    def calculate_overall_score(self):
+    def calculate_overall_score(self, timer=NULL_TIMER):
         """
         Calculate overall ATS score and detailed feedback
         
+        Args:
+            timer: Optional StageTimer recording each score_* method
+        
         Returns:
             Dictionary with scores and feedback
         """
         # Calculate individual scores
-        keyword_score, keyword_feedback = self.score_keywords()
-        formatting_score, formatting_feedback = self.score_formatting()
-        experience_score, experience_feedback = self.score_experience()
-        education_score, education_feedback = self.score_education()
-        skills_score, skills_feedback = self.score_skills()
-        contact_score, contact_feedback = self.score_contact()
+        with timer.stage('score_keywords'):
+            keyword_score, keyword_feedback = self.score_keywords()
+        with timer.stage('score_formatting'):
+            formatting_score, formatting_feedback = self.score_formatting()
+        with timer.stage('score_experience'):
+            experience_score, experience_feedback = self.score_experience()
+        with timer.stage('score_education'):
+            education_score, education_feedback = self.score_education()
+        with timer.stage('score_skills'):
+            skills_score, skills_feedback = self.score_skills()
+        with timer.stage('score_contact'):
+            contact_score, contact_feedback = self.score_contact()
         
         # Calculate weighted overall score
         overall_score = int(
@@ -323,3 +356,4 @@ class ATSScorer:
             'missing_elements': missing_elements[:5],  # Top 5 missing
             'keyword_details': keyword_feedback,
         }
+
@@ -0,0 +1,5 @@
+"""
+Benchmark suite for CV parsing and scoring
+
+Run with `python manage.py benchmark`.
+"""
@@ -0,0 +1,261 @@
+"""
+Synthetic CV Corpus
+Deterministically generates PDF and DOCX CVs of varying size and layout
+"""
+import io
+import random
+import zipfile
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+
+SyntheticCV = namedtuple('SyntheticCV', ['name', 'file_type', 'layout', 'pages', 'data'])
+
+LAYOUTS = ['classic', 'skills-first', 'no-headings', 'table-skills']
+
+FIRST_NAMES = ['Amina', 'Bilal', 'Chen', 'Dana', 'Elif', 'Farid', 'Grace', 'Hiro', 'Ines', 'Jonas']
+LAST_NAMES = ['Khan', 'Lopez', 'Meyer', 'Nakamura', 'Okafor', 'Petrov', 'Quinn', 'Rossi', 'Silva']
+SKILLS = [
+    'Python', 'Java', 'JavaScript', 'React', 'Angular', 'Node', 'Django', 'Flask', 'SQL',
+    'MongoDB', 'AWS', 'Azure', 'Docker', 'Kubernetes', 'CI/CD', 'Git', 'Agile', 'Scrum',
+    'Machine Learning', 'Data Analysis', 'TensorFlow', 'DevOps', 'Security', 'Leadership',
+]
+VERBS = [
+    'Developed', 'Designed', 'Implemented', 'Built', 'Managed', 'Led', 'Improved',
+    'Reduced', 'Delivered', 'Optimized', 'Streamlined', 'Coordinated', 'Maintained',
+]
+OBJECTS = [
+    'a payment processing service', 'the customer onboarding flow', 'an internal analytics dashboard',
+    'the data ingestion pipeline', 'a recommendation engine', 'the release process',
+    'a cross-team platform migration', 'the mobile API gateway', 'automated test suites',
+]
+OUTCOMES = [
+    'cutting latency by {n}%', 'serving {n} thousand users', 'saving {n}% in cloud costs',
+    'across {n} projects', 'improving conversion by {n}%', 'for {n} million requests per day',
+]
+DEGREES = ['Bachelor of Science in Computer Science', 'Master of Science in Data Science',
+           'BSc Software Engineering', 'PhD in Applied Mathematics']
+SCHOOLS = ['State University', 'Institute of Technology', 'City College', 'National University']
+
+# Roughly one PDF page of body text
+LINES_PER_PAGE = 45
+
+
+def generate_lines(rng, pages, layout):
+    """
+    Generate the text lines of one CV
+
+    Args:
+        rng: random.Random instance (determines the content)
+        pages: Approximate number of pages of content
+        layout: One of LAYOUTS
+
+    Returns:
+        List of (kind, text) tuples where kind is 'heading', 'bullet',
+        'text' or 'skills'
+    """
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    handle = name.lower().replace(' ', '.')
+    lines = [
+        ('text', name),
+        ('text', f"{handle}@example.com | +1 555 {rng.randint(100, 999)} {rng.randint(1000, 9999)}"),
+    ]
+    
+    skills = rng.sample(SKILLS, rng.randint(6, len(SKILLS)))
+    skills_block = [('heading', 'Technical Skills'), ('skills', ', '.join(skills))]
+    summary_block = [
+        ('heading', 'Summary'),
+        ('text', f"Engineer with {rng.randint(2, 15)} years of experience in {', '.join(skills[:3])}."),
+    ]
+    
+    target_lines = max(pages * LINES_PER_PAGE, 20)
+    experience_block = [('heading', 'Professional Experience')]
+    education_block = [
+        ('heading', 'Education'),
+        ('text', f"{rng.choice(DEGREES)}, {rng.choice(SCHOOLS)}, {rng.randint(1995, 2022)}"),
+    ]
+    fixed = len(lines) + len(skills_block) + len(summary_block) + len(education_block) + 1
+    while fixed + len(experience_block) < target_lines:
+        experience_block.append(
+            ('text', f"Software Engineer, Company {rng.randint(1, 999)}, {rng.randint(2005, 2024)}")
+        )
+        for _ in range(rng.randint(3, 6)):
+            outcome = rng.choice(OUTCOMES).format(n=rng.randint(2, 90))
+            experience_block.append(
+                ('bullet', f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}, {outcome}")
+            )
+    
+    if layout == 'skills-first':
+        blocks = skills_block + summary_block + experience_block + education_block
+    else:
+        blocks = summary_block + experience_block + education_block + skills_block
+    if layout == 'no-headings':
+        blocks = [line for line in blocks if line[0] != 'heading']
+    return lines + blocks
+
+
+def build_pdf(lines):
+    """Render text lines into a minimal multi-page PDF (Helvetica, one column)"""
+    page_streams = []
+    for start in range(0, len(lines), LINES_PER_PAGE):
+        commands = ['BT', '/F1 10 Tf', '14 TL', '50 790 Td']
+        for kind, text in lines[start:start + LINES_PER_PAGE]:
+            if kind == 'bullet':
+                text = f"- {text}"
+            text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            commands.append(f"({text}) Tj T*")
+        commands.append('ET')
+        page_streams.append('\n'.join(commands).encode('latin-1', 'replace'))
+    
+    page_count = len(page_streams)
+    # Object numbers: 1 catalog, 2 pages, 3 font, then (page, content) pairs
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        (
+            "<< /Type /Pages /Kids [" +
+            ' '.join(f"{4 + 2 * i} 0 R" for i in range(page_count)) +
+            f"] /Count {page_count} >>"
+        ).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, stream in enumerate(page_streams):
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+            ).encode()
+        )
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+    
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref_offset = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    )
+    return out.getvalue()
+
+
+_W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/header1.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.header+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/officeDocument" Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rIdHeader1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/header" Target="header1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _docx_paragraph(text):
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def build_docx(lines, layout):
+    """
+    Render text lines into a minimal DOCX package
+
+    The contact lines go into the page header, and with the
+    'table-skills' layout the skills are laid out in a table, as many
+    CV templates do.
+    """
+    header_lines, body_lines = lines[:2], lines[2:]
+    body = []
+    for kind, text in body_lines:
+        if kind == 'skills' and layout == 'table-skills':
+            cells = ''.join(
+                f'<w:tc>{_docx_paragraph(skill)}</w:tc>' for skill in text.split(', ')
+            )
+            body.append(f'<w:tbl><w:tr>{cells}</w:tr></w:tbl>')
+        elif kind == 'bullet':
+            body.append(_docx_paragraph(f"• {text}"))
+        else:
+            body.append(_docx_paragraph(text))
+    
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:document xmlns:w="{_W_NS}" xmlns:r="{_R_NS}"><w:body>'
+        + ''.join(body) +
+        '<w:sectPr><w:headerReference w:type="default" r:id="rIdHeader1"/></w:sectPr>'
+        '</w:body></w:document>'
+    )
+    header = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:hdr xmlns:w="{_W_NS}" xmlns:r="{_R_NS}">'
+        + ''.join(_docx_paragraph(text) for _, text in header_lines) +
+        '</w:hdr>'
+    )
+    
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        package.writestr('_rels/.rels', _ROOT_RELS)
+        package.writestr('word/_rels/document.xml.rels', _DOCUMENT_RELS)
+        package.writestr('word/document.xml', document)
+        package.writestr('word/header1.xml', header)
+    return out.getvalue()
+
+
+def generate_corpus(count, seed=0, page_counts=(1, 2, 5, 20), file_types=('pdf', 'docx')):
+    """
+    Generate a deterministic corpus of synthetic CVs
+
+    The same arguments always produce byte-identical documents, so
+    results from different commits are comparable.
+
+    Args:
+        count: Number of documents per (file type, page count) combination
+        seed: Corpus seed
+        page_counts: Document sizes to generate, in pages
+        file_types: Any of 'pdf' and 'docx'
+
+    Returns:
+        List of SyntheticCV
+    """
+    corpus = []
+    for file_type in file_types:
+        for pages in page_counts:
+            for index in range(count):
+                rng = random.Random(f"{seed}-{file_type}-{pages}-{index}")
+                layout = LAYOUTS[index % len(LAYOUTS)]
+                lines = generate_lines(rng, pages, layout)
+                if file_type == 'pdf':
+                    data = build_pdf(lines)
+                else:
+                    data = build_docx(lines, layout)
+                corpus.append(SyntheticCV(
+                    name=f"synthetic-{file_type}-{pages}p-{index}.{file_type}",
+                    file_type=file_type,
+                    layout=layout,
+                    pages=pages,
+                    data=data,
+                ))
+    return corpus
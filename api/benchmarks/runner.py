@@ -0,0 +1,278 @@
+"""
+Benchmark Runner
+Measures parse, score and end-to-end upload latency over a synthetic corpus
+"""
+import io
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import Client, override_settings
+from ..cv_parser import CVParser
+from ..ats_scorer import ATSScorer
+from ..keyword_matcher import KeywordMatcher
+from ..taxonomy import TaxonomyStore
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+STAGES = ['parse', 'score', 'match', 'e2e']
+
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def summarize(samples):
+    """
+    Summarize latency samples (seconds) into milliseconds and throughput
+    """
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        'count': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'mean_ms': round(total / len(ordered) * 1000, 3),
+        'docs_per_sec': round(len(ordered) / total, 2) if total else None,
+    }
+
+
+def peak_rss():
+    """Peak RSS in bytes of this process and of its (waited-for) children"""
+    if resource is None:
+        return {'self': None, 'children': None}
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+    }
+
+
+def git_revision():
+    """Return the current git commit, if available"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _group_key(document):
+    return f"{document.file_type}/{document.pages}p"
+
+
+def _extract_with(extractor):
+    def parse(file, file_type):
+        with override_settings(CV_DOCX_EXTRACTOR=extractor):
+            return CVParser.extract(file, file_type).text
+    return parse
+
+
+# Alternative extractors timed side by side, per file type
+PARSERS = {
+    'pdf': {'': _extract_with('stream')},
+    'docx': {
+        'stream': _extract_with('stream'),
+        'python-docx': _extract_with('python-docx'),
+    },
+}
+
+
+def bench_parse(corpus, repeat, parsers=PARSERS):
+    """
+    Time text extraction per document (in-process, no sandbox)
+
+    Each extractor also runs once under tracemalloc to record the peak
+    memory it allocates (Python allocations only: the C heap used by lxml
+    inside python-docx is not traced, so its figure is a lower bound).
+
+    Args:
+        parsers: {file type: {label: callable(file, file_type)}}; the
+            text of the first extractor of each file type is kept
+
+    Returns:
+        ({group: [seconds]}, {group: peak bytes}, {document name: text})
+    """
+    samples = defaultdict(list)
+    peak_alloc = defaultdict(int)
+    texts = {}
+    for document in corpus:
+        for label, parse in parsers[document.file_type].items():
+            group = _group_key(document) + (f"/{label}" if label else '')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                text = parse(io.BytesIO(document.data), document.file_type)
+                samples[group].append(time.perf_counter() - started)
+            texts.setdefault(document.name, text)
+            
+            tracemalloc.start()
+            parse(io.BytesIO(document.data), document.file_type)
+            peak_alloc[group] = max(peak_alloc[group], tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return samples, peak_alloc, texts
+
+
+def bench_score(corpus, texts, repeat):
+    """Time ATSScorer construction plus calculate_overall_score per document"""
+    samples = defaultdict(list)
+    for document in corpus:
+        text = texts[document.name]
+        for _ in range(repeat):
+            started = time.perf_counter()
+            ATSScorer(text).calculate_overall_score()
+            samples[_group_key(document)].append(time.perf_counter() - started)
+    return samples
+
+
+def bench_match(corpus, texts, repeat):
+    """
+    Time keyword matching per document: KeywordMatcher.match() against a
+    `term in text` scan of every term and synonym, the way the scorer
+    matched before KeywordMatcher
+
+    Every vocabulary (taxonomy and section keywords) is matched as
+    substrings, so both sides do the same work.
+
+    Returns:
+        {group: [seconds]}, with 'scan' and 'matcher' groups per document group
+    """
+    vocabularies = {
+        **TaxonomyStore.load(settings.CV_TAXONOMY_PATH), **CVParser.section_vocabularies()
+    }
+    matcher = KeywordMatcher(vocabularies)
+    strings = [
+        string
+        for terms in vocabularies.values()
+        for term in terms
+        for string in [term, *(terms[term] if isinstance(terms, dict) else ())]
+    ]
+
+    def scan(text):
+        return [string for string in strings if string in text]
+
+    samples = defaultdict(list)
+    for document in corpus:
+        text = texts[document.name].lower()
+        for label, match in (('scan', scan), ('matcher', matcher.match)):
+            group = f"{_group_key(document)}/{label}"
+            for _ in range(repeat):
+                started = time.perf_counter()
+                match(text)
+                samples[group].append(time.perf_counter() - started)
+    return samples
+
+
+def bench_end_to_end(corpus, repeat):
+    """
+    Time POST /api/upload-cv/ through the full Django stack
+
+    Every request runs in a rolled-back transaction with uploads written
+    to a temporary MEDIA_ROOT, so the database and media are left
+    untouched and the content-hash cache never short-circuits a repeat.
+    """
+    client = Client()
+    samples = defaultdict(list)
+    errors = 0
+    with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+        for document in corpus:
+            for _ in range(repeat):
+                upload = SimpleUploadedFile(document.name, document.data)
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    response = client.post('/api/upload-cv/', {'file': upload})
+                    elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+                if response.status_code != 201:
+                    errors += 1
+                samples[_group_key(document)].append(elapsed)
+    return samples, errors
+
+
+def run_benchmarks(corpus, stages=STAGES, repeat=3, parsers=PARSERS):
+    """
+    Run the requested benchmark stages
+
+    Returns:
+        Machine-readable results dictionary
+    """
+    results = {
+        'meta': {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'documents': len(corpus),
+            'repeat': repeat,
+        },
+        'stages': {},
+    }
+    
+    texts = None
+    if 'parse' in stages or 'score' in stages or 'match' in stages:
+        parse_samples, peak_alloc, texts = bench_parse(
+            corpus, repeat if 'parse' in stages else 1, parsers
+        )
+        if 'parse' in stages:
+            results['stages']['parse'] = _stage_results(parse_samples)
+            for group, peak in peak_alloc.items():
+                results['stages']['parse']['groups'][group]['peak_alloc_bytes'] = peak
+    if 'score' in stages:
+        results['stages']['score'] = _stage_results(bench_score(corpus, texts, repeat))
+    if 'match' in stages:
+        results['stages']['match'] = _stage_results(bench_match(corpus, texts, repeat))
+    if 'e2e' in stages:
+        e2e_samples, errors = bench_end_to_end(corpus, repeat)
+        results['stages']['e2e'] = _stage_results(e2e_samples)
+        results['stages']['e2e']['errors'] = errors
+    
+    results['peak_rss_bytes'] = peak_rss()
+    return results
+
+
+def _stage_results(samples):
+    groups = {group: summarize(values) for group, values in sorted(samples.items())}
+    everything = [value for values in samples.values() for value in values]
+    return {'overall': summarize(everything), 'groups': groups}
+
+
+def compare(baseline, current):
+    """
+    Compare two results dictionaries
+
+    Returns:
+        List of (stage, group, metric, baseline, current, change %) rows
+    """
+    rows = []
+    for stage, stage_results in current['stages'].items():
+        base_stage = baseline.get('stages', {}).get(stage)
+        if not base_stage:
+            continue
+        groups = {'overall': stage_results['overall'], **stage_results['groups']}
+        base_groups = {'overall': base_stage['overall'], **base_stage['groups']}
+        for group, stats in groups.items():
+            base_stats = base_groups.get(group)
+            if not base_stats:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'docs_per_sec'):
+                before, after = base_stats.get(metric), stats.get(metric)
+                if not before or after is None:
+                    continue
+                rows.append((stage, group, metric, before, after, (after - before) / before * 100))
+    return rows
@@ -0,0 +1,48 @@
+"""
+System Checks
+Warn about settings that defeat the per-process concurrency features
+"""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_admission_threads(app_configs, **kwargs):
+    """Parse slots plus queue must leave server threads for other requests"""
+    admitted = settings.CV_PARSE_CONCURRENCY + settings.CV_PARSE_QUEUE_SIZE
+    if admitted < settings.CV_WEB_THREADS:
+        return []
+    return [Warning(
+        f'CV_PARSE_CONCURRENCY + CV_PARSE_QUEUE_SIZE ({admitted}) is not below '
+        f'WEB_THREADS ({settings.CV_WEB_THREADS})',
+        hint='Uploads can then take every server thread, so reads and health '
+             'checks wait behind them and the queue never sheds load.',
+        id='api.W001',
+    )]
+
+
+@register()
+def check_sandbox_workers(app_configs, **kwargs):
+    """Every admitted parse must find a sandbox process"""
+    if not settings.CV_PARSE_SANDBOX or settings.CV_SANDBOX_WORKERS >= settings.CV_PARSE_CONCURRENCY:
+        return []
+    return [Warning(
+        f'CV_SANDBOX_WORKERS ({settings.CV_SANDBOX_WORKERS}) is below '
+        f'CV_PARSE_CONCURRENCY ({settings.CV_PARSE_CONCURRENCY})',
+        hint='Admitted requests then wait for a sandbox process, outside the '
+             'admission queue limit and timeout. Leave CV_SANDBOX_WORKERS unset to match.',
+        id='api.W003',
+    )]
+
+
+@register()
+def check_group_commit_threads(app_configs, **kwargs):
+    """Group commit only batches writes of concurrent requests in one process"""
+    if not settings.CV_GROUP_COMMIT or settings.CV_WEB_THREADS > 1 or settings.CV_ASYNC_VIEWS:
+        return []
+    return [Warning(
+        f'CV_GROUP_COMMIT is ignored with WEB_THREADS={settings.CV_WEB_THREADS}',
+        hint='Run gunicorn with --worker-class gthread --threads N (N > 1, see the '
+             'Procfile) or the async views on an ASGI server; sync workers write directly.',
+        id='api.W002',
+    )]
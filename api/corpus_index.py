@@ -0,0 +1,420 @@
+"""
+Corpus Index
+Sparse term matrix of every stored CV text, persisted to disk, for ranking
+the whole corpus against a job description
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from .jd_matcher import FEATURE_DIM, term_counts, term_weights
+from .models import ATSAnalysis, ExtractedText
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one process may update the index
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when term_counts()/term_weights() change: older indexes are rebuilt
+INDEX_FORMAT = 1
+
+_SEGMENT_ARRAYS = ('data', 'indices', 'indptr', 'ids', 'scores', 'analyzed_at')
+_SEGMENT_NAME = re.compile(r'segment-(\d+)')  # also matches its .tmp directory
+
+
+class _Segment:
+    """One immutable block of indexed documents, memory-mapped from disk"""
+
+    def __init__(self, path):
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in _SEGMENT_ARRAYS
+        }
+        self.matrix = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=(len(arrays['indptr']) - 1, FEATURE_DIM),
+            copy=False
+        )
+        self.ids = arrays['ids']  # (n, 16) uint8 analysis UUID bytes
+        self.scores = arrays['scores']  # overall_score when indexed
+        self.analyzed_at = arrays['analyzed_at']  # epoch seconds
+
+
+class _Snapshot:
+    """Segments of one manifest version, plus derived IDF"""
+
+    def __init__(self, manifest, segments):
+        self.manifest = manifest
+        self.segments = segments
+        self.size = sum(segment.matrix.shape[0] for segment in segments)
+        self.ids = {
+            bytes(row) for segment in segments for row in segment.ids
+        }
+        document_frequency = np.zeros(FEATURE_DIM, dtype=np.int64)
+        for segment in segments:
+            document_frequency += np.bincount(segment.matrix.indices, minlength=FEATURE_DIM)
+        self.idf = (
+            np.log((1.0 + self.size) / (1.0 + document_frequency)) + 1.0
+        ).astype(np.float32)
+
+
+class CorpusIndex:
+    """
+    Row-normalized term frequency matrix over all stored CV texts
+
+    The index is a directory of segments. Each holds CSR arrays plus the
+    analysis id, overall score and analysis time of every row, saved as
+    .npy files and memory-mapped on load. refresh() catches up from
+    ExtractedText.stored_at, appending new texts as a new segment; the
+    manifest listing the segments is replaced atomically, and readers
+    reload it when it changes. Segments are merged by size tier (see
+    _merge_segments), so a row is rewritten a few times over its life
+    rather than on every merge. Segment names are never reused, even
+    across rebuilds, since readers may still map the old ones.
+
+    rank() scores every row with one sparse matrix-vector product per
+    segment: the job description's TF-IDF weights, multiplied by IDF once
+    more for the document side, against length-normalized document term
+    frequencies. Keeping IDF out of the stored rows means they never need
+    rewriting as the corpus grows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._manifest_mtime = None
+        self._lock = threading.RLock()
+
+    # Reading
+
+    def snapshot(self):
+        """Return the current segments, reloading them if the manifest changed"""
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._snapshot is None or mtime != self._manifest_mtime:
+            with self._lock:
+                if self._snapshot is None or mtime != self._manifest_mtime:
+                    manifest = self._read_manifest()
+                    segments = [
+                        _Segment(os.path.join(self.path, name)) for name in manifest['segments']
+                    ]
+                    self._snapshot = _Snapshot(manifest, segments)
+                    self._manifest_mtime = mtime
+        return self._snapshot
+
+    def rank(self, job_description, limit=50, min_score=None, max_score=None,
+             analyzed_after=None, analyzed_before=None):
+        """
+        Rank indexed analyses by similarity to a job description
+
+        Args:
+            job_description: Job posting text
+            limit: Number of results
+            min_score, max_score: Optional overall_score bounds (inclusive)
+            analyzed_after, analyzed_before: Optional datetime bounds on analyzed_at
+
+        Returns:
+            (list of (ATSAnalysis, similarity) best first, number of indexed rows)
+        """
+        snapshot = self.snapshot()
+        if not snapshot.size:
+            return [], 0
+
+        indices, values = term_weights(term_counts(job_description))
+        values *= snapshot.idf[indices]
+        norm = np.linalg.norm(values)
+        if not norm:
+            return [], snapshot.size
+        query = np.zeros(FEATURE_DIM, dtype=np.float32)
+        # IDF applied a second time stands in for the document-side weight
+        query[indices] = values * snapshot.idf[indices] / norm
+
+        similarities = []
+        masks = []
+        ids = []
+        for segment in snapshot.segments:
+            similarities.append(segment.matrix @ query)
+            mask = np.ones(segment.matrix.shape[0], dtype=bool)
+            if min_score is not None:
+                mask &= segment.scores >= min_score
+            if max_score is not None:
+                mask &= segment.scores <= max_score
+            if analyzed_after is not None:
+                mask &= segment.analyzed_at >= analyzed_after.timestamp()
+            if analyzed_before is not None:
+                mask &= segment.analyzed_at <= analyzed_before.timestamp()
+            masks.append(mask)
+            ids.append(segment.ids)
+        similarities = np.concatenate(similarities)
+        candidates = np.flatnonzero(np.concatenate(masks) & (similarities > 0))
+        ids = np.concatenate(ids)
+
+        # Top-k selection, widened only if the database check (which drops
+        # deleted analyses and rows whose stored score is stale) rejects some
+        results = []
+        candidate_scores = similarities[candidates]
+        confirmed = 0
+        take = max(limit * 2, 20)
+        while confirmed < len(candidates):
+            take = min(take, len(candidates))
+            top = np.argpartition(-candidate_scores, take - 1)[:take]
+            top = top[np.argsort(-candidate_scores[top], kind='stable')]
+            rows = candidates[top[confirmed:]]
+            analyses = ATSAnalysis.objects.select_related('cv_upload').filter(
+                id__in=[uuid.UUID(bytes=bytes(ids[row])) for row in rows],
+                status=ATSAnalysis.STATUS_DONE,
+            )
+            if min_score is not None:
+                analyses = analyses.filter(overall_score__gte=min_score)
+            if max_score is not None:
+                analyses = analyses.filter(overall_score__lte=max_score)
+            if analyzed_after is not None:
+                analyses = analyses.filter(analyzed_at__gte=analyzed_after)
+            if analyzed_before is not None:
+                analyses = analyses.filter(analyzed_at__lte=analyzed_before)
+            by_id = {analysis.id.bytes: analysis for analysis in analyses}
+            for row in rows:
+                analysis = by_id.get(bytes(ids[row]))
+                if analysis is not None:
+                    results.append((analysis, float(similarities[row])))
+                    if len(results) == limit:
+                        return results, snapshot.size
+            confirmed = take
+            take *= 2
+        return results, snapshot.size
+
+    # Writing
+
+    def refresh(self, limit=None, rebuild=False):
+        """
+        Index stored texts added since the last refresh
+
+        Args:
+            limit: Index at most this many new texts (None for all)
+            rebuild: Discard the existing segments first
+
+        Returns:
+            Number of texts added
+        """
+        with self._write_lock():
+            if rebuild:
+                manifest = self._empty_manifest()
+                known = set()
+            else:
+                manifest = self._read_manifest()
+                known = self.snapshot().ids
+
+            since = parse_datetime(manifest['watermark']) if manifest['watermark'] else None
+            rows = (
+                ExtractedText.objects
+                .order_by('stored_at', 'pk')
+                .values_list(
+                    'analysis_id', 'data', 'stored_at',
+                    'analysis__overall_score', 'analysis__analyzed_at'
+                )
+            )
+            if since is not None:
+                # Transactions may commit out of stored_at order: look back
+                # a little and skip rows already indexed
+                rows = rows.filter(stored_at__gte=since - timedelta(seconds=settings.CV_CORPUS_INDEX_LAG))
+
+            added = 0
+            pending = []
+            for analysis_id, data, stored_at, overall_score, analyzed_at in rows.iterator(chunk_size=500):
+                if limit is not None and added + len(pending) >= limit:
+                    break
+                if analysis_id.bytes in known:
+                    continue
+                text = ExtractedText(data=data).get_text()
+                pending.append((analysis_id, term_weights(term_counts(text)), overall_score, analyzed_at))
+                if len(pending) >= settings.CV_CORPUS_INDEX_SEGMENT_SIZE:
+                    added += self._append_segment(manifest, pending, stored_at)
+                    pending = []
+            if pending:
+                added += self._append_segment(manifest, pending, stored_at)
+            elif rebuild:
+                self._write_manifest(manifest)
+            return added
+
+    def _append_segment(self, manifest, rows, watermark):
+        """Write rows as a new segment and publish it in the manifest"""
+        manifest['segments'].append(self._write_segment(manifest, rows))
+        manifest['watermark'] = watermark.isoformat()
+        self._merge_segments(manifest)
+        self._write_manifest(manifest)
+        return len(rows)
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize index updates across threads and, where supported, processes"""
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            with open(os.path.join(self.path, '.lock'), 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _empty_manifest(self):
+        # Numbering continues after any segment left on disk by a previous
+        # index (or an interrupted write), so a new name never collides
+        names = os.listdir(self.path) if os.path.isdir(self.path) else []
+        numbers = [int(match[1]) for match in map(_SEGMENT_NAME.match, names) if match]
+        return {
+            'format': INDEX_FORMAT, 'segments': [], 'next_segment': max(numbers, default=0) + 1,
+            'watermark': None,
+        }
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.path, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return self._empty_manifest()
+        if manifest.get('format') != INDEX_FORMAT:
+            logger.warning("Corpus index %s has an old format and will be rebuilt", self.path)
+            return self._empty_manifest()
+        return manifest
+
+    def _write_manifest(self, manifest):
+        temp_path = os.path.join(self.path, 'manifest.json.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, os.path.join(self.path, 'manifest.json'))
+        self._remove_unlisted_segments(manifest)
+
+    def _remove_unlisted_segments(self, manifest):
+        # Readers holding memory maps of removed files keep them until they reload
+        listed = set(manifest['segments'])
+        for name in os.listdir(self.path):
+            if name.startswith('segment-') and name not in listed:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def _write_segment(self, manifest, rows):
+        """
+        Save (analysis_id, term_weights() output, overall_score, analyzed_at)
+        rows as a new segment and return its name
+        """
+        data = []
+        indices = []
+        indptr = [0]
+        for _, (row_indices, row_values), _, _ in rows:
+            norm = np.linalg.norm(row_values)
+            if norm:
+                row_values /= norm
+            indices.append(row_indices)
+            data.append(row_values)
+            indptr.append(indptr[-1] + len(row_indices))
+        return self._save_segment(manifest, {
+            'data': np.concatenate(data).astype(np.float32),
+            'indices': np.concatenate(indices).astype(np.int32),
+            'indptr': np.array(indptr, dtype=np.int64),
+            'ids': np.array([list(row[0].bytes) for row in rows], dtype=np.uint8).reshape(-1, 16),
+            'scores': np.array([row[2] for row in rows], dtype=np.int16),
+            'analyzed_at': np.array([row[3].timestamp() for row in rows], dtype=np.int64),
+        })
+
+    def _merge_segments(self, manifest):
+        """
+        Merge the newest segments while CV_CORPUS_INDEX_MERGE_FACTOR of
+        them share a size tier
+
+        Tier 0 holds segments under CV_CORPUS_INDEX_SEGMENT_SIZE rows, tier
+        t those up to MERGE_FACTOR**t times that. Merging a full tier moves
+        its rows up one tier, so each row is rewritten about once per tier
+        (logarithmic in the corpus size) and at most MERGE_FACTOR - 1
+        segments remain per tier.
+        """
+        factor = settings.CV_CORPUS_INDEX_MERGE_FACTOR
+        segments = manifest['segments']
+        while len(segments) >= factor:
+            newest = segments[-factor:]
+            tiers = {self._tier(self._segment_rows(name)) for name in newest}
+            if len(tiers) > 1:
+                break
+            segments[-factor:] = [self._merge(manifest, newest)]
+
+    def _tier(self, rows):
+        tier = 0
+        bound = settings.CV_CORPUS_INDEX_SEGMENT_SIZE
+        while rows >= bound:
+            tier += 1
+            bound *= settings.CV_CORPUS_INDEX_MERGE_FACTOR
+        return tier
+
+    def _segment_rows(self, name):
+        indptr = np.load(os.path.join(self.path, name, 'indptr.npy'), mmap_mode='r')
+        return len(indptr) - 1
+
+    def _merge(self, manifest, names):
+        """Write the rows of several segments as one new segment and return its name"""
+        segments = [_Segment(os.path.join(self.path, name)) for name in names]
+        matrix = sparse.vstack([segment.matrix for segment in segments], format='csr')
+        return self._save_segment(manifest, {
+            'data': matrix.data.astype(np.float32),
+            'indices': matrix.indices.astype(np.int32),
+            'indptr': matrix.indptr.astype(np.int64),
+            'ids': np.concatenate([segment.ids for segment in segments]),
+            'scores': np.concatenate([segment.scores for segment in segments]),
+            'analyzed_at': np.concatenate([segment.analyzed_at for segment in segments]),
+        })
+
+    def _save_segment(self, manifest, arrays):
+        """Write segment arrays to a new directory and return its name"""
+        name = f"segment-{manifest['next_segment']:06d}"
+        manifest['next_segment'] += 1
+        temp_path = os.path.join(self.path, name + '.tmp')
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        for array_name in _SEGMENT_ARRAYS:
+            np.save(os.path.join(temp_path, f'{array_name}.npy'), arrays[array_name])
+        os.rename(temp_path, os.path.join(self.path, name))
+        return name
+
+
+_index = None
+_index_lock = threading.Lock()
+_last_refresh = 0.0
+
+
+def get_corpus_index():
+    """Return this process's CorpusIndex"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CorpusIndex(str(settings.CV_CORPUS_INDEX_DIR))
+        return _index
+
+
+def refresh_corpus_index():
+    """
+    Catch the index up with recent uploads, at most every
+    CV_CORPUS_INDEX_REFRESH_INTERVAL seconds per process and
+    CV_CORPUS_INDEX_REFRESH_LIMIT texts per call
+
+    Called by idle analysis workers (see jobs.run_worker), never from a
+    request.
+    """
+    global _last_refresh
+    if time.monotonic() - _last_refresh < settings.CV_CORPUS_INDEX_REFRESH_INTERVAL:
+        return 0
+    _last_refresh = time.monotonic()
+    return get_corpus_index().refresh(limit=settings.CV_CORPUS_INDEX_REFRESH_LIMIT)
@@ -0,0 +1,124 @@
+"""
+CV Document Model
+Normalized text and derived features of one CV, computed once and shared
+by the scorer and parser helpers
+"""
+import re
+from .cv_parser import CVParser
+
+
+TOKEN_PATTERN = re.compile(r'\S+')
+NONBLANK_LINE_PATTERN = re.compile(r'^[^\S\n]*\S', re.MULTILINE)
+# Common bullet characters followed by whitespace
+BULLET_PATTERN = re.compile(r'[•●○■□▪▫–—-]\s')
+# Numbers/metrics (quantifiable achievements), matched on lowercase text
+METRIC_PATTERN = re.compile(r'\b\d+%|\b\d+\s*(percent|million|thousand|users|projects)\b')
+
+
+class CVDocument:
+    """
+    Compact, read-only view of a CV's text
+
+    Tokens and lines are counted rather than kept as lists of substrings,
+    and every regex and keyword scan the scorer needs runs exactly once,
+    on construction.
+    """
+
+    __slots__ = (
+        'text', 'text_lower', 'word_count', 'nonblank_line_count', 'bullet_count',
+        'metric_count', 'email', 'phone', 'matches', 'sections', 'matcher',
+    )
+
+    def __init__(self, text, matcher):
+        """
+        Args:
+            text: Extracted CV text
+            matcher: KeywordMatcher whose vocabularies include the
+                CVParser.section_vocabularies() entries
+        """
+        self.text = text
+        self.text_lower = text.lower()
+
+        self.word_count = sum(1 for _ in TOKEN_PATTERN.finditer(text))
+        self.nonblank_line_count = sum(1 for _ in NONBLANK_LINE_PATTERN.finditer(text))
+
+        self.bullet_count = sum(1 for _ in BULLET_PATTERN.finditer(text))
+        self.metric_count = sum(1 for _ in METRIC_PATTERN.finditer(self.text_lower))
+        self.email = CVParser.extract_email(text)
+        self.phone = CVParser.extract_phone(text)
+        self.matcher = matcher
+        self.matches = matcher.match(self.text_lower)
+        self.sections = CVParser.sections_from_matches(self.matches)
+
+
+class CVFeatureSet:
+    """
+    Scoring inputs of a CV without its text
+
+    Holds exactly what ATSScorer reads from a CVDocument, so a CV can be
+    re-scored from a stored feature record (see CVFeatures) without
+    re-parsing or even decompressing its text.
+    """
+
+    __slots__ = (
+        'text', 'text_lower', 'word_count', 'nonblank_line_count', 'bullet_count',
+        'metric_count', 'email', 'phone', 'matches', 'sections',
+    )
+
+    def __init__(self, word_count, nonblank_line_count, bullet_count, metric_count,
+                 email, phone, matches):
+        self.text = None
+        self.text_lower = None
+        self.word_count = word_count
+        self.nonblank_line_count = nonblank_line_count
+        self.bullet_count = bullet_count
+        self.metric_count = metric_count
+        self.email = email
+        self.phone = phone
+        self.matches = matches
+        self.sections = CVParser.sections_from_matches(matches)
+
+    @staticmethod
+    def record_fields(document, matcher):
+        """
+        Return CVFeatures field values for a CVDocument
+
+        Args:
+            document: CVDocument
+            matcher: The KeywordMatcher the document was matched with
+        """
+        section_flags = 0
+        for bit, section_name in enumerate(CVParser.SECTION_KEYWORDS):
+            if document.sections.get(section_name):
+                section_flags |= 1 << bit
+        return {
+            'vocabulary_version': matcher.version,
+            'keyword_bitmap': matcher.to_bitmap(document.matches),
+            'section_flags': section_flags,
+            'skill_count': document.matches.count('skills'),
+            'action_verb_count': document.matches.count('action_verbs'),
+            'word_count': document.word_count,
+            'nonblank_line_count': document.nonblank_line_count,
+            'bullet_count': document.bullet_count,
+            'metric_count': document.metric_count,
+            'email': document.email or '',
+            'phone': document.phone or '',
+        }
+
+    @classmethod
+    def from_record(cls, record, matcher):
+        """
+        Restore a feature set from a CVFeatures record
+
+        The record must have been built with the same vocabularies
+        (record.vocabulary_version == matcher.version).
+        """
+        return cls(
+            word_count=record.word_count,
+            nonblank_line_count=record.nonblank_line_count,
+            bullet_count=record.bullet_count,
+            metric_count=record.metric_count,
+            email=record.email or None,
+            phone=record.phone or None,
+            matches=matcher.from_bitmap(bytes(record.keyword_bitmap)),
+        )
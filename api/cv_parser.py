@@ -5,41 +5,165 @@ Extracts text from PDF and DOCX files
 import PyPDF2
 import docx
 import io
+import multiprocessing
 import re
+import threading
+import tracemalloc
+from collections import namedtuple
+from contextlib import nullcontext
+from django.conf import settings
+from .keyword_matcher import KeywordMatcher
+from .docx_extractor import extract_docx_text
+
+
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+# Simple phone pattern (customize based on region)
+PHONE_PATTERN = re.compile(r'[\+]?[(]?[0-9]{1,4}[)]?[-\s\.]?[(]?[0-9]{1,4}[)]?[-\s\.]?[0-9]{1,9}')
+
+ParseResult = namedtuple('ParseResult', ['text', 'pages', 'truncated', 'peak_memory'])
+
+# tracemalloc's peak is process-wide: traced parses must not overlap
+_TRACE_LOCK = threading.Lock()
+
+
+def _extract_pdf_page_range(data, start, stop):
+    """Extract the text of pages [start, stop) of a PDF (runs in a pool worker)"""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [pdf_reader.pages[index].extract_text() or "" for index in range(start, stop)]
 
 
 class CVParser:
     """Service to parse CV files and extract text"""
     
+    # Common section headers
+    SECTION_KEYWORDS = {
+        'experience': ['experience', 'work history', 'employment', 'professional experience'],
+        'education': ['education', 'academic', 'qualifications'],
+        'skills': ['skills', 'technical skills', 'competencies'],
+        'certifications': ['certifications', 'certificates', 'licenses'],
+        'summary': ['summary', 'objective', 'profile', 'about'],
+    }
+    
     @staticmethod
-    def parse_pdf(file):
+    def iter_pdf_pages(pdf_reader, max_pages=None):
+        """
+        Yield the text of each PDF page in order
+        
+        Args:
+            pdf_reader: PyPDF2.PdfReader instance
+            max_pages: Stop after this many pages (None for no limit)
+        """
+        for page_number, page in enumerate(pdf_reader.pages):
+            if max_pages is not None and page_number >= max_pages:
+                return
+            yield page.extract_text() or ""
+    
+    @staticmethod
+    def parse_pdf(file, max_pages=None, max_chars=None):
         """Extract text from PDF file"""
+        return CVParser.extract_pdf(file, max_pages, max_chars)[0]
+    
+    @staticmethod
+    def iter_pdf_pages_parallel(file, page_count, pages_per_task):
+        """
+        Yield the text of the first page_count PDF pages in order,
+        extracting page ranges concurrently on the shared process pool
+        
+        Each task receives a copy of the file bytes and opens its own
+        reader. Tasks not yet started are cancelled if the caller stops
+        iterating early.
+        """
+        from .process_pool import get_process_pool
+        
+        file.seek(0)
+        data = file.read()
+        pool = get_process_pool()
+        futures = [
+            pool.submit(_extract_pdf_page_range, data, start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
         try:
-            # Read file content
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.read()))
-            text = ""
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    @staticmethod
+    def extract_pdf(file, max_pages=None, max_chars=None, parallel=False):
+        """
+        Extract text from PDF file, stopping early at the page/character caps
+        
+        With parallel=True, documents of at least CV_PDF_PARALLEL_MIN_PAGES
+        pages are split into page ranges extracted on the process pool.
+        
+        Returns:
+            (text, pages_read, truncated) tuple
+        """
+        try:
+            # The reader works directly on the (seekable) upload, so the
+            # file is not copied into a second in-memory buffer
+            file.seek(0)
+            pdf_reader = PyPDF2.PdfReader(file)
+            page_count = len(pdf_reader.pages)
+            truncated = max_pages is not None and page_count > max_pages
+            page_limit = page_count if max_pages is None else min(page_count, max_pages)
+            
+            parts = []
+            char_count = 0
+            pages_read = 0
             
-            # Extract text from all pages
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            if parallel and page_limit >= getattr(settings, 'CV_PDF_PARALLEL_MIN_PAGES', 20):
+                pages = CVParser.iter_pdf_pages_parallel(
+                    file, page_limit, getattr(settings, 'CV_PDF_PAGES_PER_TASK', 8)
+                )
+            else:
+                pages = CVParser.iter_pdf_pages(pdf_reader, max_pages)
+            for page_text in pages:
+                parts.append(page_text)
+                pages_read += 1
+                char_count += len(page_text) + 1
+                if max_chars is not None and char_count >= max_chars:
+                    truncated = True
+                    pages.close()
+                    break
             
-            return text.strip()
+            text = "\n".join(parts).strip()
+            if max_chars is not None:
+                text = text[:max_chars]
+            return text, pages_read, truncated
         except Exception as e:
             raise Exception(f"Error parsing PDF: {str(e)}")
     
     @staticmethod
-    def parse_docx(file):
-        """Extract text from DOCX file"""
+    def parse_docx(file, max_chars=None):
+        """
+        Extract text from DOCX file
+        
+        Streams the package XML (headers, body including tables and text
+        boxes, footers) unless CV_DOCX_EXTRACTOR is 'python-docx'.
+        """
+        if getattr(settings, 'CV_DOCX_EXTRACTOR', 'stream') == 'python-docx':
+            return CVParser.parse_docx_document_model(file, max_chars)
+        try:
+            file.seek(0)
+            return extract_docx_text(file, max_chars)
+        except Exception as e:
+            raise Exception(f"Error parsing DOCX: {str(e)}")
+    
+    @staticmethod
+    def parse_docx_document_model(file, max_chars=None):
+        """Extract body paragraph text from DOCX file using python-docx"""
         try:
             # Read file content
-            doc = docx.Document(io.BytesIO(file.read()))
-            text = ""
+            file.seek(0)
+            doc = docx.Document(file)
             
             # Extract text from all paragraphs
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            
-            return text.strip()
+            text = "\n".join(paragraph.text for paragraph in doc.paragraphs).strip()
+            if max_chars is not None:
+                text = text[:max_chars]
+            return text
         except Exception as e:
             raise Exception(f"Error parsing DOCX: {str(e)}")
     
@@ -55,52 +179,111 @@ class CVParser:
         Returns:
             Extracted text as string
         """
-        if file_type.lower() == 'pdf':
-            return CVParser.parse_pdf(file)
-        elif file_type.lower() in ['docx', 'doc']:
-            return CVParser.parse_docx(file)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
+        return CVParser.extract(file, file_type).text
+    
+    @staticmethod
+    def extract(file, file_type, max_pages=None, max_chars=None, parallel=None):
+        """
+        Parse CV file and report extraction statistics
+        
+        Args:
+            file: Uploaded file object
+            file_type: 'pdf' or 'docx'
+            max_pages: PDF page cap (defaults to the CV_PARSE_MAX_PAGES setting)
+            max_chars: Extracted character cap (defaults to CV_PARSE_MAX_CHARS)
+            parallel: Allow page-parallel PDF extraction (defaults to the
+                CV_PDF_PARALLEL setting; never used from daemon processes,
+                which cannot start pool workers)
+        
+        Returns:
+            ParseResult with the text, pages read, whether a cap was hit and
+            the peak memory in bytes allocated during this parse (traced
+            when CV_PARSE_TRACE_MEMORY is on, otherwise None: the process
+            peak RSS only ever grows, so it says nothing about one parse).
+            tracemalloc state is process-wide, so traced parses in one
+            process run one at a time.
+        """
+        if max_pages is None:
+            max_pages = getattr(settings, 'CV_PARSE_MAX_PAGES', None)
+        if max_chars is None:
+            max_chars = getattr(settings, 'CV_PARSE_MAX_CHARS', None)
+        if parallel is None:
+            parallel = (
+                getattr(settings, 'CV_PDF_PARALLEL', False)
+                and not multiprocessing.current_process().daemon
+            )
+        trace_memory = getattr(settings, 'CV_PARSE_TRACE_MEMORY', False)
+        
+        with _TRACE_LOCK if trace_memory else nullcontext():
+            started_tracing = False
+            peak_memory = None
+            if trace_memory:
+                started_tracing = not tracemalloc.is_tracing()
+                if started_tracing:
+                    tracemalloc.start()
+                tracemalloc.reset_peak()
+            
+            try:
+                if file_type.lower() == 'pdf':
+                    text, pages, truncated = CVParser.extract_pdf(file, max_pages, max_chars, parallel)
+                elif file_type.lower() in ['docx', 'doc']:
+                    text = CVParser.parse_docx(file, max_chars)
+                    pages = None
+                    truncated = max_chars is not None and len(text) >= max_chars
+                else:
+                    raise ValueError(f"Unsupported file type: {file_type}")
+            finally:
+                if trace_memory:
+                    peak_memory = tracemalloc.get_traced_memory()[1]
+                    if started_tracing:
+                        tracemalloc.stop()
+        
+        return ParseResult(text, pages, truncated, peak_memory)
     
     @staticmethod
     def extract_email(text):
-        """Extract email address from text"""
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, text)
-        return emails[0] if emails else None
+        """Extract email address from text (or a CVDocument)"""
+        if not isinstance(text, str):
+            return text.email
+        email = EMAIL_PATTERN.search(text)
+        return email.group(0) if email else None
     
     @staticmethod
     def extract_phone(text):
-        """Extract phone number from text"""
-        # Simple phone pattern (customize based on region)
-        phone_pattern = r'[\+]?[(]?[0-9]{1,4}[)]?[-\s\.]?[(]?[0-9]{1,4}[)]?[-\s\.]?[0-9]{1,9}'
-        phones = re.findall(phone_pattern, text)
-        return phones[0] if phones else None
+        """Extract phone number from text (or a CVDocument)"""
+        if not isinstance(text, str):
+            return text.phone
+        phone = PHONE_PATTERN.search(text)
+        return phone.group(0) if phone else None
     
     @staticmethod
     def extract_sections(text):
         """
-        Extract common CV sections
+        Extract common CV sections from text (or a CVDocument)
         Returns a dictionary with section names as keys
         """
-        sections = {}
-        text_lower = text.lower()
-        
-        # Common section headers
-        section_keywords = {
-            'experience': ['experience', 'work history', 'employment', 'professional experience'],
-            'education': ['education', 'academic', 'qualifications'],
-            'skills': ['skills', 'technical skills', 'competencies'],
-            'certifications': ['certifications', 'certificates', 'licenses'],
-            'summary': ['summary', 'objective', 'profile', 'about'],
+        if not isinstance(text, str):
+            return text.sections
+        return CVParser.sections_from_matches(SECTION_MATCHER.match(text.lower()))
+    
+    @staticmethod
+    def sections_from_matches(matches):
+        """
+        Build the section dictionary from KeywordMatches whose vocabularies
+        include the 'section:<name>' entries of section_vocabularies()
+        """
+        return {
+            section_name: matches.has_any(f'section:{section_name}')
+            for section_name in CVParser.SECTION_KEYWORDS
         }
-        
-        for section_name, keywords in section_keywords.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    sections[section_name] = True
-                    break
-            if section_name not in sections:
-                sections[section_name] = False
-        
-        return sections
+    
+    @staticmethod
+    def section_vocabularies():
+        """Return section keywords keyed as 'section:<name>' for KeywordMatcher"""
+        return {
+            f'section:{section_name}': keywords
+            for section_name, keywords in CVParser.SECTION_KEYWORDS.items()
+        }
+
+
+SECTION_MATCHER = KeywordMatcher(CVParser.section_vocabularies())
@@ -0,0 +1,137 @@
+"""
+DOCX Text Extractor
+Streams text out of a .docx package without building a document model
+"""
+import posixpath
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_MC = '{http://schemas.openxmlformats.org/markup-compatibility/2006}'
+_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+_TEXT = _W + 't'
+_TAB = _W + 'tab'
+_BREAKS = (_W + 'br', _W + 'cr')
+_PARAGRAPH = _W + 'p'
+_FALLBACK = _MC + 'Fallback'
+
+_HEADER_FOOTER_PART = re.compile(r'^word/(header|footer)\d*\.xml$')
+
+
+def _iter_part_paragraphs(stream):
+    """
+    Yield the text of each paragraph of a WordprocessingML part in
+    document order, including paragraphs inside tables and text boxes
+
+    Paragraphs nested in a text box are yielded before the paragraph
+    that anchors them. mc:Fallback content (a duplicate rendering of
+    the preceding mc:Choice) is skipped.
+    """
+    paragraphs = []  # text buffers of the currently open (nested) paragraphs
+    open_elements = []
+    fallback_depth = 0
+
+    for event, element in iterparse(stream, events=('start', 'end')):
+        tag = element.tag
+        if event == 'start':
+            open_elements.append(element)
+            if tag == _FALLBACK:
+                fallback_depth += 1
+            elif tag == _PARAGRAPH and not fallback_depth:
+                paragraphs.append([])
+            continue
+
+        if tag == _FALLBACK:
+            fallback_depth -= 1
+        elif fallback_depth:
+            pass
+        elif tag == _TEXT and paragraphs:
+            paragraphs[-1].append(element.text or '')
+        elif tag == _TAB and paragraphs:
+            paragraphs[-1].append('\t')
+        elif tag in _BREAKS and paragraphs:
+            paragraphs[-1].append('\n')
+        elif tag == _PARAGRAPH:
+            yield ''.join(paragraphs.pop())
+
+        # Text is consumed on each element's end event, so the element can
+        # be detached from its parent right away and memory stays bounded
+        open_elements.pop()
+        if open_elements:
+            open_elements[-1].remove(element)
+
+
+def _header_footer_parts(package):
+    """
+    Return (header parts, footer parts) of the main document, in
+    relationship order, followed by any unreferenced header/footer parts
+    """
+    headers, footers = [], []
+    try:
+        rels_xml = package.open('word/_rels/document.xml.rels')
+    except KeyError:
+        rels_xml = None
+
+    if rels_xml is not None:
+        with rels_xml:
+            for _, element in iterparse(rels_xml):
+                if element.tag != _REL + 'Relationship':
+                    continue
+                part = posixpath.normpath(posixpath.join('word', element.get('Target', '')))
+                relationship_type = element.get('Type', '')
+                if relationship_type.endswith('/header'):
+                    headers.append(part)
+                elif relationship_type.endswith('/footer'):
+                    footers.append(part)
+
+    for name in sorted(package.namelist()):
+        match = _HEADER_FOOTER_PART.match(name)
+        if match and name not in headers and name not in footers:
+            (headers if match.group(1) == 'header' else footers).append(name)
+    return headers, footers
+
+
+def iter_docx_paragraphs(file):
+    """
+    Yield paragraph text from a .docx file: headers, then the body
+    (including tables and text boxes), then footers
+
+    Args:
+        file: Path or seekable binary file object
+    """
+    with zipfile.ZipFile(file) as package:
+        names = set(package.namelist())
+        headers, footers = _header_footer_parts(package)
+        for part in headers + ['word/document.xml'] + footers:
+            if part not in names:
+                continue
+            with package.open(part) as stream:
+                yield from _iter_part_paragraphs(stream)
+
+
+def extract_docx_text(file, max_chars=None):
+    """
+    Extract the text of a .docx file, one paragraph per line
+
+    Args:
+        file: Path or seekable binary file object
+        max_chars: Stop once this many characters have been extracted
+
+    Returns:
+        Extracted text as string
+    """
+    parts = []
+    char_count = 0
+    for paragraph in iter_docx_paragraphs(file):
+        parts.append(paragraph)
+        char_count += len(paragraph) + 1
+        if max_chars is not None and char_count >= max_chars:
+            break
+
+    text = "\n".join(parts).strip()
+    if max_chars is not None:
+        text = text[:max_chars]
+    return text
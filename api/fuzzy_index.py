@@ -0,0 +1,123 @@
+"""
+Fuzzy Word Index
+Typo-tolerant lookup of words in a fixed vocabulary
+"""
+from collections import defaultdict
+
+
+class FuzzyIndex:
+    """
+    SymSpell-style deletion dictionary
+
+    Every vocabulary word is indexed under each string obtained by deleting
+    up to its allowed edit distance of characters. A token is looked up by
+    generating its own deletions and probing the index, so only words that
+    share a deletion with the token are compared, instead of every word in
+    the vocabulary. Candidates are confirmed with the optimal string
+    alignment distance (insertions, deletions, substitutions and adjacent
+    transpositions).
+
+    The allowed distance grows with word length, so short words only match
+    exactly, and the first character must match, which keeps common words
+    from being read as typos of skills.
+    """
+
+    # (minimum word length, allowed edit distance), longest first
+    DISTANCE_BY_LENGTH = ((11, 2), (7, 1))
+
+    def __init__(self, words):
+        """
+        Args:
+            words: Vocabulary words; on equal distance, earlier words win
+        """
+        self.words = list(dict.fromkeys(words))
+        self._rank = {word: rank for rank, word in enumerate(self.words)}
+        self._deletes = defaultdict(list)
+        for word in self.words:
+            for variant in _deletions(word, FuzzyIndex.allowed_distance(word)):
+                self._deletes[variant].append(word)
+        self.max_distance = max(
+            (FuzzyIndex.allowed_distance(word) for word in self.words), default=0
+        )
+
+    @staticmethod
+    def allowed_distance(word):
+        """Return the edit distance tolerated for a word of this length"""
+        for min_length, distance in FuzzyIndex.DISTANCE_BY_LENGTH:
+            if len(word) >= min_length:
+                return distance
+        return 0
+
+    def lookup(self, token):
+        """
+        Find the closest vocabulary word to a token
+
+        Args:
+            token: Lowercase token
+
+        Returns:
+            (word, distance) tuple, or None if no word is within its
+            allowed distance
+        """
+        if token in self._rank:
+            return token, 0
+        # Words tolerate at most max_distance, and a word within distance d
+        # is at most d characters shorter or longer than the token
+        if len(token) < FuzzyIndex.DISTANCE_BY_LENGTH[-1][0] - self.max_distance:
+            return None
+
+        best = None
+        seen = set()
+        for variant in _deletions(token, self.max_distance):
+            for word in self._deletes.get(variant, ()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                if word[0] != token[0]:
+                    continue
+                allowed = FuzzyIndex.allowed_distance(word)
+                if abs(len(word) - len(token)) > allowed:
+                    continue
+                distance = _osa_distance(token, word, allowed)
+                if distance > allowed:
+                    continue
+                if best is None or (distance, self._rank[word]) < (best[1], self._rank[best[0]]):
+                    best = (word, distance)
+        return best
+
+
+def _deletions(word, max_distance):
+    """Return the word and every string made by deleting up to max_distance characters"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {
+            variant[:i] + variant[i + 1:]
+            for variant in frontier if len(variant) > 1
+            for i in range(len(variant))
+        }
+        variants |= frontier
+    return variants
+
+
+def _osa_distance(a, b, limit):
+    """
+    Optimal string alignment distance between a and b
+
+    Returns limit + 1 as soon as the distance is known to exceed limit.
+    """
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
@@ -0,0 +1,186 @@
+"""
+Group Commit
+Batches the database writes of many requests into one transaction
+
+SQLite has a single writer, and every commit waits for the journal to
+reach the disk. When many workers save small uploads, each request pays
+for its own commit and queues for the write lock behind the others. With
+CV_GROUP_COMMIT enabled, requests hand their writes to one writer thread
+per process instead; it collects whatever arrives within
+CV_GROUP_COMMIT_MAX_DELAY (up to CV_GROUP_COMMIT_MAX_BATCH writes) and
+commits them together, each in its own savepoint so one failing write
+does not undo the others (except for foreign key violations, which
+SQLite only reports at COMMIT and so fail the whole batch). A request
+gets its result only once the transaction has committed.
+
+Batches only form when one process serves several requests at once: a
+threaded WSGI server (gunicorn --worker-class gthread, WEB_THREADS > 1)
+or the async views on an ASGI server. A sync worker serves one request
+at a time, so every batch would hold a single write and only add the
+writer's delay; the sync views then write directly and CV_GROUP_COMMIT
+is ignored (with a warning here and from `manage.py check`).
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, close_old_connections, transaction
+from .metrics import GROUP_COMMIT_BATCH, GROUP_COMMIT_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    """
+    Single writer thread that commits queued writes in batches
+
+    Usage:
+        future = writer.submit(create_analysis, cv_upload, ...)
+        analysis = future.result()
+
+    Each write is a callable run inside the shared transaction; it must
+    only touch the database (the writer thread is the bottleneck).
+    """
+
+    def __init__(self, max_batch, max_delay):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        """
+        Queue a write
+
+        Returns:
+            concurrent.futures.Future with the return value of func(*args),
+            or its exception, set once the batch has committed
+        """
+        future = Future()
+        self._ensure_started().put((future, func, args, time.monotonic()))
+        return future
+
+    def _ensure_started(self):
+        with self._lock:
+            # Started lazily, and again in a forked worker (gunicorn --preload)
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._queue,), name='cv-group-commit', daemon=True
+                )
+                self._thread.start()
+            return self._queue
+
+    def _run(self, pending):
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(pending.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except Exception:  # keep the writer alive, _commit already failed the futures
+                logger.exception("Group commit of %d writes failed", len(batch))
+
+    @staticmethod
+    def _commit(batch):
+        # Same connection hygiene as a request: drop it if broken or too old
+        close_old_connections()
+        writes = [
+            (future, func, args, submitted_at)
+            for future, func, args, submitted_at in batch
+            if future.set_running_or_notify_cancel()
+        ]
+        if not writes:
+            return
+        GROUP_COMMIT_BATCH.observe(len(writes))
+
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, func, args, _ in writes:
+                    try:
+                        with transaction.atomic():  # savepoint per write
+                            outcomes.append((func(*args), None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+        except Exception as e:
+            # The commit itself failed: nothing in the batch was saved
+            for future, _, _, _ in writes:
+                future.set_exception(e)
+            connection.close()
+            raise
+
+        committed_at = time.monotonic()
+        for (future, _, _, submitted_at), (result, error) in zip(writes, outcomes):
+            GROUP_COMMIT_WAIT_SECONDS.observe(committed_at - submitted_at)
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+def threaded_server():
+    """Whether the WSGI server runs several request threads per process"""
+    return settings.CV_WEB_THREADS > 1
+
+
+if settings.CV_GROUP_COMMIT and not threaded_server() and not settings.CV_ASYNC_VIEWS:
+    logger.warning(
+        "CV_GROUP_COMMIT is ignored: WEB_THREADS is %d, so no two writes could share a batch",
+        settings.CV_WEB_THREADS
+    )
+
+GROUP_WRITER = GroupCommitWriter(
+    max_batch=settings.CV_GROUP_COMMIT_MAX_BATCH,
+    max_delay=settings.CV_GROUP_COMMIT_MAX_DELAY
+)
+
+
+def commit(func, *args):
+    """
+    Run a write, through the group-commit writer if CV_GROUP_COMMIT is on
+    and the server is threaded
+
+    Blocks until the write has committed.
+
+    Returns:
+        func(*args)
+
+    Raises:
+        Whatever func raised; TimeoutError if the write was not committed
+        within CV_GROUP_COMMIT_TIMEOUT seconds
+    """
+    if not settings.CV_GROUP_COMMIT or not threaded_server():
+        return func(*args)
+    future = GROUP_WRITER.submit(func, *args)
+    try:
+        return future.result(timeout=settings.CV_GROUP_COMMIT_TIMEOUT)
+    except TimeoutError:
+        future.cancel()  # no effect if its batch is already running
+        raise
+
+
+async def acommit(func, *args):
+    """Async version of commit(), for the ASGI views"""
+    if not settings.CV_GROUP_COMMIT:
+        return await sync_to_async(func)(*args)
+    future = GROUP_WRITER.submit(func, *args)
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(future), timeout=settings.CV_GROUP_COMMIT_TIMEOUT
+        )
+    except TimeoutError:
+        future.cancel()
+        raise
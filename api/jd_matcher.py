@@ -0,0 +1,236 @@
+"""
+Job Description Matcher
+Scores how well CV text matches a job description using TF-IDF weighted
+sparse term vectors
+"""
+import math
+import threading
+import time
+import zlib
+from collections import Counter
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from .keyword_matcher import WORD_PATTERN
+
+# Terms are hashed into a fixed feature space, so vectors of any two
+# documents (or a whole corpus) can be compared without a shared vocabulary
+FEATURE_DIM = 2 ** 20
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been
+before being below between both but by can could did do does doing down during each
+etc few for from further had has have having he her here hers him his how i if in
+into is it its itself just me more most my no nor not of off on once only or other
+our ours out over own per same she should so some such than that the their theirs
+them then there these they this those through to too under until up very via was
+we were what when where which while who whom why will with within without would
+you your yours
+""".split())
+
+
+def term_counts(text):
+    """
+    Count the terms of a text: words (lowercase, without stopwords and
+    numbers) and pairs of adjacent words, so phrases like
+    "machine learning" weigh more than their words apart
+
+    Returns:
+        Counter of term -> occurrences
+    """
+    text = text.lower()
+    counts = Counter()
+    previous = None
+    previous_end = 0
+    for token in WORD_PATTERN.finditer(text):
+        word = token.group()
+        if word in STOPWORDS or word.isdigit() or len(word) < 2:
+            previous = None
+            continue
+        counts[word] += 1
+        # Only words separated by whitespace form a phrase
+        if previous is not None and text[previous_end:token.start()].isspace():
+            counts[f'{previous} {word}'] += 1
+        previous = word
+        previous_end = token.end()
+    return counts
+
+
+def term_index(term):
+    """Return the feature index of a term"""
+    return zlib.crc32(term.encode('utf-8')) % FEATURE_DIM
+
+
+def term_weights(counts):
+    """
+    Return the sublinear term frequencies, 1 + log(count), of term_counts()
+    output as (feature indices, weights) arrays sorted by index; terms whose
+    hashes collide share a feature
+    """
+    weights = Counter()
+    for term, count in counts.items():
+        weights[term_index(term)] += 1.0 + math.log(count)
+    indices = np.fromiter(weights.keys(), dtype=np.int32, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+    order = np.argsort(indices)
+    return indices[order], values[order]
+
+
+def vectorize(counts, idf=None):
+    """
+    Build an L2-normalized TF-IDF row vector
+
+    Args:
+        counts: Counter from term_counts()
+        idf: Optional array of FEATURE_DIM inverse document frequencies
+            (uniform weights if None)
+
+    Returns:
+        1 x FEATURE_DIM scipy.sparse.csr_matrix
+    """
+    indices, values = term_weights(counts)
+    if idf is not None:
+        values *= idf[indices]
+    norm = np.linalg.norm(values)
+    if norm:
+        values /= norm
+    return sparse.csr_matrix(
+        (values, indices, np.array([0, len(indices)])),
+        shape=(1, FEATURE_DIM)
+    )
+
+
+class JDMatcher:
+    """
+    Compares CVs against one job description
+
+    The job description is vectorized once; each CV is scored by the cosine
+    similarity of the two TF-IDF vectors and by how much of the job
+    description's term weight the CV covers.
+    """
+
+    def __init__(self, job_description, idf=None):
+        """
+        Args:
+            job_description: Job posting text
+            idf: Optional inverse document frequencies, see CorpusIDF
+        """
+        self.idf = idf
+        self.counts = term_counts(job_description)
+        self.vector = vectorize(self.counts, idf)
+        # Job description terms by weight, heaviest first
+        self.terms = sorted(
+            self.counts,
+            key=lambda term: (-self._term_weight(term), term)
+        )
+
+    def _term_weight(self, term):
+        weight = 1.0 + math.log(self.counts[term])
+        if self.idf is not None:
+            weight *= float(self.idf[term_index(term)])
+        return weight
+
+    def similarities(self, cv_vectors):
+        """
+        Cosine similarity of the job description to each row of a matrix
+        of vectorize() outputs (stacked with scipy.sparse.vstack)
+
+        Returns:
+            numpy array with one similarity per row
+        """
+        return np.asarray((cv_vectors @ self.vector.T).todense()).ravel()
+
+    def match(self, cv_text, limit=20):
+        """
+        Match a CV against the job description
+
+        Args:
+            cv_text: Extracted CV text
+            limit: Maximum number of matched and missing terms returned
+
+        Returns:
+            Dictionary with similarity, coverage, matched and missing terms
+        """
+        cv_vector = vectorize(term_counts(cv_text), self.idf)
+        similarity = float(self.similarities(cv_vector)[0])
+        present = set(cv_vector.indices.tolist())
+
+        matched = []
+        missing = []
+        matched_weight = 0.0
+        total_weight = 0.0
+        for term in self.terms:
+            weight = self._term_weight(term)
+            total_weight += weight
+            if term_index(term) in present:
+                matched_weight += weight
+                matched.append(term)
+            else:
+                missing.append(term)
+        coverage = matched_weight / total_weight if total_weight else 0.0
+
+        return {
+            'match_score': int(round(similarity * 100)),
+            'similarity': round(similarity, 4),
+            'term_coverage': round(coverage, 4),
+            'matched_terms': matched[:limit],
+            'missing_terms': missing[:limit],
+        }
+
+
+class CorpusIDF:
+    """
+    Inverse document frequencies of the stored CV texts
+
+    Computed from the most recent CV_JD_IDF_SAMPLE stored texts and kept
+    for CV_JD_IDF_TTL seconds. Below CV_JD_IDF_MIN_DOCUMENTS texts, get()
+    returns None and matching falls back to uniform term weights.
+    """
+
+    def __init__(self):
+        self._idf = None
+        self._documents = 0
+        self._computed_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return (idf array or None, number of documents it was computed from)"""
+        with self._lock:
+            if self._computed_at is None or time.monotonic() - self._computed_at >= settings.CV_JD_IDF_TTL:
+                self._idf, self._documents = CorpusIDF.compute(settings.CV_JD_IDF_SAMPLE)
+                self._computed_at = time.monotonic()
+            return self._idf, self._documents
+
+    @staticmethod
+    def compute(sample_size):
+        """
+        Compute smoothed IDF, log((1 + n) / (1 + df)) + 1, over the most
+        recent stored texts
+
+        Returns:
+            (idf array or None, number of documents)
+        """
+        from .models import ExtractedText
+
+        rows = (
+            ExtractedText.objects
+            .order_by('-analysis__analyzed_at')
+            .values_list('data', flat=True)[:sample_size]
+        )
+        document_frequency = np.zeros(FEATURE_DIM, dtype=np.int32)
+        documents = 0
+        for data in rows.iterator(chunk_size=200):
+            text = zlib.decompress(bytes(data)).decode('utf-8')
+            indices = np.unique(np.fromiter(
+                (term_index(term) for term in term_counts(text)), dtype=np.int64
+            ))
+            document_frequency[indices] += 1
+            documents += 1
+
+        if documents < settings.CV_JD_IDF_MIN_DOCUMENTS:
+            return None, documents
+        idf = np.log((1.0 + documents) / (1.0 + document_frequency)) + 1.0
+        return idf.astype(np.float32), documents
+
+
+CORPUS_IDF = CorpusIDF()
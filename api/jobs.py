@@ -0,0 +1,213 @@
+"""
+Analysis Job Queue
+DB-backed queue of analyses processed by local worker processes
+"""
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import ATSAnalysis, AnalysisJob
+from .corpus_index import refresh_corpus_index
+from .ats_scorer import ATSScorer
+from .services import apply_analysis, parse_upload
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    """Identify the current worker process as host:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_analysis(cv_upload):
+    """
+    Create a pending analysis for an uploaded CV and queue it
+
+    Args:
+        cv_upload: CVUpload instance; an unsaved one is saved in the
+            same transaction
+
+    Returns:
+        Pending ATSAnalysis instance
+    """
+    with transaction.atomic():
+        if cv_upload._state.adding:
+            cv_upload.save(force_insert=True)
+        analysis = ATSAnalysis.objects.create(
+            cv_upload=cv_upload,
+            status=ATSAnalysis.STATUS_PENDING
+        )
+        AnalysisJob.objects.create(analysis=analysis)
+    return analysis
+
+
+def claim_next_job(worker):
+    """
+    Atomically claim the oldest pending job
+
+    The claim is a conditional UPDATE, so concurrent workers racing for
+    the same row cannot both win it.
+
+    Returns:
+        Claimed AnalysisJob, or None if the queue is empty
+    """
+    while True:
+        job_id = (
+            AnalysisJob.objects
+            .filter(status=ATSAnalysis.STATUS_PENDING)
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        
+        claimed = AnalysisJob.objects.filter(
+            id=job_id, status=ATSAnalysis.STATUS_PENDING
+        ).update(
+            status=ATSAnalysis.STATUS_RUNNING,
+            worker=worker,
+            claimed_at=timezone.now(),
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return AnalysisJob.objects.select_related('analysis__cv_upload').get(id=job_id)
+
+
+def requeue_stale_jobs():
+    """
+    Return jobs whose worker died mid-analysis to the queue, or fail them
+    once they have used up their attempts
+
+    Returns:
+        Number of jobs requeued or failed
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CV_JOB_STALE_SECONDS)
+    stale = AnalysisJob.objects.filter(status=ATSAnalysis.STATUS_RUNNING, claimed_at__lt=cutoff)
+    
+    exhausted = list(
+        stale.filter(attempts__gte=settings.CV_JOB_MAX_ATTEMPTS).values_list('id', flat=True)
+    )
+    for job_id in exhausted:
+        job = AnalysisJob.objects.select_related('analysis').get(id=job_id)
+        _fail_job(job, 'Analysis did not finish')
+    
+    # The analysis goes back to pending with its job, so clients and
+    # purge_cvs do not see a dead worker's analysis as running
+    with transaction.atomic():
+        job_ids = list(
+            stale.filter(attempts__lt=settings.CV_JOB_MAX_ATTEMPTS).values_list('id', flat=True)
+        )
+        requeued = AnalysisJob.objects.filter(id__in=job_ids).update(
+            status=ATSAnalysis.STATUS_PENDING,
+            worker='',
+            claimed_at=None
+        )
+        ATSAnalysis.objects.filter(job__in=job_ids, status=ATSAnalysis.STATUS_RUNNING).update(
+            status=ATSAnalysis.STATUS_PENDING
+        )
+    return requeued + len(exhausted)
+
+
+def process_job(job):
+    """
+    Parse and score the CV of a claimed job and store the results
+
+    The job is only completed or failed while this worker still owns its
+    claim: once requeue_stale_jobs() has put it back in the queue, a late
+    result from the original worker is discarded.
+    """
+    analysis = job.analysis
+    cv_upload = analysis.cv_upload
+    
+    ATSAnalysis.objects.filter(pk=analysis.pk).update(status=ATSAnalysis.STATUS_RUNNING)
+    try:
+        with cv_upload.file.open('rb') as cv_file:
+            extracted_text = parse_upload(cv_file, cv_upload.file_type).text
+        scorer = ATSScorer(extracted_text)
+        analysis_results = scorer.calculate_overall_score()
+    except Exception as e:
+        logger.warning("Analysis %s failed (attempt %s): %s", analysis.pk, job.attempts, e)
+        _fail_job(job, f'Error processing CV: {str(e)}', owned=True)
+        return
+    
+    try:
+        with transaction.atomic():
+            if not _finish_job(job, ATSAnalysis.STATUS_DONE, owned=True):
+                logger.warning("Job %s was requeued, discarding the result of %s", job.pk, job.worker)
+                return
+            apply_analysis(
+                analysis, extracted_text, analysis_results,
+                ATSScorer.feature_fields(scorer.document)
+            )
+    except Exception as e:
+        logger.exception("Storing analysis %s failed (attempt %s)", analysis.pk, job.attempts)
+        _fail_job(job, f'Error storing results: {str(e)}', owned=True)
+
+
+def _finish_job(job, status, owned=False):
+    """
+    Move a running job to a final status with a conditional UPDATE
+
+    Args:
+        job: AnalysisJob instance, updated to match on success
+        status: ATSAnalysis.STATUS_DONE or STATUS_FAILED
+        owned: Only finish the job while it still holds this instance's
+            claim (worker and claim time)
+
+    Returns:
+        True if the job was finished, False if it is no longer running
+        (or, with owned, was requeued and claimed again)
+    """
+    jobs = AnalysisJob.objects.filter(pk=job.pk, status=ATSAnalysis.STATUS_RUNNING)
+    if owned:
+        jobs = jobs.filter(worker=job.worker, claimed_at=job.claimed_at)
+    finished_at = timezone.now()
+    if not jobs.update(status=status, finished_at=finished_at):
+        return False
+    job.status = status
+    job.finished_at = finished_at
+    return True
+
+
+def _fail_job(job, message, owned=False):
+    """Mark a running job and its analysis as failed (see _finish_job)"""
+    with transaction.atomic():
+        if _finish_job(job, ATSAnalysis.STATUS_FAILED, owned):
+            ATSAnalysis.objects.filter(pk=job.analysis_id).update(
+                status=ATSAnalysis.STATUS_FAILED,
+                error_message=message
+            )
+
+
+def run_worker(stop_event=None, poll_interval=None):
+    """
+    Claim and process jobs until stop_event is set
+
+    Args:
+        stop_event: Optional multiprocessing/threading Event to stop the loop
+        poll_interval: Seconds to sleep when the queue is empty
+    """
+    poll_interval = poll_interval or settings.CV_JOB_POLL_INTERVAL
+    worker = worker_name()
+    logger.info("Analysis worker %s started", worker)
+    
+    while stop_event is None or not stop_event.is_set():
+        requeue_stale_jobs()
+        job = claim_next_job(worker)
+        if job is None:
+            # Index maintenance happens here, off the request path
+            try:
+                refresh_corpus_index()
+            except Exception:
+                logger.exception("Corpus index refresh failed")
+            time.sleep(poll_interval)
+            continue
+        process_job(job)
+    
+    logger.info("Analysis worker %s stopped", worker)
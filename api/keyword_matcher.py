@@ -0,0 +1,364 @@
+"""
+Keyword Matching Engine
+Finds every term from several vocabularies in one pass over the text's
+distinct words, with an Aho-Corasick automaton
+"""
+import hashlib
+import json
+import re
+from collections import defaultdict, deque
+from .fuzzy_index import FuzzyIndex
+
+# Words of token-level vocabularies ('c++', 'c#' and 'ci/cd' -> 'ci', 'cd')
+WORD_PATTERN = re.compile(r'[\w+#]+')
+
+# Splitting the text into distinct chunks costs about as much as this many
+# substring scans of it, so fewer strings are looked up in the text itself
+CHUNK_SCAN_MIN_STRINGS = 16
+
+
+class _Automaton:
+    """
+    Aho-Corasick automaton over a list of strings
+
+    Transitions are stored sparsely: a state keeps its own and inherited
+    (failure-chain) transitions except those of the root, which are the
+    fallback, so a character costs one or two dict lookups whatever the
+    number of strings.
+    """
+
+    __slots__ = ('_root', '_next', '_output')
+
+    def __init__(self, strings):
+        goto = [{}]
+        self._output = [()]
+        for index, string in enumerate(strings):
+            state = 0
+            for char in string:
+                following = goto[state].get(char)
+                if following is None:
+                    following = len(goto)
+                    goto.append({})
+                    self._output.append(())
+                    goto[state][char] = following
+                state = following
+            self._output[state] += (index,)
+
+        # Breadth first, so a state's failure state is complete before it
+        fail = [0] * len(goto)
+        self._next = [{} for _ in goto]
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            if fail[state]:
+                self._next[state].update(self._next[fail[state]])
+            self._next[state].update(goto[state])
+            for char, following in goto[state].items():
+                target = fail[state]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                target = goto[target].get(char, 0)
+                fail[following] = target if target != following else 0
+                self._output[following] += self._output[fail[following]]
+                pending.append(following)
+        self._root = goto[0]
+
+    def find(self, text):
+        """Return the indexes of the strings that occur in text"""
+        root = self._root
+        transitions = self._next
+        output = self._output
+        found = set()
+        state = 0
+        for char in text:
+            following = transitions[state].get(char)
+            state = root.get(char, 0) if following is None else following
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class KeywordMatches:
+    """Per-vocabulary keyword hits produced by KeywordMatcher.match()"""
+
+    __slots__ = ('_hits', '_order', '_fuzzy', '_locate')
+
+    def __init__(self, hits, order, fuzzy=None, locate=None):
+        # {vocabulary: {term: positions}}; positions may be None until
+        # positions() asks locate(vocabulary, term) for them
+        self._hits = hits
+        self._order = order
+        # {vocabulary: {term: (distance, matched text)}} for terms only
+        # found approximately
+        self._fuzzy = fuzzy or {}
+        self._locate = locate
+
+    def positions(self, vocabulary, term):
+        """Return the start offsets of a term within a vocabulary"""
+        positions = self._hits.get(vocabulary, {}).get(term, [])
+        if positions is None:
+            positions = self._hits[vocabulary][term] = self._locate(vocabulary, term)
+        return positions
+
+    def contains(self, vocabulary, term):
+        """Return True if a term of a vocabulary was found"""
+        return term in self._hits.get(vocabulary, {})
+    
+    def terms(self, vocabulary):
+        """
+        Return the terms of a vocabulary that were found,
+        in the order the vocabulary defines them
+        """
+        found = self._hits.get(vocabulary, {})
+        return [term for term in self._order.get(vocabulary, ()) if term in found]
+
+    def count(self, vocabulary):
+        """Return how many distinct terms of a vocabulary were found"""
+        return len(self._hits.get(vocabulary, {}))
+
+    def has_any(self, vocabulary):
+        """Return True if at least one term of a vocabulary was found"""
+        return bool(self._hits.get(vocabulary))
+
+    def distance(self, vocabulary, term):
+        """
+        Return the edit distance at which a term was found
+        (0 for exact matches, None if it was not found)
+        """
+        if not self.contains(vocabulary, term):
+            return None
+        return self._fuzzy.get(vocabulary, {}).get(term, (0, None))[0]
+
+    def fuzzy_terms(self, vocabulary):
+        """
+        Return (term, matched text, distance) for the terms of a vocabulary
+        that were only found approximately, in vocabulary order
+        """
+        fuzzy = self._fuzzy.get(vocabulary, {})
+        return [
+            (term, fuzzy[term][1], fuzzy[term][0])
+            for term in self._order.get(vocabulary, ()) if term in fuzzy
+        ]
+
+    def as_dict(self):
+        """Return hits as {vocabulary: {term: [positions]}}"""
+        return {
+            vocab: {term: self.positions(vocab, term) for term in terms}
+            for vocab, terms in self._hits.items()
+        }
+
+
+class KeywordMatcher:
+    """
+    Compiled multi-vocabulary substring matcher
+
+    Each distinct term or synonym is searched for once, however many
+    vocabularies share it, and the hits are exactly those of running
+    `term in text` for every term. Strings without whitespace can only
+    occur inside one whitespace-delimited chunk, so they are all found in
+    a single pass of an Aho-Corasick automaton over the text's distinct
+    chunks; a CV repeats its chunks many times, so that haystack is a
+    fraction of the text's length, and the pass costs the same however
+    large the vocabularies are. The few strings spanning whitespace are
+    looked up in the text with `in`, as are all strings of small
+    vocabularies. Positions are only computed when asked for (see
+    `manage.py benchmark --stages match`).
+
+    Token vocabularies are matched on words instead: each word of the text
+    is resolved to the closest vocabulary word through a FuzzyIndex (so
+    "kubernets" counts as kubernetes), and terms, including multi-word
+    ones, match whole sequences of resolved words.
+    """
+
+    def __init__(self, vocabularies, token_vocabularies=()):
+        """
+        Build the matcher
+
+        Args:
+            vocabularies: Mapping of vocabulary name to either a list of
+                lowercase terms, or a mapping of each term to its synonyms.
+                Terms match anywhere in the text; synonyms match whole
+                words only and are reported under their term.
+            token_vocabularies: Names of vocabularies whose terms and
+                synonyms match whole words only, with typo tolerance
+        """
+        self.vocabularies = {name: list(terms) for name, terms in vocabularies.items()}
+        self.synonyms = {
+            name: {term: list(aliases) for term, aliases in terms.items() if aliases}
+            for name, terms in vocabularies.items() if isinstance(terms, dict)
+        }
+        # Stable (vocabulary, term) order used for hit bitmaps
+        self.term_index = [
+            (name, term) for name, terms in self.vocabularies.items() for term in terms
+        ]
+        self.token_vocabularies = [name for name in token_vocabularies if name in self.vocabularies]
+        self.version = hashlib.sha256(json.dumps(
+            [self.vocabularies, self.synonyms, self.token_vocabularies,
+             FuzzyIndex.DISTANCE_BY_LENGTH],
+            sort_keys=True
+        ).encode('utf-8')).hexdigest()[:16]
+
+        # string -> (vocabulary, reported term, whole word only) entries
+        self._owners = defaultdict(list)
+        # word tuple -> (vocabulary, reported term) entries of token vocabularies
+        self._phrases = defaultdict(list)
+        for name, terms in self.vocabularies.items():
+            synonyms = self.synonyms.get(name, {})
+            for term in terms:
+                variants = [(term, False)] + [(alias, True) for alias in synonyms.get(term, ())]
+                for variant, whole_word in variants:
+                    if name in self.token_vocabularies:
+                        entries = self._phrases[tuple(WORD_PATTERN.findall(variant))]
+                        entry = (name, term)
+                    else:
+                        entries = self._owners[variant]
+                        entry = (name, term, whole_word)
+                    if entry not in entries:
+                        entries.append(entry)
+        self._phrases.pop((), None)
+        self._phrase_starts = {words[0] for words in self._phrases}
+        self._phrase_length = max((len(words) for words in self._phrases), default=0)
+        self._fuzzy_index = FuzzyIndex(word for words in self._phrases for word in words)
+        self._corrections = {}
+
+        # (string, its owners, whether it can only occur inside one chunk)
+        self._strings = [
+            (string, tuple(owners), string.split() == [string])
+            for string, owners in self._owners.items()
+        ]
+        chunk_strings = [entry for entry in self._strings if entry[2]]
+        self._chunk_scan = len(chunk_strings) >= CHUNK_SCAN_MIN_STRINGS
+        if self._chunk_scan:
+            self._chunk_strings = chunk_strings
+            self._text_strings = [entry for entry in self._strings if not entry[2]]
+            self._automaton = _Automaton([string for string, _, _ in chunk_strings])
+        else:
+            self._chunk_strings = []
+            self._text_strings = self._strings
+        # (vocabulary, reported term) -> [(string, whole word only)], for locate()
+        self._variants = defaultdict(list)
+        for string, owners in self._owners.items():
+            for vocabulary, reported, whole_word in owners:
+                self._variants[(vocabulary, reported)].append((string, whole_word))
+
+    def match(self, text):
+        """
+        Find all vocabulary terms in the text
+
+        Args:
+            text: Text to scan (matching is case-sensitive, pass lowercase text)
+
+        Returns:
+            KeywordMatches instance
+        """
+        hits = {}
+        fuzzy = {}
+        if self._phrases:
+            self._match_tokens(text, hits, fuzzy)
+        found = [entry for entry in self._text_strings if entry[0] in text]
+        if self._chunk_scan:
+            chunks = '\n'.join(set(text.split()))
+            found += [self._chunk_strings[index] for index in self._automaton.find(chunks)]
+        for string, owners, _ in found:
+            for vocabulary, reported, whole_word in owners:
+                if whole_word and _find_word(text, string) == -1:
+                    continue
+                hits[(vocabulary, reported)] = None  # located on demand
+
+        grouped = defaultdict(dict)
+        for (vocabulary, term), positions in hits.items():
+            grouped[vocabulary][term] = positions
+        grouped_fuzzy = defaultdict(dict)
+        for (vocabulary, term), found in fuzzy.items():
+            if found[0]:
+                grouped_fuzzy[vocabulary][term] = found
+        return KeywordMatches(
+            dict(grouped), self.vocabularies, dict(grouped_fuzzy),
+            locate=lambda vocabulary, term: self.locate(text, vocabulary, term)
+        )
+
+    def locate(self, text, vocabulary, term):
+        """Return the sorted start offsets of a substring vocabulary term in the text"""
+        positions = set()
+        for string, whole_word in self._variants.get((vocabulary, term), ()):
+            start = text.find(string)
+            while start != -1:
+                if not whole_word or _is_whole_word(text, start, start + len(string)):
+                    positions.add(start)
+                start = text.find(string, start + 1)
+        return sorted(positions)
+
+    def _match_tokens(self, text, hits, fuzzy):
+        """Add token vocabulary hits, and the closest distance of each term, to hits and fuzzy"""
+        tokens = list(WORD_PATTERN.finditer(text))
+        correct = self._correct
+        words = [correct(token.group()) for token in tokens]
+
+        count = len(words)
+        for i in range(count):
+            if words[i] is None or words[i][0] not in self._phrase_starts:
+                continue
+            phrase = []
+            distance = 0
+            for j in range(i, min(i + self._phrase_length, count)):
+                if words[j] is None:
+                    break
+                phrase.append(words[j][0])
+                distance += words[j][1]
+                for key in self._phrases.get(tuple(phrase), ()):
+                    start = tokens[i].start()
+                    positions = hits.get(key)
+                    if positions is None:
+                        hits[key] = [start]
+                    elif positions[-1] != start:
+                        positions.append(start)
+                    if key not in fuzzy or distance < fuzzy[key][0]:
+                        fuzzy[key] = (distance, text[start:tokens[j].end()])
+
+    def _correct(self, token):
+        """Return (vocabulary word, distance) for a token, or None (cached per process)"""
+        try:
+            return self._corrections[token]
+        except KeyError:
+            pass
+        if len(self._corrections) >= 100000:
+            self._corrections.clear()
+        self._corrections[token] = self._fuzzy_index.lookup(token)
+        return self._corrections[token]
+    
+    def to_bitmap(self, matches):
+        """
+        Pack which terms were found into bytes, one bit per term_index entry
+        (positions are not kept)
+        """
+        bits = 0
+        for bit, (vocabulary, term) in enumerate(self.term_index):
+            if matches.contains(vocabulary, term):
+                bits |= 1 << bit
+        return bits.to_bytes((len(self.term_index) + 7) // 8, 'little')
+    
+    def from_bitmap(self, bitmap):
+        """Restore KeywordMatches (without positions) from to_bitmap() output"""
+        bits = int.from_bytes(bitmap, 'little')
+        hits = defaultdict(dict)
+        for bit, (vocabulary, term) in enumerate(self.term_index):
+            if bits >> bit & 1:
+                hits[vocabulary][term] = []
+        return KeywordMatches(dict(hits), self.vocabularies)
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _is_whole_word(text, start, end):
+    return not (start and _is_word_char(text[start - 1])) and \
+        not (end < len(text) and _is_word_char(text[end]))
+
+
+def _find_word(text, string):
+    """Return the offset of the first whole-word occurrence of string, or -1"""
+    start = text.find(string)
+    while start != -1 and not _is_whole_word(text, start, start + len(string)):
+        start = text.find(string, start + 1)
+    return start
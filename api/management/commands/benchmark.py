@@ -0,0 +1,72 @@
+"""
+Benchmark CV parsing, scoring and end-to-end upload latency
+
+    python manage.py benchmark --output bench.json
+    python manage.py benchmark --compare bench.json
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from api.benchmarks.corpus import generate_corpus
+from api.benchmarks.runner import STAGES, run_benchmarks, compare
+
+
+class Command(BaseCommand):
+    help = 'Benchmark CVParser, ATSScorer and the upload endpoint on a synthetic corpus'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=5,
+                            help='Documents per file type and page count')
+        parser.add_argument('--pages', default='1,2,5,20',
+                            help='Comma-separated page counts to generate')
+        parser.add_argument('--file-types', default='pdf,docx',
+                            help='Comma-separated file types to generate')
+        parser.add_argument('--seed', type=int, default=0, help='Corpus seed')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Measurements per document and stage')
+        parser.add_argument('--stages', default=','.join(STAGES),
+                            help=f"Comma-separated stages to run ({', '.join(STAGES)})")
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    
+    def handle(self, *args, **options):
+        stages = [stage for stage in options['stages'].split(',') if stage]
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise CommandError(f"Unknown stages: {', '.join(sorted(unknown))}")
+        
+        corpus = generate_corpus(
+            options['count'],
+            seed=options['seed'],
+            page_counts=[int(pages) for pages in options['pages'].split(',')],
+            file_types=options['file_types'].split(','),
+        )
+        results = run_benchmarks(corpus, stages=stages, repeat=options['repeat'])
+        results['meta'].update(
+            seed=options['seed'], pages=options['pages'], file_types=options['file_types']
+        )
+        
+        for stage, stage_results in results['stages'].items():
+            self.stdout.write(f"\n{stage}")
+            groups = {'overall': stage_results['overall'], **stage_results['groups']}
+            for group, stats in groups.items():
+                self.stdout.write(
+                    f"  {group:<24} p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  "
+                    f"p99 {stats['p99_ms']:>9.2f} ms  {stats['docs_per_sec']:>8} docs/s"
+                    + (f"  peak alloc {stats['peak_alloc_bytes']} B" if 'peak_alloc_bytes' in stats else '')
+                )
+        rss = results['peak_rss_bytes']
+        self.stdout.write(f"\npeak RSS: self {rss['self']} bytes, children {rss['children']} bytes")
+        
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+            self.stdout.write(f"\nCompared with {baseline['meta'].get('git_revision')}")
+            for stage, group, metric, before, after, change in compare(baseline, results):
+                self.stdout.write(
+                    f"  {stage:<6} {group:<24} {metric:<13} {before:>10} -> {after:>10} ({change:+.1f}%)"
+                )
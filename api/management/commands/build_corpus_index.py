@@ -0,0 +1,33 @@
+"""
+Build or update the corpus index used by POST /api/rank/
+
+    python manage.py build_corpus_index            # index new texts
+    python manage.py build_corpus_index --rebuild  # start over
+
+Run it after bulk imports, or periodically (cron) when no analysis
+workers run; idle workers otherwise keep the index caught up.
+"""
+import time
+from django.core.management.base import BaseCommand
+from api.corpus_index import get_corpus_index
+
+
+class Command(BaseCommand):
+    help = 'Index stored CV texts for ranking against job descriptions'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Discard the existing index and index every stored text')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Index at most this many new texts')
+    
+    def handle(self, *args, **options):
+        index = get_corpus_index()
+        started = time.perf_counter()
+        added = index.refresh(limit=options['limit'], rebuild=options['rebuild'])
+        elapsed = time.perf_counter() - started
+        snapshot = index.snapshot()
+        self.stdout.write(
+            f"Indexed {added} texts in {elapsed:.1f}s; {snapshot.size} texts in "
+            f"{len(snapshot.segments)} segments at {index.path}"
+        )
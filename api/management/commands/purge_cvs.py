@@ -0,0 +1,248 @@
+"""
+Apply the retention policy to stored CVs
+
+    python manage.py purge_cvs --older-than 365 --keep-latest 3
+    python manage.py purge_cvs --dry-run
+
+Deletes uploads (with their analyses, texts, features, search entries and
+jobs) older than the age limit, and all but the newest N uploads of the
+same content. Rows are deleted in small batches, each in its own short
+transaction, with a pause in between so uploads are not blocked. Stored
+files no upload refers to are then removed, and SQLite space is given
+back with an incremental vacuum.
+
+Suitable for cron, e.g. nightly:
+
+    0 3 * * * cd /srv/cv-rater && python manage.py purge_cvs
+"""
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from api.models import CVUpload, ATSAnalysis
+from api.corpus_index import get_corpus_index
+from api.search import compact_index
+from api.storage import get_cv_storage
+
+# Uploads still being analyzed are never purged
+ACTIVE_STATUSES = [ATSAnalysis.STATUS_PENDING, ATSAnalysis.STATUS_RUNNING]
+
+# SQLite PRAGMA auto_vacuum values
+AUTO_VACUUM_NONE = 0
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class Command(BaseCommand):
+    help = 'Delete old and redundant CV uploads, orphaned files and free database space'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=settings.CV_RETENTION_DAYS,
+                            help='Delete uploads older than this many days (0 to keep all)')
+        parser.add_argument('--keep-latest', type=int, default=settings.CV_RETENTION_KEEP_PER_HASH,
+                            help='Keep only the newest N uploads of identical content (0 to keep all)')
+        parser.add_argument('--batch-size', type=int, default=settings.CV_PURGE_BATCH_SIZE,
+                            help='Uploads deleted per transaction')
+        parser.add_argument('--pause', type=float, default=settings.CV_PURGE_PAUSE,
+                            help='Seconds to wait between batches')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be deleted')
+        parser.add_argument('--skip-orphans', action='store_true',
+                            help='Do not look for stored files without an upload')
+        parser.add_argument('--vacuum', choices=['auto', 'full', 'none'], default='auto',
+                            help='auto: incremental vacuum if enabled; full: enable it with a '
+                                 'one-off VACUUM (locks the database while it runs)')
+        parser.add_argument('--rebuild-index', action='store_true',
+                            help='Rebuild the corpus index if any analysis was deleted')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        self.options = options
+        dry_run = options['dry_run']
+        deleted = 0
+
+        if options['older_than'] > 0:
+            cutoff = timezone.now() - timedelta(days=options['older_than'])
+            expired = (
+                CVUpload.objects
+                .filter(uploaded_at__lt=cutoff)
+                .exclude(analysis__status__in=ACTIVE_STATUSES)
+            )
+            if dry_run:
+                self.stdout.write(f"Would delete {expired.count()} uploads older than {cutoff:%Y-%m-%d}")
+            else:
+                deleted += self._delete_in_batches(
+                    f"uploads older than {cutoff:%Y-%m-%d}",
+                    lambda limit: list(
+                        expired.order_by('uploaded_at').values_list('pk', flat=True)[:limit]
+                    )
+                )
+
+        if options['keep_latest'] > 0:
+            deleted += self._purge_duplicates(options['keep_latest'], dry_run)
+
+        if not options['skip_orphans']:
+            self._purge_orphans(dry_run)
+
+        if dry_run:
+            return
+        if deleted:
+            compacted = compact_index()
+            if compacted:
+                self.stdout.write(f"Compacted the search index in {compacted} steps")
+            if options['rebuild_index']:
+                added = get_corpus_index().refresh(rebuild=True)
+                self.stdout.write(f"Rebuilt the corpus index with {added} texts")
+            else:
+                self.stdout.write(
+                    "Deleted analyses are skipped by /api/rank/ but stay in the corpus index "
+                    "until `build_corpus_index --rebuild` (or --rebuild-index)"
+                )
+        if options['vacuum'] != 'none':
+            self._vacuum(options['vacuum'] == 'full')
+
+    def _delete_in_batches(self, label, next_batch):
+        """
+        Delete uploads batch by batch until next_batch(limit) returns none
+
+        Returns:
+            Number of uploads deleted
+        """
+        deleted = 0
+        started = time.perf_counter()
+        while True:
+            ids = next_batch(self.options['batch_size'])
+            if not ids:
+                break
+            # Short transactions: the write lock is released after every batch
+            with transaction.atomic():
+                CVUpload.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+            self.stdout.write(f"  {label}: deleted {deleted} ({time.perf_counter() - started:.1f}s)")
+            time.sleep(self.options['pause'])
+        self.stdout.write(f"Deleted {deleted} {label}")
+        return deleted
+
+    def _purge_duplicates(self, keep, dry_run):
+        """Delete all but the newest `keep` uploads of each content hash"""
+        duplicated = list(
+            CVUpload.objects
+            .exclude(content_hash='')
+            .values('content_hash')
+            .annotate(uploads=Count('pk'))
+            .filter(uploads__gt=keep)
+            .values_list('content_hash', 'uploads')
+        )
+        excess = sum(uploads - keep for _, uploads in duplicated)
+        label = f"uploads beyond the newest {keep} of identical content"
+        if dry_run:
+            self.stdout.write(f"Would delete {excess} {label}")
+            return 0
+
+        hashes = iter(content_hash for content_hash, _ in duplicated)
+
+        def next_batch(limit):
+            ids = []
+            for content_hash in hashes:
+                ids.extend(
+                    CVUpload.objects
+                    .filter(content_hash=content_hash)
+                    .exclude(analysis__status__in=ACTIVE_STATUSES)
+                    .order_by('-uploaded_at')
+                    .values_list('pk', flat=True)[keep:]
+                )
+                if len(ids) >= limit:
+                    break
+            return ids
+
+        return self._delete_in_batches(label, next_batch)
+
+    def _purge_orphans(self, dry_run):
+        """
+        Remove stored files no upload refers to
+
+        Files modified within CV_PURGE_ORPHAN_GRACE seconds are kept: an
+        upload stores its file before its row is saved.
+        """
+        storage = get_cv_storage()
+        root = storage.path(storage.prefix)
+        grace_cutoff = time.time() - settings.CV_PURGE_ORPHAN_GRACE
+        removed = 0
+        freed = 0
+
+        def sweep(names):
+            nonlocal removed, freed
+            referenced = set(
+                CVUpload.objects.filter(file__in=names).values_list('file', flat=True)
+            )
+            for name in names:
+                if name in referenced:
+                    continue
+                path = storage.path(name)
+                try:
+                    info = os.stat(path)
+                    if info.st_mtime >= grace_cutoff:
+                        continue
+                    if not dry_run:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed += info.st_size
+
+        names = []
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                names.append(os.path.relpath(path, storage.location).replace(os.sep, '/'))
+                if len(names) >= 1000:
+                    sweep(names)
+                    names = []
+        if names:
+            sweep(names)
+
+        verb = 'Would remove' if dry_run else 'Removed'
+        self.stdout.write(f"{verb} {removed} orphaned files ({freed / 1024 / 1024:.1f} MiB)")
+
+    def _vacuum(self, full):
+        """Give free database pages back to the file system (SQLite only)"""
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            if full:
+                self.stdout.write("Running VACUUM with auto_vacuum=INCREMENTAL (database locked)...")
+                cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                cursor.execute('VACUUM')
+                self.stdout.write("VACUUM done")
+                return
+
+            cursor.execute('PRAGMA auto_vacuum')
+            mode = cursor.fetchone()[0]
+            if mode == AUTO_VACUUM_NONE:
+                self.stdout.write(
+                    "Incremental vacuum is not enabled for this database; run once with "
+                    "--vacuum full to enable it"
+                )
+                return
+            if mode != AUTO_VACUUM_INCREMENTAL:
+                return  # auto_vacuum FULL frees pages on every commit
+
+            cursor.execute('PRAGMA freelist_count')
+            free_pages = cursor.fetchone()[0]
+            released = 0
+            while free_pages:
+                # Each step is a short write; the rows must be read for it to run
+                cursor.execute('PRAGMA incremental_vacuum(%d)' % settings.CV_PURGE_VACUUM_PAGES)
+                cursor.fetchall()
+                cursor.execute('PRAGMA freelist_count')
+                remaining = cursor.fetchone()[0]
+                if remaining >= free_pages:
+                    break
+                released += free_pages - remaining
+                free_pages = remaining
+                time.sleep(self.options['pause'])
+            self.stdout.write(f"Incremental vacuum released {released} pages")
@@ -0,0 +1,187 @@
+"""
+Re-score stored analyses with the current ATSScorer
+
+    python manage.py rescore --workers 4
+
+Only analyses whose scorer_version differs from ATSScorer.scorer_version()
+are processed, so an interrupted run simply resumes where it stopped.
+Analyses stored without features or full text are re-parsed from their
+file (whose text is then stored and indexed for search), or scored from their first 5000
+characters if the file is gone, so they are not selected again.
+"""
+import time
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from api.ats_scorer import ATSScorer
+from api.models import ATSAnalysis, ExtractedText, CVFeatures
+from api.storage import get_cv_storage
+from api.process_pool import rescore_stored
+from api.search import index_texts
+from api.services import SCORE_FIELDS, analysis_fields
+
+UPDATE_FIELDS = [*SCORE_FIELDS, 'scorer_version']
+FEATURE_FIELDS = [
+    field.name for field in CVFeatures._meta.concrete_fields if field.name != 'analysis'
+]
+
+
+class Command(BaseCommand):
+    help = 'Re-score stored analyses from their feature records or stored texts'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.CV_PROCESS_POOL_WORKERS,
+                            help='Worker processes (0 to score in this process)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database per chunk')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows written back per transaction')
+        parser.add_argument('--all', action='store_true',
+                            help='Also re-score analyses already at the current scorer version')
+        parser.add_argument('--after', default=None,
+                            help='Resume an --all run after this analysis id')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Stop after this many analyses')
+    
+    def handle(self, *args, **options):
+        version = ATSScorer.scorer_version()
+        queryset = ATSAnalysis.objects.filter(status=ATSAnalysis.STATUS_DONE)
+        if not options['all']:
+            queryset = queryset.exclude(scorer_version=version)
+        if options['after']:
+            queryset = queryset.filter(pk__gt=options['after'])
+        queryset = queryset.order_by('pk')
+        
+        total = queryset.count()
+        if options['limit'] is not None:
+            total = min(total, options['limit'])
+        self.stdout.write(f"Re-scoring {total} analyses to scorer version {version}")
+        if not total:
+            return
+        
+        rows = (
+            queryset
+            .select_related('features')
+            .only('pk', *[f'features__{name}' for name in FEATURE_FIELDS])
+            .iterator(chunk_size=options['chunk_size'])
+        )
+        
+        self.processed = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self.total = total
+        
+        executor = None
+        if options['workers'] > 0:
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=options['workers'])
+        try:
+            chunk = []
+            for analysis in islice(rows, total):
+                chunk.append(analysis)
+                if len(chunk) >= options['chunk_size']:
+                    self._process_chunk(chunk, executor, options['batch_size'])
+                    chunk = []
+            if chunk:
+                self._process_chunk(chunk, executor, options['batch_size'])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            f"Done: {self.processed} re-scored, {self.failed} skipped in {elapsed:.1f}s "
+            f"({self.processed / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+    
+    def _process_chunk(self, chunk, executor, batch_size):
+        by_id = {analysis.pk: analysis for analysis in chunk}
+        
+        # Full text is only needed where the feature record is missing or stale
+        records = {}
+        stale_ids = []
+        for analysis in chunk:
+            record = analysis.features if _has_features(analysis) else None
+            records[analysis.pk] = record
+            if record is None or not ATSScorer.features_current(record):
+                stale_ids.append(analysis.pk)
+        texts = dict(
+            ExtractedText.objects.filter(analysis_id__in=stale_ids).values_list('analysis_id', 'data')
+        )
+        # Neither current features nor full text: fall back to the file
+        storage = get_cv_storage()
+        sources = {
+            pk: (storage.path(file) if file else None, file_type, extracted_text)
+            for pk, file, file_type, extracted_text in (
+                ATSAnalysis.objects
+                .filter(pk__in=[pk for pk in stale_ids if pk not in texts])
+                .values_list('pk', 'cv_upload__file', 'cv_upload__file_type', 'extracted_text')
+            )
+        }
+        
+        jobs = [(pk, records[pk], texts.get(pk), sources.get(pk)) for pk in by_id]
+        if executor is None:
+            outcomes = [rescore_stored(*job) for job in jobs]
+        else:
+            outcomes = executor.map(rescore_stored, *zip(*jobs), chunksize=64)
+        
+        updated = []
+        new_features = []
+        new_texts = []
+        for analysis_id, analysis_results, feature_fields, recovered_text in outcomes:
+            analysis = by_id[analysis_id]
+            if analysis_results is None:
+                self.failed += 1
+                self.stderr.write(feature_fields)
+                continue
+            for field, value in analysis_fields(analysis_results).items():
+                setattr(analysis, field, value)
+            analysis.scorer_version = ATSScorer.scorer_version()
+            updated.append(analysis)
+            if feature_fields is not None:
+                new_features.append(CVFeatures(analysis_id=analysis_id, **feature_fields))
+            if recovered_text is not None:
+                new_texts.append((analysis, recovered_text))
+            
+            if len(updated) >= batch_size:
+                self._write_batch(updated, new_features, new_texts)
+                updated, new_features, new_texts = [], [], []
+        if updated:
+            self._write_batch(updated, new_features, new_texts)
+    
+    def _write_batch(self, analyses, features, texts):
+        # One short transaction per batch keeps SQLite write locks brief
+        with transaction.atomic():
+            ATSAnalysis.objects.bulk_update(analyses, UPDATE_FIELDS)
+            # Texts recovered from the file of analyses stored without one
+            ExtractedText.objects.bulk_create(
+                [ExtractedText.from_text(analysis, text) for analysis, text in texts],
+                ignore_conflicts=True
+            )
+            index_texts(texts)
+            if features:
+                CVFeatures.objects.bulk_create(
+                    features,
+                    update_conflicts=True,
+                    unique_fields=['analysis'],
+                    update_fields=FEATURE_FIELDS,
+                )
+        self.processed += len(analyses)
+        
+        elapsed = time.perf_counter() - self.started
+        rate = self.processed / elapsed if elapsed else 0
+        remaining = (self.total - self.processed - self.failed) / rate if rate else 0
+        self.stdout.write(
+            f"  {self.processed}/{self.total} ({rate:.0f} rows/s, ~{remaining:.0f}s left)"
+            f" last id {analyses[-1].pk}"
+        )
+
+
+def _has_features(analysis):
+    try:
+        analysis.features
+    except CVFeatures.DoesNotExist:
+        return False
+    return True
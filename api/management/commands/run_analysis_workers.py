@@ -0,0 +1,84 @@
+"""
+Run a pool of local worker processes that process queued CV analyses
+
+    python manage.py run_analysis_workers --workers 4
+"""
+import multiprocessing
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker_main(stop_event, poll_interval):
+    """Entry point of a worker process"""
+    # Never share the parent's database connections with a forked child
+    connections.close_all()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    
+    from api.jobs import run_worker
+    from api.parse_sandbox import close_parse_sandbox
+    try:
+        run_worker(stop_event=stop_event, poll_interval=poll_interval)
+    finally:
+        # Stop the sandbox processes here rather than relying on
+        # multiprocessing's exit handler
+        close_parse_sandbox()
+
+
+class Command(BaseCommand):
+    help = 'Process queued CV analyses with a pool of local worker processes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.CV_ANALYSIS_WORKERS,
+            help='Number of worker processes'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.CV_JOB_POLL_INTERVAL,
+            help='Seconds a worker sleeps when the queue is empty'
+        )
+    
+    def handle(self, *args, **options):
+        worker_count = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        stop_event = multiprocessing.Event()
+        
+        def request_stop(*args):
+            stop_event.set()
+        
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+        
+        connections.close_all()
+        workers = [self._start_worker(stop_event, poll_interval) for _ in range(worker_count)]
+        self.stdout.write(f"Started {worker_count} analysis workers")
+        
+        # Supervise: replace workers that died (e.g. killed by the OOM killer)
+        while not stop_event.is_set():
+            for index, process in enumerate(workers):
+                if not process.is_alive():
+                    self.stderr.write(
+                        f"Worker {process.pid} exited with code {process.exitcode}, restarting"
+                    )
+                    workers[index] = self._start_worker(stop_event, poll_interval)
+            time.sleep(1)
+        
+        for process in workers:
+            process.join(timeout=settings.CV_JOB_STALE_SECONDS)
+            if process.is_alive():
+                # SIGTERM only sets the stop event a stuck worker is not checking
+                process.kill()
+                process.join()
+        self.stdout.write("Analysis workers stopped")
+    
+    def _start_worker(self, stop_event, poll_interval):
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(stop_event, poll_interval),
+            daemon=False  # May start pool workers for page-parallel PDF extraction
+        )
+        process.start()
+        return process
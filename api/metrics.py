@@ -0,0 +1,231 @@
+"""
+Metrics
+Per-request stage timing and Prometheus text exposition
+
+Metrics are kept in memory per process; with several gunicorn workers
+each worker reports its own counters and histograms.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+    
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+    
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            values = [((), 0)]
+        for labelvalues, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Current value that can go up and down, with optional labels"""
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+    
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+    
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            values = [((), 0)]
+        for labelvalues, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # labelvalues -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+    
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted(
+                (labelvalues, list(counts), total, count)
+                for labelvalues, (counts, total, count) in self._series.items()
+            )
+        for labelvalues, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, ('le', _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render_metrics():
+    """Render every registered metric in the Prometheus text format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Upload pipeline metrics
+UPLOADS = Counter('cv_uploads_total', 'CV uploads received, by file type', ['file_type'])
+UPLOAD_ERRORS = Counter('cv_upload_errors_total', 'CV uploads that failed, by reason', ['reason'])
+CACHE_HITS = Counter('cv_analysis_cache_hits_total', 'Uploads answered from the content-hash cache')
+ANALYSIS_READS = Counter(
+    'cv_analysis_reads_total', 'Analysis reads, by source (not_modified, cache, database)', ['source']
+)
+STAGE_SECONDS = Histogram(
+    'cv_stage_duration_seconds', 'Time spent in each upload pipeline stage', ['stage']
+)
+PARSE_PEAK_MEMORY = Histogram(
+    'cv_parse_peak_memory_bytes', 'Peak memory reported for each parse',
+    buckets=[2 ** power for power in range(20, 32)]  # 1 MiB .. 2 GiB
+)
+
+
+# Admission control (api/admission.py)
+ADMISSION_ACTIVE = Gauge('cv_admission_active', 'Requests holding an admission slot', ['stage'])
+ADMISSION_QUEUED = Gauge('cv_admission_queued', 'Requests waiting for an admission slot', ['stage'])
+ADMISSION_WAIT_SECONDS = Histogram(
+    'cv_admission_wait_seconds', 'Time admitted requests waited for a slot', ['stage']
+)
+ADMISSION_REJECTIONS = Counter(
+    'cv_admission_rejections_total', 'Requests shed with 503, by reason (queue_full, timeout)',
+    ['stage', 'reason']
+)
+
+
+# Group commit (api/group_commit.py)
+GROUP_COMMIT_BATCH = Histogram(
+    'cv_group_commit_batch_size', 'Writes committed together in one transaction',
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256]
+)
+GROUP_COMMIT_WAIT_SECONDS = Histogram(
+    'cv_group_commit_wait_seconds', 'Time from submitting a write to its commit'
+)
+
+
+class StageTimer:
+    """
+    Records how long each stage of one request takes
+
+    Durations are observed into STAGE_SECONDS as they complete and can be
+    rendered as a Server-Timing header.
+    """
+    
+    def __init__(self):
+        self.timings = []  # (stage, seconds) in completion order
+        self._started = time.perf_counter()
+    
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+    
+    def record(self, name, seconds):
+        self.timings.append((name, seconds))
+        STAGE_SECONDS.observe(seconds, name)
+    
+    def finish(self):
+        """Record the total request time under the 'total' stage"""
+        self.record('total', time.perf_counter() - self._started)
+    
+    def server_timing_header(self):
+        return ', '.join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.timings)
+    
+    def apply(self, response):
+        """Finish timing and attach the Server-Timing header to a response"""
+        self.finish()
+        response['Server-Timing'] = self.server_timing_header()
+        return response
+
+
+class NullTimer:
+    """StageTimer stand-in that records nothing"""
+    
+    @contextmanager
+    def stage(self, name):
+        yield
+
+
+NULL_TIMER = NullTimer()
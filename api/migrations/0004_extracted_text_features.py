@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-18 04:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_analysis_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CVFeatures',
+            fields=[
+                ('analysis', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='features', serialize=False, to='api.atsanalysis')),
+                ('vocabulary_version', models.CharField(max_length=16)),
+                ('keyword_bitmap', models.BinaryField()),
+                ('section_flags', models.IntegerField(default=0)),
+                ('skill_count', models.IntegerField(default=0)),
+                ('action_verb_count', models.IntegerField(default=0)),
+                ('word_count', models.IntegerField(default=0)),
+                ('nonblank_line_count', models.IntegerField(default=0)),
+                ('bullet_count', models.IntegerField(default=0)),
+                ('metric_count', models.IntegerField(default=0)),
+                ('email', models.CharField(blank=True, max_length=254)),
+                ('phone', models.CharField(blank=True, max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExtractedText',
+            fields=[
+                ('analysis', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='full_text', serialize=False, to='api.atsanalysis')),
+                ('data', models.BinaryField()),
+                ('length', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
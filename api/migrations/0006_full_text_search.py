@@ -0,0 +1,65 @@
+# Generated by Django 6.0.2 on 2026-10-18 04:50
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# SQLite only: other databases get the SearchDocument table but no index
+FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE api_cv_fts USING fts5(
+        text, tokenize = "porter unicode61 tokenchars '+#'"
+    )
+    """,
+    """
+    CREATE TRIGGER api_searchdocument_fts_delete
+    AFTER DELETE ON api_searchdocument
+    BEGIN
+        DELETE FROM api_cv_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_SQL:
+        schema_editor.execute(statement)
+    
+    # Index the texts stored so far
+    ExtractedText = apps.get_model('api', 'ExtractedText')
+    SearchDocument = apps.get_model('api', 'SearchDocument')
+    for stored in ExtractedText.objects.only('analysis_id', 'data').iterator(chunk_size=500):
+        document = SearchDocument.objects.create(analysis_id=stored.analysis_id)
+        schema_editor.execute(
+            'INSERT INTO api_cv_fts (rowid, text) VALUES (%s, %s)',
+            [document.id, zlib.decompress(bytes(stored.data)).decode('utf-8')]
+        )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TRIGGER IF EXISTS api_searchdocument_fts_delete')
+    schema_editor.execute('DROP TABLE IF EXISTS api_cv_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_extracted_text_stored_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('analysis', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='api.atsanalysis')),
+            ],
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_full_text_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atsanalysis',
+            index=models.Index(fields=['status', '-analyzed_at', '-id'], name='api_analysis_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atsanalysis',
+            index=models.Index(fields=['status', '-overall_score', '-analyzed_at', '-id'], name='api_analysis_score_idx'),
+        ),
+    ]
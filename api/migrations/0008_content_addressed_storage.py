@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 05:00
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cvupload',
+            name='file',
+            field=models.FileField(storage=api.storage.get_cv_storage, upload_to='cvs/'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cvupload',
+            index=models.Index(fields=['uploaded_at'], name='api_cvupload_uploaded_idx'),
+        ),
+    ]
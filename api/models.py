@@ -1,14 +1,17 @@
 from django.db import models
 from django.utils import timezone
 import uuid
+import zlib
+from .storage import get_cv_storage
 
 
 class CVUpload(models.Model):
     """Model to store uploaded CV files"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    file = models.FileField(upload_to='cvs/')
+    file = models.FileField(upload_to='cvs/', storage=get_cv_storage)  # cvs/ab/cd/<sha256>.<ext>, shared by identical uploads
     filename = models.CharField(max_length=255)
     file_type = models.CharField(max_length=10)  # pdf or docx
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 hex
     uploaded_at = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
@@ -16,10 +19,33 @@ class CVUpload(models.Model):
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Retention (manage.py purge_cvs) removes the oldest uploads first
+            models.Index(fields=['uploaded_at'], name='api_cvupload_uploaded_idx'),
+        ]
 
 
 class ATSAnalysis(models.Model):
     """Model to store ATS analysis results"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    # score_category labels and the lowest overall_score of each, best first
+    SCORE_CATEGORIES = [
+        ('Excellent', 80),
+        ('Good', 65),
+        ('Fair', 50),
+        ('Needs Improvement', 0),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     cv_upload = models.OneToOneField(CVUpload, on_delete=models.CASCADE, related_name='analysis')
     
@@ -44,6 +70,9 @@ class ATSAnalysis(models.Model):
     
     # Analysis metadata
     analyzed_at = models.DateTimeField(default=timezone.now)
+    scorer_version = models.CharField(max_length=32, blank=True, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_DONE)
+    error_message = models.TextField(blank=True)
     
     def __str__(self):
         return f"Analysis for {self.cv_upload.filename} - Score: {self.overall_score}"
@@ -51,14 +80,140 @@ class ATSAnalysis(models.Model):
     @property
     def score_category(self):
         """Return score interpretation"""
-        if self.overall_score >= 80:
-            return "Excellent"
-        elif self.overall_score >= 65:
-            return "Good"
-        elif self.overall_score >= 50:
-            return "Fair"
-        else:
-            return "Needs Improvement"
+        for category, minimum in self.SCORE_CATEGORIES:
+            if self.overall_score >= minimum:
+                return category
+        return self.SCORE_CATEGORIES[-1][0]
+    
+    @classmethod
+    def score_range(cls, category):
+        """
+        Return the (min, max) overall_score of a score_category label
+        (max is None for the top category), or None for an unknown label
+        """
+        maximum = None
+        for label, minimum in cls.SCORE_CATEGORIES:
+            if label.lower() == category.lower():
+                return minimum, maximum
+            maximum = minimum - 1
+        return None
+    
+    def get_full_text(self):
+        """Return the full extracted text (loads the compressed copy), or None"""
+        try:
+            return self.full_text.get_text()
+        except ExtractedText.DoesNotExist:
+            return None
     
     class Meta:
         ordering = ['-analyzed_at']
+        # Listing (GET /api/analyses/) orders by these columns and pages
+        # with keyset cursors, so each page is a range scan of one index
+        indexes = [
+            models.Index(fields=['status', '-analyzed_at', '-id'], name='api_analysis_recent_idx'),
+            models.Index(
+                fields=['status', '-overall_score', '-analyzed_at', '-id'],
+                name='api_analysis_score_idx'
+            ),
+        ]
+
+
+class ExtractedText(models.Model):
+    """Full extracted text of an analysis, zlib-compressed and loaded on demand"""
+    analysis = models.OneToOneField(
+        ATSAnalysis, on_delete=models.CASCADE, primary_key=True, related_name='full_text'
+    )
+    data = models.BinaryField()
+    length = models.IntegerField(default=0)  # characters before compression
+    # Lets the corpus index (api/corpus_index.py) find texts added since its last update
+    stored_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    @classmethod
+    def from_text(cls, analysis, text):
+        """Return an unsaved ExtractedText holding the compressed text"""
+        return cls(
+            analysis=analysis,
+            data=zlib.compress(text.encode('utf-8'), 6),
+            length=len(text)
+        )
+    
+    def get_text(self):
+        return zlib.decompress(bytes(self.data)).decode('utf-8')
+    
+    def __str__(self):
+        return f"Text of analysis {self.analysis_id} ({self.length} chars)"
+
+
+class SearchDocument(models.Model):
+    """
+    Full-text search entry of an analysis
+    
+    Its integer id is the rowid of the analysis's text in the SQLite FTS5
+    table (see api/search.py); deleting the row removes the text from the
+    index through a trigger.
+    """
+    analysis = models.OneToOneField(
+        ATSAnalysis, on_delete=models.CASCADE, related_name='search_document'
+    )
+    
+    def __str__(self):
+        return f"Search entry {self.id} of analysis {self.analysis_id}"
+
+
+class CVFeatures(models.Model):
+    """
+    Compact scoring inputs of an analysis
+    
+    Enough to recompute every ATSScorer score (ATSScorer.from_features)
+    without the original file or its text, as long as vocabulary_version
+    matches the scorer's current vocabularies.
+    """
+    analysis = models.OneToOneField(
+        ATSAnalysis, on_delete=models.CASCADE, primary_key=True, related_name='features'
+    )
+    vocabulary_version = models.CharField(max_length=16)
+    keyword_bitmap = models.BinaryField()  # one bit per KeywordMatcher.term_index entry
+    section_flags = models.IntegerField(default=0)  # one bit per CVParser.SECTION_KEYWORDS entry
+    skill_count = models.IntegerField(default=0)
+    action_verb_count = models.IntegerField(default=0)
+    word_count = models.IntegerField(default=0)
+    nonblank_line_count = models.IntegerField(default=0)
+    bullet_count = models.IntegerField(default=0)
+    metric_count = models.IntegerField(default=0)
+    email = models.CharField(max_length=254, blank=True)
+    phone = models.CharField(max_length=50, blank=True)
+    
+    @property
+    def has_email(self):
+        return bool(self.email)
+    
+    @property
+    def has_phone(self):
+        return bool(self.phone)
+    
+    def __str__(self):
+        return f"Features of analysis {self.analysis_id}"
+
+
+class AnalysisJob(models.Model):
+    """Queue entry for an analysis processed by the local worker pool"""
+    analysis = models.OneToOneField(ATSAnalysis, on_delete=models.CASCADE, related_name='job')
+    status = models.CharField(
+        max_length=10,
+        choices=ATSAnalysis.STATUS_CHOICES,
+        default=ATSAnalysis.STATUS_PENDING
+    )
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)  # host:pid of the claiming worker
+    created_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Job for analysis {self.analysis_id} - {self.status}"
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
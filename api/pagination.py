@@ -0,0 +1,115 @@
+"""
+Keyset Pagination
+Cursor-based paging over a fixed, unique ordering, without OFFSET
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed or belongs to another ordering"""
+    pass
+
+
+class KeysetPagination:
+    """
+    Pages a queryset by the values of the last row seen
+
+    The ordering must end in a unique field and use only descending fields,
+    e.g. ('-analyzed_at', '-id'). A page continues after the cursor row with
+    a condition the ordering index can seek to, so every page costs the
+    same however deep it is.
+    """
+
+    def __init__(self, name, ordering):
+        """
+        Args:
+            name: Ordering name, stored in cursors to reject mixing orderings
+            ordering: Descending field names, e.g. ('-analyzed_at', '-id')
+        """
+        self.name = name
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+
+    def paginate(self, queryset, cursor=None, limit=20):
+        """
+        Return one page of a queryset
+
+        Args:
+            queryset: Filtered queryset (ordering is applied here)
+            cursor: next_cursor of the previous page, or None for the first
+            limit: Page size
+
+        Returns:
+            (list of rows, next cursor or None if this is the last page)
+
+        Raises:
+            InvalidCursor: The cursor cannot be decoded
+        """
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self._decode(cursor, queryset.model)))
+        rows = list(queryset[:limit + 1])
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self._encode([getattr(rows[-1], field) for field in self.fields])
+
+    def _after(self, values):
+        """Condition selecting rows after the cursor row in descending order"""
+        # (a < x) OR (a = x AND b < y) OR ...
+        after = Q()
+        for position, field in enumerate(self.fields):
+            term = Q(**{f'{field}__lt': values[position]})
+            for previous, value in zip(self.fields[:position], values):
+                term &= Q(**{previous: value})
+            after |= term
+        # The redundant bound on the first field gives the index a start point
+        return Q(**{f'{self.fields[0]}__lte': values[0]}) & after
+
+    def _encode(self, values):
+        payload = [self.name] + [_dump_value(value) for value in values]
+        return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+    def _decode(self, cursor, model):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, UnicodeError) as e:
+            raise InvalidCursor('Invalid cursor') from e
+        if not isinstance(payload, list) or len(payload) != len(self.fields) + 1 or payload[0] != self.name:
+            raise InvalidCursor('Cursor does not belong to this ordering')
+        # Values become the field's type here, so a cursor holding the wrong
+        # types is rejected rather than failing inside the query
+        try:
+            return [
+                _load_value(value, model._meta.get_field(field))
+                for field, value in zip(self.fields, payload[1:])
+            ]
+        except (TypeError, ValueError, ValidationError) as e:
+            raise InvalidCursor('Invalid cursor') from e
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {'uuid': str(value)}
+    return value
+
+
+def _load_value(value, field):
+    if isinstance(value, dict) and 'datetime' in value:
+        value = datetime.fromisoformat(value['datetime'])
+    elif isinstance(value, dict) and 'uuid' in value:
+        value = uuid.UUID(value['uuid'])
+    elif not isinstance(value, (int, str)) or isinstance(value, bool):
+        raise ValueError(f'Unsupported cursor value {value!r}')
+    # Raises ValidationError (or TypeError) if the value does not fit the field
+    value = field.to_python(value)
+    if value is None:
+        raise ValueError(f'Unsupported cursor value {value!r}')
+    return value
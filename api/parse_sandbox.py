@@ -0,0 +1,250 @@
+"""
+Parse Sandbox
+Runs CV parsing in reusable child processes with time and memory limits
+"""
+import io
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .cv_parser import CVParser, ParseResult
+from .ats_scorer import ATSScorer
+from .admission import Overloaded
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+class ParseLimitExceeded(Exception):
+    """Raised when a document exceeds the parse time or memory limit"""
+
+
+def _sandbox_main(conn, memory_limit):
+    """Entry point of a sandbox process: parse documents until told to stop"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Forked children inherit the parent's handlers (an analysis worker's
+    # SIGTERM only sets its stop event), so terminate() could not stop them
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if resource is not None and memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        
+        task, data, file_type = message
+        try:
+            # Pool workers would outlive a killed sandbox process and escape
+            # its timeout, so page-parallel extraction stays off here
+            result = CVParser.extract(io.BytesIO(data), file_type, parallel=False)
+            if task == 'analyze':
+                scorer = ATSScorer(result.text)
+                result = (
+                    result.text, scorer.calculate_overall_score(),
+                    ATSScorer.feature_fields(scorer.document)
+                )
+            conn.send(('ok', tuple(result)))
+        except MemoryError:
+            conn.send(('memory', None))
+            return  # Exit so the parent starts a process with a clean heap
+        except ValueError as e:
+            conn.send(('invalid', str(e)))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+
+class _SandboxProcess:
+    """One child process and the parent's end of its pipe"""
+    
+    def __init__(self, memory_limit):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_sandbox_main,
+            args=(child_conn, memory_limit),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+    
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ParseSandbox:
+    """
+    Pool of reusable parse processes
+    
+    Each document is sent to an idle process and must finish within the
+    wall-clock timeout; the process address space is capped with
+    RLIMIT_AS. A process that times out, runs out of memory or crashes is
+    killed and replaced, and the caller gets ParseLimitExceeded. A caller
+    that finds every process busy waits at most `wait_timeout` seconds
+    for one.
+    """
+    
+    def __init__(self, size, timeout, memory_limit, wait_timeout=None):
+        """
+        Args:
+            size: Number of sandbox processes
+            timeout: Wall-clock seconds allowed per document
+            memory_limit: Address space limit in bytes (0 to disable)
+            wait_timeout: Seconds to wait for an idle process (defaults
+                to timeout, the longest a busy process can take)
+        """
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.wait_timeout = timeout if wait_timeout is None else wait_timeout
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(_SandboxProcess(memory_limit))
+    
+    def parse(self, data, file_type):
+        """
+        Parse raw file bytes in a sandbox process
+        
+        Returns:
+            ParseResult
+        
+        Raises:
+            ParseLimitExceeded: The document hit the time or memory limit
+            Overloaded: No sandbox process became idle within wait_timeout
+            ValueError: Unsupported file type
+            Exception: Any other parse error
+        """
+        return ParseResult(*self._run('parse', data, file_type))
+    
+    def analyze(self, data, file_type):
+        """
+        Parse and score raw file bytes in a sandbox process
+        
+        Returns:
+            (extracted_text, analysis_results, feature_fields) tuple
+        
+        Raises:
+            Same as parse()
+        """
+        return self._run('analyze', data, file_type)
+    
+    def _run(self, task, data, file_type):
+        """Send one document to an idle process and return its result payload"""
+        try:
+            worker = self._idle.get(timeout=self.wait_timeout)
+        except queue.Empty:
+            raise Overloaded(
+                'No parse process became free in time, please retry later',
+                settings.CV_PARSE_RETRY_AFTER
+            ) from None
+        try:
+            worker.conn.send((task, data, file_type))
+            if not worker.conn.poll(self.timeout):
+                worker = self._replace(worker)
+                raise ParseLimitExceeded(
+                    f'Document took longer than {self.timeout} seconds to parse'
+                )
+            outcome, payload = worker.conn.recv()
+            if outcome == 'memory':
+                worker = self._replace(worker)
+        except (EOFError, OSError):
+            worker = self._replace(worker)
+            raise ParseLimitExceeded('Document could not be parsed within the resource limits')
+        finally:
+            self._idle.put(worker)
+        
+        if outcome == 'ok':
+            return payload
+        if outcome == 'memory':
+            raise ParseLimitExceeded('Document exceeded the parse memory limit')
+        if outcome == 'invalid':
+            raise ValueError(payload)
+        raise Exception(payload)
+    
+    def _replace(self, worker):
+        """Kill a misbehaving process and return a fresh one"""
+        logger.warning("Restarting parse sandbox process %s", worker.process.pid)
+        worker.kill()
+        return _SandboxProcess(self.memory_limit)
+    
+    def close(self):
+        """Stop all sandbox processes"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            worker.kill()
+
+
+_sandboxes = {}  # 'parse' or 'batch' -> ParseSandbox
+_sandbox_lock = threading.Lock()
+
+
+def get_parse_sandbox():
+    """Return this process's parse sandbox, starting it on first use"""
+    with _sandbox_lock:
+        if 'parse' not in _sandboxes:
+            _sandboxes['parse'] = ParseSandbox(
+                size=settings.CV_SANDBOX_WORKERS,
+                timeout=settings.CV_SANDBOX_TIMEOUT,
+                memory_limit=settings.CV_SANDBOX_MEMORY_LIMIT
+            )
+        return _sandboxes['parse']
+
+
+def get_batch_sandbox():
+    """Return this process's sandbox for batch uploads, starting it on first use"""
+    with _sandbox_lock:
+        if 'batch' not in _sandboxes:
+            _sandboxes['batch'] = ParseSandbox(
+                size=settings.CV_BATCH_WORKERS,
+                timeout=settings.CV_BATCH_DOCUMENT_TIMEOUT,
+                memory_limit=settings.CV_SANDBOX_MEMORY_LIMIT
+            )
+        return _sandboxes['batch']
+
+
+def close_parse_sandbox():
+    """Stop this process's sandboxes, if they were started"""
+    with _sandbox_lock:
+        while _sandboxes:
+            _sandboxes.popitem()[1].close()
+
+
+def analyze_documents(sandbox, documents):
+    """
+    Parse and score many documents across a sandbox's processes
+
+    Each file is read only when a process is about to take it, so at most
+    one document per sandbox process is held in memory at a time.
+
+    Args:
+        sandbox: ParseSandbox
+        documents: List of (file, file_type) tuples, files open for reading
+
+    Returns:
+        List aligned with documents of ParseSandbox.analyze() results or
+        the exception raised for that document
+    """
+    def analyze(document):
+        file, file_type = document
+        try:
+            file.seek(0)
+            return sandbox.analyze(file.read(), file_type)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=sandbox.size, thread_name_prefix='cv-batch') as executor:
+        return list(executor.map(analyze, documents))
@@ -0,0 +1,70 @@
+"""
+Process Pool
+Shared pool of worker processes for CPU-bound page extraction and re-scoring
+"""
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Return the process pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.CV_PROCESS_POOL_WORKERS)
+        return _pool
+
+
+def rescore_stored(analysis_id, record, compressed_text, source=None):
+    """
+    Re-score a stored analysis inside a pool worker
+
+    Without current features or full text (analyses stored before either
+    existed), the text is re-parsed from the uploaded file, or failing
+    that taken from the first 5000 characters kept on the analysis.
+
+    Args:
+        analysis_id: Primary key of the analysis (returned for matching)
+        record: CVFeatures instance or None
+        compressed_text: ExtractedText.data, or None if not stored
+        source: (file path or None, file type, ATSAnalysis.extracted_text),
+            used when compressed_text is None
+
+    Returns:
+        (analysis_id, analysis_results, feature_fields, recovered_text)
+        tuple, where recovered_text is the text re-parsed from the file
+        (to be stored) or None; (analysis_id, None, error message, None)
+        if it cannot be re-scored
+    """
+    from .cv_parser import CVParser
+    from .services import score_stored_inputs
+    
+    recovered_text = None
+    
+    def load_text():
+        nonlocal recovered_text
+        if compressed_text is not None:
+            return zlib.decompress(bytes(compressed_text)).decode('utf-8')
+        if source is None:
+            return None
+        path, file_type, stored_text = source
+        if path is not None:
+            try:
+                with open(path, 'rb') as f:
+                    recovered_text = CVParser.extract(f, file_type, parallel=False).text
+                return recovered_text
+            except Exception:
+                pass  # missing or unreadable file
+        return stored_text
+    
+    try:
+        analysis_results, feature_fields = score_stored_inputs(record, load_text, analysis_id)
+    except ValueError as e:
+        return analysis_id, None, str(e), None
+    return analysis_id, analysis_results, feature_fields, recovered_text
+
@@ -0,0 +1,128 @@
+"""
+Full-Text Search
+Indexes the extracted text of each analysis in an SQLite FTS5 table and
+queries it with BM25 ranking and snippets
+"""
+from django.db import connection, OperationalError
+from .models import SearchDocument
+
+FTS_TABLE = 'api_cv_fts'
+
+# Markers around matched terms in snippets (plain text, safe to render)
+SNIPPET_START = '**'
+SNIPPET_END = '**'
+SNIPPET_TOKENS = 16
+
+
+class SearchQueryError(ValueError):
+    """The query is not valid FTS5 query syntax"""
+    pass
+
+
+_available = False
+
+
+def search_available():
+    """Return True if the database has the FTS5 index (SQLite only)"""
+    global _available
+    if not _available and connection.vendor == 'sqlite':
+        _available = FTS_TABLE in connection.introspection.table_names()
+    return _available
+
+
+def index_texts(documents):
+    """
+    Add analysis texts to the search index, replacing any earlier entry
+
+    Call inside the transaction that stores the texts.
+
+    Args:
+        documents: List of (ATSAnalysis, extracted text) pairs
+    """
+    if not documents or not search_available():
+        return
+    analyses = [analysis for analysis, _ in documents]
+    # The delete trigger drops the old FTS rows
+    SearchDocument.objects.filter(analysis__in=analyses).delete()
+    entries = SearchDocument.objects.bulk_create(
+        [SearchDocument(analysis=analysis) for analysis in analyses]
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [(entry.id, text) for entry, (_, text) in zip(entries, documents)]
+        )
+
+
+def search(query, offset=0, limit=20):
+    """
+    Search analysis texts
+
+    Args:
+        query: FTS5 query: words, "quoted phrases", AND / OR / NOT,
+            prefix* terms and parentheses
+        offset: Number of results to skip
+        limit: Number of results to return
+
+    Returns:
+        (total matches, list of (analysis id, BM25 score, snippet)),
+        best matches first; higher scores are better
+
+    Raises:
+        SearchQueryError: The query is not valid FTS5 syntax
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [query]
+            )
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f"""
+                SELECT d.analysis_id, bm25({FTS_TABLE}),
+                       snippet({FTS_TABLE}, 0, %s, %s, '…', %s)
+                FROM {FTS_TABLE}
+                JOIN api_searchdocument d ON d.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH %s
+                ORDER BY bm25({FTS_TABLE})
+                LIMIT %s OFFSET %s
+                """,
+                [SNIPPET_START, SNIPPET_END, SNIPPET_TOKENS, query, limit, offset]
+            )
+            rows = cursor.fetchall()
+    except OperationalError as e:
+        raise SearchQueryError(f"Invalid search query: {e}") from e
+    # SQLite's bm25() is negative, lower is better
+    return total, [(analysis_id, -score, snippet) for analysis_id, score, snippet in rows]
+
+
+def compact_index(pages=200):
+    """
+    Merge the FTS5 index's b-trees in small steps, dropping entries of
+    deleted texts, until there is nothing left to merge
+
+    Each step is one short write of about `pages` pages, so other writers
+    are not held up the way a single 'optimize' would hold them.
+
+    Returns:
+        Number of merge steps that did work
+    """
+    if not search_available():
+        return 0
+    steps = 0
+    # A negative page count starts merging every segment into one, as
+    # 'optimize' would; positive counts continue that merge
+    work = -pages
+    with connection.cursor() as cursor:
+        while True:
+            before = connection.connection.total_changes
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES (%s, %s)',
+                ['merge', work]
+            )
+            # A merge that did no work changes fewer than two rows
+            if connection.connection.total_changes - before < 2:
+                return steps
+            steps += 1
+            work = pages
@@ -22,6 +22,22 @@ class ATSAnalysisSerializer(serializers.ModelSerializer):
             'keyword_score', 'formatting_score', 'experience_score',
             'education_score', 'skills_score', 'contact_score',
             'extracted_text', 'strengths', 'improvements',
-            'missing_elements', 'analyzed_at'
+            'missing_elements', 'analyzed_at', 'status', 'error_message'
         ]
-        read_only_fields = ['id', 'analyzed_at']
+        read_only_fields = ['id', 'analyzed_at', 'status', 'error_message']
+
+
+class ATSAnalysisListSerializer(serializers.ModelSerializer):
+    """Serializer for analysis listings (scores only, without text and feedback)"""
+    cv_upload = CVUploadSerializer(read_only=True)
+    score_category = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = ATSAnalysis
+        fields = [
+            'id', 'cv_upload', 'overall_score', 'score_category',
+            'keyword_score', 'formatting_score', 'experience_score',
+            'education_score', 'skills_score', 'contact_score',
+            'analyzed_at', 'status'
+        ]
+        read_only_fields = fields
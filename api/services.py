@@ -0,0 +1,273 @@
+"""
+Analysis Services
+Shared steps of the CV analysis pipeline used by the API views
+"""
+import hashlib
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ATSAnalysis, ExtractedText, CVFeatures
+from .ats_scorer import ATSScorer
+from .cv_parser import CVParser
+from .parse_sandbox import get_parse_sandbox
+from .search import index_texts
+from .storage import get_cv_storage
+
+
+def compute_content_hash(file):
+    """
+    Compute the SHA-256 hex digest of an uploaded file
+
+    Args:
+        file: Uploaded file object (read in chunks, pointer reset afterwards)
+
+    Returns:
+        64-character hex digest
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def store_upload(file):
+    """
+    Save an uploaded file to CV storage, hashing it while it is written
+
+    Identical content is stored once (see ContentAddressedStorage).
+
+    Args:
+        file: Uploaded file object (pointer reset afterwards, so it can be
+            parsed from the same buffer)
+
+    Returns:
+        (storage name for CVUpload.file, SHA-256 hex digest)
+    """
+    return get_cv_storage().store(file, file.name)
+
+
+def parse_upload(file, file_type):
+    """
+    Extract text from an uploaded CV
+    
+    With CV_PARSE_SANDBOX enabled the document is parsed in a sandbox
+    process with time and memory limits (see ParseSandbox), otherwise
+    in the current process.
+    
+    Returns:
+        ParseResult
+    
+    Raises:
+        ParseLimitExceeded: The document hit a sandbox limit
+    """
+    if not settings.CV_PARSE_SANDBOX:
+        return CVParser.extract(file, file_type)
+    
+    file.seek(0)
+    data = file.read()
+    return get_parse_sandbox().parse(data, file_type)
+
+
+def find_cached_analysis(content_hash):
+    """
+    Return the most recent analysis of identical content scored by the
+    current scorer version, or None
+    """
+    if not content_hash:
+        return None
+    return find_cached_analyses([content_hash]).get(content_hash)
+
+
+def find_cached_analyses(content_hashes):
+    """
+    Look up cached analyses for many content hashes in one query
+
+    Returns:
+        Dictionary of content hash to its most recent current analysis
+    """
+    cached = {}
+    analyses = (
+        ATSAnalysis.objects
+        .select_related('cv_upload')
+        .filter(
+            cv_upload__content_hash__in=set(content_hashes),
+            scorer_version=ATSScorer.scorer_version(),
+            status=ATSAnalysis.STATUS_DONE,
+        )
+        .order_by('-analyzed_at')
+    )
+    for analysis in analyses:
+        cached.setdefault(analysis.cv_upload.content_hash, analysis)
+    return cached
+
+
+def find_stored_text(content_hash):
+    """
+    Return (analysis, full text) of the most recent analysis of identical
+    content that kept its extracted text, or (None, None)
+
+    Any scorer version will do: only the text is reused.
+    """
+    stored = (
+        ExtractedText.objects
+        .select_related('analysis')
+        .filter(analysis__cv_upload__content_hash=content_hash)
+        .order_by('-analysis__analyzed_at')
+        .first()
+    )
+    if stored is None:
+        return None, None
+    return stored.analysis, stored.get_text()
+
+
+def create_analysis(cv_upload, extracted_text, analysis_results, feature_fields):
+    """
+    Persist scorer results for an uploaded CV, with its compressed full
+    text, feature record and search index entry
+
+    Args:
+        cv_upload: CVUpload the analysis belongs to; an unsaved one is
+            saved in the same transaction
+        extracted_text: Text extracted from the CV
+        analysis_results: Dictionary returned by ATSScorer.calculate_overall_score()
+        feature_fields: Dictionary returned by ATSScorer.feature_fields()
+
+    Returns:
+        Created ATSAnalysis instance
+    """
+    analysis = build_analysis(cv_upload, extracted_text, analysis_results)
+    with transaction.atomic():
+        if cv_upload._state.adding:
+            cv_upload.save(force_insert=True)
+        analysis.save(force_insert=True)
+        for row in build_analysis_inputs(analysis, extracted_text, feature_fields):
+            row.save(force_insert=True)
+        index_texts([(analysis, extracted_text)])
+    return analysis
+
+
+def build_analysis(cv_upload, extracted_text, analysis_results):
+    """Return an unsaved ATSAnalysis for scorer results (for bulk_create)"""
+    return ATSAnalysis(
+        cv_upload=cv_upload,
+        scorer_version=ATSScorer.scorer_version(),
+        extracted_text=extracted_text[:5000],  # Store first 5000 chars
+        **analysis_fields(analysis_results)
+    )
+
+
+def build_analysis_inputs(analysis, extracted_text, feature_fields):
+    """
+    Return the unsaved ExtractedText and CVFeatures rows of an analysis
+    (for bulk_create)
+    """
+    return (
+        ExtractedText.from_text(analysis, extracted_text),
+        CVFeatures(analysis=analysis, **feature_fields),
+    )
+
+
+def apply_analysis(analysis, extracted_text, analysis_results, feature_fields):
+    """
+    Store scorer results on an existing (queued) analysis and mark it done
+
+    Args:
+        analysis: ATSAnalysis instance to update
+        extracted_text: Text extracted from the CV
+        analysis_results: Dictionary returned by ATSScorer.calculate_overall_score()
+        feature_fields: Dictionary returned by ATSScorer.feature_fields()
+    """
+    for field, value in analysis_fields(analysis_results).items():
+        setattr(analysis, field, value)
+    analysis.extracted_text = extracted_text[:5000]
+    analysis.scorer_version = ATSScorer.scorer_version()
+    analysis.status = ATSAnalysis.STATUS_DONE
+    analysis.error_message = ''
+    analysis.analyzed_at = timezone.now()
+    with transaction.atomic():
+        analysis.save()
+        # Primary key is the analysis, so save() replaces any existing row
+        for row in build_analysis_inputs(analysis, extracted_text, feature_fields):
+            row.save()
+        index_texts([(analysis, extracted_text)])
+
+
+def rescore_analysis(analysis):
+    """
+    Recompute the scores of a stored analysis without re-parsing its file
+
+    Fields are updated on the instance but not saved.
+
+    Returns:
+        (analysis_results, feature_fields) tuple, see score_stored_inputs()
+
+    Raises:
+        ValueError: The analysis has neither current features nor full text
+    """
+    try:
+        record = analysis.features
+    except CVFeatures.DoesNotExist:
+        record = None
+    
+    analysis_results, feature_fields = score_stored_inputs(
+        record, analysis.get_full_text, label=analysis.pk
+    )
+    for field, value in analysis_fields(analysis_results).items():
+        setattr(analysis, field, value)
+    analysis.scorer_version = ATSScorer.scorer_version()
+    return analysis_results, feature_fields
+
+
+def score_stored_inputs(record, load_text, label=None):
+    """
+    Score a CV from its stored inputs
+
+    Uses the CVFeatures record when it matches the current vocabularies;
+    otherwise rebuilds the features from the full text.
+
+    Args:
+        record: CVFeatures instance or None
+        load_text: Callable returning the full text, or None if not stored
+        label: Identifies the analysis in error messages
+
+    Returns:
+        (analysis_results, feature_fields) tuple; feature_fields is None
+        when the stored feature record was reused
+
+    Raises:
+        ValueError: Neither current features nor full text are available
+    """
+    if record is not None and ATSScorer.features_current(record):
+        return ATSScorer.from_features(record).calculate_overall_score(), None
+    
+    text = load_text()
+    if text is None:
+        raise ValueError(f"Analysis {label} has no stored text to rescore")
+    scorer = ATSScorer(text)
+    return scorer.calculate_overall_score(), ATSScorer.feature_fields(scorer.document)
+
+
+SCORE_FIELDS = (
+    'overall_score', 'keyword_score', 'formatting_score', 'experience_score',
+    'education_score', 'skills_score', 'contact_score',
+    'strengths', 'improvements', 'missing_elements',
+)
+
+
+def analysis_fields(analysis_results):
+    """Map scorer results onto ATSAnalysis field values"""
+    category_scores = analysis_results['category_scores']
+    return {
+        'overall_score': analysis_results['overall_score'],
+        'keyword_score': category_scores['keyword_score'],
+        'formatting_score': category_scores['formatting_score'],
+        'experience_score': category_scores['experience_score'],
+        'education_score': category_scores['education_score'],
+        'skills_score': category_scores['skills_score'],
+        'contact_score': category_scores['contact_score'],
+        'strengths': analysis_results['strengths'],
+        'improvements': analysis_results['improvements'],
+        'missing_elements': analysis_results['missing_elements'],
+    }
@@ -0,0 +1,104 @@
+"""
+Content-Addressed Storage
+Stores each distinct CV file once, under a path derived from its SHA-256
+"""
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files by their content
+
+    A file is hashed while it is written to a temporary file, then moved
+    to <prefix>/ab/cd/<sha256><extension>, where ab and cd are the first
+    two byte pairs of the hash, so no directory grows past a few thousand
+    entries. Identical content is stored once: when the blob already
+    exists, the temporary copy is dropped and the existing name returned.
+
+    Blobs are shared between uploads, so deleting an upload must not delete
+    its file; `manage.py purge_cvs` removes blobs nothing refers to.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, prefix='cvs', **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = prefix
+
+    def get_available_name(self, name, max_length=None):
+        # _save() names the file after its content
+        return name
+
+    def _save(self, name, content):
+        stored_name, _ = self.store(content, name)
+        return stored_name
+
+    def store(self, content, filename):
+        """
+        Write a file, hashing it on the way
+
+        Args:
+            content: Django File (e.g. an UploadedFile); its position is
+                reset to the start afterwards so it can be parsed
+            filename: Original file name, only its extension is kept
+
+        Returns:
+            (storage name, SHA-256 hex digest)
+        """
+        temp_dir = self.path(os.path.join(self.prefix, 'tmp'))
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks(self.CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+            content_hash = digest.hexdigest()
+
+            name = self.content_name(content_hash, os.path.splitext(filename)[1].lower())
+            path = self.path(name)
+            if self._reuse(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                # Atomic: readers see the whole blob or none
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        content.seek(0)
+        return name, content_hash
+
+    @staticmethod
+    def _reuse(path):
+        """
+        Return True if the blob exists, refreshing its mtime so the orphan
+        sweep (which spares recent files) keeps it until its row is saved
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def content_name(self, content_hash, extension=''):
+        """Return the storage name of the blob with a given hash"""
+        return f'{self.prefix}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension}'
+
+
+_cv_storage = None
+
+
+def get_cv_storage():
+    """Return the storage of uploaded CV files (CVUpload.file)"""
+    global _cv_storage
+    if _cv_storage is None:
+        _cv_storage = ContentAddressedStorage()
+    return _cv_storage
@@ -0,0 +1,133 @@
+"""
+Skill Taxonomy
+Loads the scoring vocabularies from a JSON data file and keeps one
+compiled KeywordMatcher per process, recompiled when the file changes
+"""
+import json
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from .cv_parser import CVParser
+from .keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+
+class TaxonomyStore:
+    """
+    Compiled taxonomy of one data file
+
+    The file maps each vocabulary ('skills', 'education', 'action_verbs',
+    'technical_skills') to {term: [synonyms]}. get() checks the file's
+    mtime at most every `check_interval` seconds; when it changed, the
+    new matcher is compiled first and then swapped in with a single
+    assignment, so callers always see a complete matcher and requests in
+    flight keep using the one they already hold. A file that fails to
+    load is logged and the previous matcher stays active.
+    """
+
+    # Vocabularies matched as whole words with typo tolerance
+    TOKEN_VOCABULARIES = ('skills', 'technical_skills')
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._matcher = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the current KeywordMatcher, reloading the file if it changed"""
+        if self._matcher is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self._refresh()
+        return self._matcher
+
+    def _refresh(self):
+        # One thread compiles; the others keep the matcher they already have
+        if not self._lock.acquire(blocking=self._matcher is None):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                # e.g. deleted or renamed mid-deploy
+                if self._matcher is None:
+                    raise
+                logger.error("Keeping previous taxonomy, %s is not readable: %s", self.path, e)
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                matcher = TaxonomyStore.compile(TaxonomyStore.load(self.path))
+            except (OSError, ValueError) as e:
+                if self._matcher is None:
+                    raise
+                logger.error("Keeping previous taxonomy, %s failed to load: %s", self.path, e)
+            else:
+                if self._matcher is not None:
+                    logger.info("Reloaded taxonomy %s (version %s)", self.path, matcher.version)
+                self._matcher = matcher
+            self._mtime = mtime
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def load(path):
+        """
+        Read and validate a taxonomy file
+
+        Returns:
+            {vocabulary: {term: [synonyms]}} with lowercase strings
+
+        Raises:
+            ValueError: The file is not a valid taxonomy
+        """
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        vocabularies = data.get('vocabularies') if isinstance(data, dict) else None
+        if not isinstance(vocabularies, dict):
+            raise ValueError("taxonomy must contain a 'vocabularies' object")
+
+        taxonomy = {}
+        for name, terms in vocabularies.items():
+            if not isinstance(terms, dict):
+                raise ValueError(f"vocabulary '{name}' must map terms to synonym lists")
+            for term, aliases in terms.items():
+                if not isinstance(aliases, list) or not all(isinstance(alias, str) for alias in aliases):
+                    raise ValueError(
+                        f"synonyms of '{term}' in vocabulary '{name}' must be a list of strings"
+                    )
+            taxonomy[name] = {
+                term.lower(): [alias.lower() for alias in aliases]
+                for term, aliases in terms.items()
+            }
+        return taxonomy
+
+    @staticmethod
+    def compile(taxonomy):
+        """Build the scorer's KeywordMatcher: taxonomy plus section keywords"""
+        return KeywordMatcher(
+            {**taxonomy, **CVParser.section_vocabularies()},
+            token_vocabularies=TaxonomyStore.TOKEN_VOCABULARIES
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_keyword_matcher():
+    """Return this process's compiled scoring KeywordMatcher"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TaxonomyStore(
+                    settings.CV_TAXONOMY_PATH,
+                    check_interval=settings.CV_TAXONOMY_CHECK_INTERVAL
+                )
+    return _store.get()
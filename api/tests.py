@@ -1,3 +1,1116 @@
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+from . import async_views
+from .admission import AdmissionController, Overloaded
+from .checks import check_admission_threads, check_group_commit_threads, check_sandbox_workers
+from .corpus_index import CorpusIndex
+from .analysis_cache import ANALYSIS_CACHE
+from .benchmarks.corpus import generate_corpus
+from .cv_parser import CVParser
+from .docx_extractor import extract_docx_text
+from .fuzzy_index import FuzzyIndex
+from .group_commit import GROUP_WRITER, commit
+from .keyword_matcher import KeywordMatcher, CHUNK_SCAN_MIN_STRINGS
+from .ats_scorer import ATSScorer
+from .jobs import claim_next_job, enqueue_analysis, process_job, requeue_stale_jobs
+from .models import CVUpload, ATSAnalysis, AnalysisJob, ExtractedText
+from .pagination import KeysetPagination, InvalidCursor
+from .parse_sandbox import ParseSandbox, ParseLimitExceeded
+from .storage import ContentAddressedStorage
+from .search import FTS_TABLE, search as search_texts, search_available
+from .services import analysis_fields, apply_analysis, create_analysis, rescore_analysis
+from .taxonomy import TaxonomyStore
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import signal
+import tempfile
+import time
+import tracemalloc
+import zipfile
 
-# Create your tests here.
+
+TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), 'data', 'taxonomy.json')
+
+
+class KeywordMatcherTests(TestCase):
+    """KeywordMatcher reports the same hits as `term in text` for every term"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vocabularies = {
+            **TaxonomyStore.load(TAXONOMY_PATH), **CVParser.section_vocabularies()
+        }
+        cls.texts = [
+            CVParser.extract(io.BytesIO(document.data), document.file_type).text.lower()
+            for document in generate_corpus(1, page_counts=(1, 5))
+        ]
+
+    def assert_same_hits(self, matcher, text):
+        matches = matcher.match(text)
+        for vocabulary, terms in self.vocabularies.items():
+            expected = [term for term in terms if term in text]
+            found = [term for term in terms if matches.contains(vocabulary, term)]
+            # Synonyms only add hits (as whole words)
+            self.assertEqual([term for term in expected if term not in found], [], vocabulary)
+
+            synonyms = terms if isinstance(terms, dict) else {}
+            for term in found:
+                if term not in expected:
+                    self.assertTrue(
+                        any(alias in text for alias in synonyms.get(term, ())),
+                        f"{vocabulary}: {term}"
+                    )
+
+    def test_matches_corpus_like_substring_scan(self):
+        matcher = KeywordMatcher(self.vocabularies)
+        self.assertTrue(matcher._chunk_scan)
+        for text in self.texts:
+            self.assert_same_hits(matcher, text)
+
+    def test_matches_without_chunk_scan(self):
+        vocabularies = {'education': ['b.sc', 'degree', 'phd']}
+        matcher = KeywordMatcher(vocabularies)
+        self.assertLess(len(matcher._strings), CHUNK_SCAN_MIN_STRINGS)
+        matches = matcher.match('holds a b.sc. degree')
+        self.assertEqual(matches.terms('education'), ['b.sc', 'degree'])
+
+    def test_automaton_finds_overlapping_strings(self):
+        terms = ['he', 'she', 'his', 'hers', 'ushers', 'c', 'c++', 'c#', 'shell', 'ell']
+        terms += [f'filler{i}' for i in range(20)]
+        matcher = KeywordMatcher({'terms': terms})
+        self.assertTrue(matcher._chunk_scan)
+        for text in ('ushers', 'c++ shel', 'c# hi', 'shehis', 'sushell', ''):
+            matches = matcher.match(text)
+            expected = [term for term in terms if term in text]
+            self.assertEqual(matches.terms('terms'), expected, text)
+
+    def test_substrings_match_inside_words_and_across_punctuation(self):
+        terms = ['led', 'b.sc', 'ci/cd', 'work history'] + [f'filler{i}' for i in range(20)]
+        matcher = KeywordMatcher({'terms': terms})
+        matches = matcher.match('enabled ci/cd; b.sc.\nwork history')
+        self.assertEqual(matches.terms('terms'), ['led', 'b.sc', 'ci/cd', 'work history'])
+
+    def test_synonyms_match_whole_words_only(self):
+        matcher = KeywordMatcher({'education': {'master': ['msc']}})
+        self.assertFalse(matcher.match('mscs and msci').contains('education', 'master'))
+        matches = matcher.match('holds an msc, 2019')
+        self.assertTrue(matches.contains('education', 'master'))
+        self.assertEqual(matches.positions('education', 'master'), [9])
+
+    def test_positions_are_every_occurrence(self):
+        matcher = KeywordMatcher({'verbs': ['led', 'managed']})
+        matches = matcher.match('led a team, then led and managed it; mis-led')
+        self.assertEqual(matches.positions('verbs', 'led'), [0, 17, 41])
+        self.assertEqual(matches.as_dict(), {'verbs': {'led': [0, 17, 41], 'managed': [25]}})
+
+
+def _osa(a, b):
+    """Reference optimal string alignment distance"""
+    d = [[i + j if not i * j else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+_DOCX_NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+    'xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape"'
+)
+
+
+def _docx_bytes(body, header='<w:p><w:r><w:t>Jane Doe</w:t></w:r></w:p>',
+                footer='<w:p><w:r><w:t>Page 1</w:t></w:r></w:p>'):
+    """Build a minimal .docx package with one header and one footer"""
+    relationship = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    parts = {
+        'word/document.xml': f'<w:document {_DOCX_NAMESPACES}><w:body>{body}</w:body></w:document>',
+        'word/header1.xml': f'<w:hdr {_DOCX_NAMESPACES}>{header}</w:hdr>',
+        'word/footer1.xml': f'<w:ftr {_DOCX_NAMESPACES}>{footer}</w:ftr>',
+        'word/_rels/document.xml.rels': (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{relationship}footer" Target="footer1.xml"/>'
+            f'<Relationship Id="rId2" Type="{relationship}header" Target="header1.xml"/>'
+            '</Relationships>'
+        ),
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as package:
+        for name, xml in parts.items():
+            package.writestr(name, xml)
+    return buffer.getvalue()
+
+
+def _docx_paragraph(text):
+    return f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>'
+
+
+class DocxExtractorTests(TestCase):
+    """The streaming DOCX extractor reads every part a CV puts text in"""
+
+    def test_reads_headers_tables_text_boxes_and_footers_in_order(self):
+        text_box = (
+            '<w:p><w:r><w:t>Contact</w:t></w:r><w:r><mc:AlternateContent>'
+            '<mc:Choice Requires="wps"><w:drawing><wps:txbx><w:txbxContent>'
+            + _docx_paragraph('jane@example.com') +
+            '</w:txbxContent></wps:txbx></w:drawing></mc:Choice>'
+            '<mc:Fallback><w:pict><w:txbxContent>'
+            + _docx_paragraph('jane@example.com') +
+            '</w:txbxContent></w:pict></mc:Fallback>'
+            '</mc:AlternateContent></w:r></w:p>'
+        )
+        table = (
+            '<w:tbl><w:tr><w:tc>' + _docx_paragraph('Python') + '</w:tc>'
+            '<w:tc>' + _docx_paragraph('5 years') + '</w:tc></w:tr></w:tbl>'
+        )
+        body = (
+            _docx_paragraph('Skills') + table + text_box
+            + '<w:p><w:r><w:t>Led</w:t><w:tab/><w:t>team</w:t><w:br/><w:t>of 5</w:t></w:r></w:p>'
+        )
+        text = extract_docx_text(io.BytesIO(_docx_bytes(body)))
+        self.assertEqual(text.split('\n'), [
+            'Jane Doe', 'Skills', 'Python', '5 years', 'jane@example.com', 'Contact',
+            'Led\tteam', 'of 5', 'Page 1',
+        ])
+        self.assertEqual(text.count('jane@example.com'), 1)
+
+    def test_stops_at_max_chars(self):
+        body = ''.join(_docx_paragraph(f'line {i}') for i in range(100))
+        text = extract_docx_text(io.BytesIO(_docx_bytes(body)), max_chars=30)
+        self.assertLessEqual(len(text), 30)
+        self.assertTrue(text.startswith('Jane Doe\nline 0\nline 1'))
+
+    @override_settings(CV_DOCX_EXTRACTOR='stream')
+    def test_parser_reads_table_cells(self):
+        table = '<w:tbl><w:tr><w:tc>' + _docx_paragraph('Django') + '</w:tc></w:tr></w:tbl>'
+        data = _docx_bytes(_docx_paragraph('Experience') + table)
+        self.assertEqual(
+            CVParser.extract(io.BytesIO(data), 'docx').text, 'Jane Doe\nExperience\nDjango\nPage 1'
+        )
+
+
+class FuzzyIndexTests(TestCase):
+    """FuzzyIndex finds the same word as comparing the token with every word"""
+
+    WORDS = [
+        'kubernetes', 'javascript', 'typescript', 'tensorflow', 'postgresql', 'terraform',
+        'python', 'docker', 'django', 'react', 'angular', 'microservices', 'leadership',
+    ]
+
+    def brute_force(self, token):
+        best = None
+        for word in self.WORDS:
+            distance = _osa(token, word)
+            if word[0] != token[0] or distance > FuzzyIndex.allowed_distance(word):
+                continue
+            if best is None or distance < best[1]:
+                best = (word, distance)
+        return best
+
+    def test_matches_brute_force_on_typos(self):
+        index = FuzzyIndex(self.WORDS)
+        generator = random.Random(0)
+        letters = 'abcdefghijklmnopqrstuvwxyz'
+        for _ in range(2000):
+            token = list(generator.choice(self.WORDS))
+            for _ in range(generator.randint(0, 3)):
+                position = generator.randrange(len(token))
+                edit = generator.choice('dist')
+                if edit == 'd' and len(token) > 1:
+                    del token[position]
+                elif edit == 'i':
+                    token.insert(position, generator.choice(letters))
+                elif edit == 's':
+                    token[position] = generator.choice(letters)
+                elif position + 1 < len(token):
+                    token[position], token[position + 1] = token[position + 1], token[position]
+            token = ''.join(token)
+            self.assertEqual(index.lookup(token), self.brute_force(token), token)
+
+    def test_short_words_and_first_letter_must_match(self):
+        index = FuzzyIndex(self.WORDS)
+        self.assertEqual(index.lookup('kubernets'), ('kubernetes', 1))
+        self.assertEqual(index.lookup('tensroflow'), ('tensorflow', 1))
+        self.assertIsNone(index.lookup('pyton'))  # 6 letters: exact only
+        self.assertIsNone(index.lookup('oython'))
+        self.assertIsNone(index.lookup('ubernetes'))
+
+    def test_matcher_reports_fuzzy_skills(self):
+        matcher = KeywordMatcher(
+            {'skills': {'kubernetes': ['k8s'], 'machine learning': []}},
+            token_vocabularies=['skills']
+        )
+        matches = matcher.match('ran kubernets and k8s; machne learning models')
+        self.assertEqual(matches.terms('skills'), ['kubernetes', 'machine learning'])
+        self.assertEqual(matches.distance('skills', 'kubernetes'), 0)  # also exact via k8s
+        self.assertEqual(
+            matches.fuzzy_terms('skills'), [('machine learning', 'machne learning', 1)]
+        )
+        self.assertFalse(matcher.match('maintain').contains('skills', 'kubernetes'))
+
+
+class TaxonomyStoreTests(TestCase):
+    """Hot reload keeps the last good vocabularies"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'taxonomy.json')
+        self.write({'skills': {'python': []}})
+        self.store = TaxonomyStore(self.path, check_interval=0)
+        self.matcher = self.store.get()
+
+    def write(self, vocabularies):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'vocabularies': vocabularies}, f)
+        os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 1000))
+
+    def test_missing_file_keeps_previous_matcher(self):
+        os.remove(self.path)
+        self.assertIs(self.store.get(), self.matcher)
+
+    def test_synonyms_must_be_lists_of_strings(self):
+        for aliases in ('amazon', ['amazon', 3], None):
+            with self.subTest(aliases=aliases):
+                self.write({'skills': {'aws': aliases}})
+                with self.assertRaises(ValueError):
+                    TaxonomyStore.load(self.path)
+                self.assertIs(self.store.get(), self.matcher)
+
+
+def _pdf_bytes():
+    return generate_corpus(1, page_counts=(1,), file_types=('pdf',))[0].data
+
+
+class CVParserTests(TestCase):
+    """CVParser.extract statistics"""
+
+    @override_settings(CV_PARSE_TRACE_MEMORY=True)
+    def test_concurrent_traced_parses_each_report_their_peak(self):
+        data = _pdf_bytes()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(
+                lambda _: CVParser.extract(io.BytesIO(data), 'pdf', parallel=False), range(8)
+            ))
+        self.assertTrue(all(result.peak_memory > 0 for result in results))
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+class ParseSandboxTests(TestCase):
+    """Sandboxed parsing limits"""
+
+    def setUp(self):
+        self.sandboxes = []
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def tearDown(self):
+        for sandbox in self.sandboxes:
+            sandbox.close()
+
+    def sandbox(self, **kwargs):
+        options = {'size': 1, 'timeout': 20, 'memory_limit': 0, **kwargs}
+        sandbox = ParseSandbox(**options)
+        self.sandboxes.append(sandbox)
+        return sandbox
+
+    def slow_sandbox(self):
+        """Sandbox whose (forked) processes take far longer than the timeout"""
+        with mock.patch.object(CVParser, 'extract', side_effect=lambda *args, **kwargs: time.sleep(30)):
+            return self.sandbox(timeout=0.2)
+
+    def test_parses_document(self):
+        result = self.sandbox().parse(_pdf_bytes(), 'pdf')
+        self.assertGreater(len(result.text), 100)
+
+    def test_timeout_raises_limit_exceeded(self):
+        sandbox = self.slow_sandbox()
+        with self.assertRaises(ParseLimitExceeded):
+            sandbox.parse(_pdf_bytes(), 'pdf')
+        # The timed-out process was replaced by a working one
+        sandbox.timeout = 20
+        self.assertGreater(len(sandbox.parse(_pdf_bytes(), 'pdf').text), 100)
+
+    def test_upload_over_limit_returns_422(self):
+        sandbox = self.slow_sandbox()
+        upload = SimpleUploadedFile('cv.pdf', _pdf_bytes())
+        with override_settings(CV_PARSE_SANDBOX=True), \
+                mock.patch('api.services.get_parse_sandbox', return_value=sandbox):
+            response = self.client.post('/api/upload-cv/', {'file': upload})
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(CVUpload.objects.exists())
+
+    def test_busy_sandbox_sheds_instead_of_blocking(self):
+        sandbox = self.sandbox(wait_timeout=0.05)
+        busy = sandbox._idle.get()
+        try:
+            with self.assertRaises(Overloaded):
+                sandbox.parse(_pdf_bytes(), 'pdf')
+        finally:
+            sandbox._idle.put(busy)
+
+    def test_sandbox_process_stops_on_sigterm_despite_parent_handler(self):
+        previous = signal.signal(signal.SIGTERM, lambda *args: None)
+        try:
+            sandbox = self.sandbox()
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+        sandbox.parse(_pdf_bytes(), 'pdf')  # the child is past its signal setup
+        worker = sandbox._idle.get()
+        sandbox._idle.put(worker)
+        worker.process.terminate()
+        worker.process.join(5)
+        self.assertEqual(worker.process.exitcode, -signal.SIGTERM)
+
+
+@override_settings(CV_PARSE_SANDBOX=False)
+class ContentHashCacheTests(TestCase):
+    """Re-uploads of scored content return the stored analysis while its scorer version is current"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.data = _pdf_bytes()
+
+    def upload(self, name='cv.pdf'):
+        return self.client.post('/api/upload-cv/', {'file': SimpleUploadedFile(name, self.data)})
+
+    def test_reupload_returns_the_cached_analysis_without_parsing(self):
+        first = self.upload()
+        self.assertEqual(first.status_code, 201)
+        with mock.patch('api.views.parse_upload') as parse:
+            again = self.upload(name='renamed.pdf')
+        parse.assert_not_called()
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()['id'], first.json()['id'])
+        self.assertEqual(CVUpload.objects.count(), 1)
+
+    def test_scorer_version_change_invalidates_the_cache(self):
+        first = self.upload()
+        with mock.patch.object(ATSScorer, 'scorer_version', return_value='0.test'):
+            again = self.upload()
+            self.assertEqual(self.upload().json()['id'], again.json()['id'])
+        self.assertEqual(again.status_code, 201)
+        self.assertNotEqual(again.json()['id'], first.json()['id'])
+        self.assertEqual(ATSAnalysis.objects.get(pk=again.json()['id']).scorer_version, '0.test')
+
+
+class BatchUploadTests(TestCase):
+    """Batch documents run in sandbox processes; a hanging one is killed"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        extract = CVParser.extract
+
+        def hang_on_marker(file, file_type, **kwargs):
+            if b'HANG' in file.getvalue():
+                time.sleep(30)
+            return extract(file, file_type, **kwargs)
+
+        # Forked while patched, so the sandbox processes hang on marked files
+        with mock.patch.object(CVParser, 'extract', side_effect=hang_on_marker):
+            self.sandbox = ParseSandbox(size=2, timeout=1, memory_limit=0)
+        self.addCleanup(self.sandbox.close)
+
+    def post(self, *files):
+        with mock.patch('api.views.get_batch_sandbox', return_value=self.sandbox):
+            response = self.client.post('/api/upload-cv/batch/', {'files': list(files)})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_hanging_document_does_not_block_the_others(self):
+        documents = [
+            SimpleUploadedFile(f'cv{i}.pdf', data)
+            for i, data in enumerate(d.data for d in generate_corpus(2, page_counts=(1,), file_types=('pdf',)))
+        ]
+        hanging = SimpleUploadedFile('hang.pdf', _pdf_bytes() + b'HANG')
+        started = time.monotonic()
+        results = self.post(hanging, *documents)
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual([r['status'] for r in results], ['error', 'created', 'created'])
+        self.assertEqual(results[0]['status_code'], 422)
+        self.assertIn('longer than 1 seconds', results[0]['error'])
+
+        # The timed-out process was replaced
+        results = self.post(SimpleUploadedFile('next.pdf', _pdf_bytes() + b'%next'))
+        self.assertEqual([r['status'] for r in results], ['created'])
+
+    def test_invalid_document_is_reported_per_file(self):
+        results = self.post(SimpleUploadedFile('broken.pdf', b'not a pdf'))
+        self.assertEqual(results[0]['status'], 'error')
+        self.assertEqual(results[0]['status_code'], 500)
+        self.assertEqual(results[0]['error'], 'Error processing CV: Error parsing PDF: EOF marker not found')
+
+
+class CorpusIndexTests(TestCase):
+    """Index rebuilds, appends and segment merges"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.index = CorpusIndex(directory.name)
+
+    def add_texts(self, *texts):
+        analyses = []
+        for text in texts:
+            cv_upload = CVUpload.objects.create(filename='cv.pdf', file_type='pdf')
+            analysis = ATSAnalysis.objects.create(cv_upload=cv_upload, overall_score=50)
+            ExtractedText.from_text(analysis, text).save()
+            analyses.append(analysis)
+        return analyses
+
+    def segment_sizes(self):
+        return [segment.matrix.shape[0] for segment in self.index.snapshot().segments]
+
+    def test_append_indexes_only_new_texts(self):
+        self.add_texts('python developer', 'java developer')
+        self.assertEqual(self.index.refresh(), 2)
+        self.assertEqual(self.index.refresh(), 0)
+        rust, = self.add_texts('rust systems engineer')
+        self.assertEqual(self.index.refresh(), 1)
+        ranked, indexed = self.index.rank('rust engineer')
+        self.assertEqual(indexed, 3)
+        self.assertEqual(ranked[0][0], rust)
+
+    def test_rebuild_replaces_existing_index(self):
+        self.add_texts('python developer', 'java developer')
+        self.index.refresh()
+        old_segments = self.index.snapshot().manifest['segments']
+        self.assertEqual(self.index.refresh(rebuild=True), 2)
+        self.assertEqual(self.index.refresh(rebuild=True), 2)
+        manifest = self.index.snapshot().manifest
+        self.assertEqual(self.index.snapshot().size, 2)
+        self.assertFalse(set(manifest['segments']) & set(old_segments))
+        on_disk = {name for name in os.listdir(self.index.path) if name.startswith('segment-')}
+        self.assertEqual(on_disk, set(manifest['segments']))
+
+    def test_format_change_rebuilds_without_name_clash(self):
+        self.add_texts('python developer')
+        self.index.refresh()
+        with mock.patch('api.corpus_index.INDEX_FORMAT', 2):
+            self.assertEqual(self.index.refresh(), 1)
+            self.assertEqual(self.index.snapshot().size, 1)
+
+    @override_settings(CV_CORPUS_INDEX_SEGMENT_SIZE=1, CV_CORPUS_INDEX_MERGE_FACTOR=2)
+    def test_segments_merge_by_size_tier(self):
+        merged_rows = []
+        merge = CorpusIndex._merge
+
+        def counting_merge(index, manifest, names):
+            merged_rows.append(sum(index._segment_rows(name) for name in names))
+            return merge(index, manifest, names)
+
+        with mock.patch.object(CorpusIndex, '_merge', counting_merge):
+            for i in range(7):
+                self.add_texts(f'developer number{i}')
+                self.index.refresh()
+            self.assertEqual(self.segment_sizes(), [4, 2, 1])
+            self.add_texts('developer number7')
+            self.index.refresh()
+        self.assertEqual(self.segment_sizes(), [8])
+        # Each row rewritten once per tier (log2(8) = 3), not on every merge
+        self.assertEqual(sum(merged_rows), 8 * 3)
+
+
+class FeatureRescoreTests(TestCase):
+    """Stored scores from a CVFeatures record equal those from the full text"""
+
+    def test_feature_scores_match_full_text_scores(self):
+        texts = [
+            CVParser.extract(io.BytesIO(document.data), document.file_type).text
+            for document in generate_corpus(2, page_counts=(1, 5))
+        ]
+        texts += [
+            'Jane Doe\njane@example.com\nSkills: Kubernets, Pyhton, React',
+            'no sections, no contact details',
+            '',
+        ]
+        for text in texts:
+            scorer = ATSScorer(text)
+            expected = scorer.calculate_overall_score()
+            cv_upload = CVUpload.objects.create(filename='cv.pdf', file_type='pdf')
+            analysis = create_analysis(
+                cv_upload, text, expected, ATSScorer.feature_fields(scorer.document)
+            )
+
+            analysis = ATSAnalysis.objects.get(pk=analysis.pk)
+            with mock.patch.object(ATSAnalysis, 'get_full_text') as get_full_text:
+                results, feature_fields = rescore_analysis(analysis)
+            get_full_text.assert_not_called()
+            self.assertIsNone(feature_fields)
+            # Per-term details (fuzzy matches) are not stored, only these fields
+            self.assertEqual(analysis_fields(results), analysis_fields(expected), text[:40])
+
+
+class SearchIndexTests(TestCase):
+    """The FTS5 index follows analyses as they are stored, re-scored and deleted"""
+
+    def store(self, text):
+        scorer = ATSScorer(text)
+        return create_analysis(
+            CVUpload.objects.create(filename='cv.pdf', file_type='pdf'), text,
+            scorer.calculate_overall_score(), ATSScorer.feature_fields(scorer.document)
+        )
+
+    def hits(self, query):
+        total, results = search_texts(query)
+        self.assertEqual(total, len(results))
+        return [analysis_id for analysis_id, _, _ in results]
+
+    def indexed_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+            return cursor.fetchone()[0]
+
+    def test_created_analyses_are_searchable(self):
+        self.assertTrue(search_available())
+        python = self.store('Senior Python developer, Django and PostgreSQL')
+        rust = self.store('Rust systems engineer')
+        self.assertEqual(self.hits('python'), [python.pk.hex])
+        self.assertCountEqual(self.hits('rust OR django'), [python.pk.hex, rust.pk.hex])
+        self.assertEqual(self.indexed_rows(), 2)
+
+    def test_deleted_analyses_leave_the_index(self):
+        analysis = self.store('Kotlin developer')
+        analysis.cv_upload.delete()
+        self.assertEqual(self.hits('kotlin'), [])
+        self.assertEqual(self.indexed_rows(), 0)
+
+    def test_rescored_analyses_are_indexed_once(self):
+        analysis = self.store('Java developer')
+        scorer = ATSScorer('Scala developer')
+        apply_analysis(
+            analysis, 'Scala developer', scorer.calculate_overall_score(),
+            ATSScorer.feature_fields(scorer.document)
+        )
+        self.assertEqual(self.hits('java'), [])
+        self.assertEqual(self.hits('scala'), [analysis.pk.hex])
+
+        ATSAnalysis.objects.filter(pk=analysis.pk).update(scorer_version='')
+        call_command('rescore', '--workers', '0', stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(self.hits('scala'), [analysis.pk.hex])
+        self.assertEqual(self.indexed_rows(), 1)
+
+
+class AnalysisJobTests(TestCase):
+    """Queued analyses finish or fail exactly once, by the worker holding the claim"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        cv_upload = CVUpload(filename='cv.pdf', file_type='pdf')
+        cv_upload.file.save('cv.pdf', SimpleUploadedFile('cv.pdf', b'%PDF'), save=False)
+        self.analysis = enqueue_analysis(cv_upload)
+        parsed = mock.patch('api.jobs.parse_upload', return_value=mock.Mock(text='python developer'))
+        parsed.start()
+        self.addCleanup(parsed.stop)
+
+    def test_completes_a_claimed_job(self):
+        process_job(claim_next_job('a'))
+        job = AnalysisJob.objects.get(analysis=self.analysis)
+        self.assertEqual((job.status, job.attempts), (ATSAnalysis.STATUS_DONE, 1))
+        self.assertEqual(ATSAnalysis.objects.get(pk=self.analysis.pk).status, ATSAnalysis.STATUS_DONE)
+
+    def test_storage_error_fails_the_job(self):
+        with mock.patch('api.jobs.apply_analysis', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('api.jobs', 'ERROR'):
+            process_job(claim_next_job('a'))
+        job = AnalysisJob.objects.get(analysis=self.analysis)
+        self.assertEqual((job.status, job.attempts), (ATSAnalysis.STATUS_FAILED, 1))
+        self.assertIsNotNone(job.finished_at)
+        analysis = ATSAnalysis.objects.get(pk=self.analysis.pk)
+        self.assertEqual(analysis.status, ATSAnalysis.STATUS_FAILED)
+        self.assertEqual(analysis.error_message, 'Error storing results: disk full')
+
+    def test_requeued_job_is_not_finished_by_its_stale_worker(self):
+        stale = claim_next_job('a')
+        AnalysisJob.objects.filter(pk=stale.pk).update(claimed_at=timezone.now() - timedelta(days=1))
+        stale.refresh_from_db()
+        with override_settings(CV_JOB_MAX_ATTEMPTS=3):
+            self.assertEqual(requeue_stale_jobs(), 1)
+        current = claim_next_job('b')
+
+        with self.assertLogs('api.jobs', 'WARNING') as logs:
+            process_job(stale)
+        self.assertIn('was requeued', logs.output[0])
+        job = AnalysisJob.objects.get(pk=stale.pk)
+        self.assertEqual((job.status, job.worker, job.attempts), (ATSAnalysis.STATUS_RUNNING, 'b', 2))
+        self.assertEqual(ATSAnalysis.objects.get(pk=self.analysis.pk).status, ATSAnalysis.STATUS_RUNNING)
+
+        with mock.patch('api.jobs.apply_analysis', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('api.jobs', 'WARNING'):
+            process_job(stale)
+        self.assertEqual(AnalysisJob.objects.get(pk=stale.pk).status, ATSAnalysis.STATUS_RUNNING)
+
+        process_job(current)
+        self.assertEqual(AnalysisJob.objects.get(pk=stale.pk).status, ATSAnalysis.STATUS_DONE)
+
+
+class RescoreTests(TestCase):
+    """rescore repairs analyses stored without features or full text"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def legacy_analysis(self, data=None, extracted_text=''):
+        cv_upload = CVUpload(filename='cv.pdf', file_type='pdf')
+        if data is not None:
+            cv_upload.file.save('cv.pdf', SimpleUploadedFile('cv.pdf', data), save=False)
+        cv_upload.save()
+        return ATSAnalysis.objects.create(
+            cv_upload=cv_upload, extracted_text=extracted_text, scorer_version=''
+        )
+
+    def rescore(self):
+        out = io.StringIO()
+        call_command('rescore', '--workers', '0', stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_legacy_rows_are_rescored_once(self):
+        data = _pdf_bytes()
+        from_file = self.legacy_analysis(data=data)
+        from_prefix = self.legacy_analysis(extracted_text='python developer, led a team of 5')
+        self.assertIn('2 re-scored, 0 skipped', self.rescore())
+
+        version = ATSScorer.scorer_version()
+        text = CVParser.extract(io.BytesIO(data), 'pdf').text
+        from_file.refresh_from_db()
+        self.assertEqual(from_file.scorer_version, version)
+        self.assertEqual(from_file.overall_score, ATSScorer(text).calculate_overall_score()['overall_score'])
+        self.assertEqual(from_file.full_text.get_text(), text)
+        word = re.search(r'[A-Za-z]{4,}', text).group(0)
+        self.assertIn(from_file.pk.hex, [analysis_id for analysis_id, _, _ in search_texts(word)[1]])
+        from_prefix.refresh_from_db()
+        self.assertEqual(from_prefix.scorer_version, version)
+
+        self.assertIn('Re-scoring 0 analyses', self.rescore())
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages walk the ordering without gaps or repeats"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for i in range(25):
+            cv_upload = CVUpload.objects.create(filename=f'cv{i}.pdf', file_type='pdf')
+            ATSAnalysis.objects.create(
+                cv_upload=cv_upload,
+                overall_score=i % 4 * 10,  # ties on score and, below, on time
+                analyzed_at=now - timedelta(minutes=i // 3)
+            )
+
+    def walk(self, pagination, limit):
+        rows, cursor = pagination.paginate(ATSAnalysis.objects.all(), None, limit)
+        while cursor:
+            page, cursor = pagination.paginate(ATSAnalysis.objects.all(), cursor, limit)
+            rows += page
+        return rows
+
+    def test_pages_match_full_ordering(self):
+        for ordering in (('-analyzed_at', '-id'), ('-overall_score', '-analyzed_at', '-id')):
+            pagination = KeysetPagination('test', ordering)
+            expected = list(ATSAnalysis.objects.order_by(*ordering))
+            for limit in (1, 4, 25, 30):
+                with self.subTest(ordering=ordering, limit=limit):
+                    self.assertEqual(self.walk(pagination, limit), expected)
+
+    def test_list_endpoint_follows_next_cursor(self):
+        seen = []
+        params = {'order': 'score', 'limit': 7}
+        while True:
+            body = self.client.get('/api/analyses/', params).json()
+            seen += [row['id'] for row in body['results']]
+            if not body['next_cursor']:
+                break
+            params['cursor'] = body['next_cursor']
+        expected = ATSAnalysis.objects.order_by('-overall_score', '-analyzed_at', '-id')
+        self.assertEqual(seen, [str(analysis.id) for analysis in expected])
+
+    def test_malformed_cursor_returns_400(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        when = {'datetime': timezone.now().isoformat()}
+        pk = {'uuid': str(ATSAnalysis.objects.first().id)}
+        cursors = [
+            'not base64!',
+            encode(['score', 10, when, pk]),  # other ordering
+            encode(['recent', when]),
+            encode(['recent', 'yesterday', pk]),
+            encode(['recent', [1], pk]),
+            encode(['recent', when, 'abc']),
+            encode(['recent', when, None]),
+            encode(['recent', {'datetime': 'soon'}, pk]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/analyses/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+        with self.assertRaises(InvalidCursor):
+            KeysetPagination('score', ('-overall_score', '-id')).paginate(
+                ATSAnalysis.objects.all(), encode(['score', 'ten', pk])
+            )
+
+
+class AnalysisETagTests(TestCase):
+    """Finished analyses are revalidated with their ETag"""
+
+    def setUp(self):
+        ANALYSIS_CACHE.clear()
+        self.addCleanup(ANALYSIS_CACHE.clear)
+
+    def analysis(self, **fields):
+        cv_upload = CVUpload.objects.create(filename='cv.pdf', file_type='pdf')
+        return ATSAnalysis.objects.create(
+            cv_upload=cv_upload, scorer_version=ATSScorer.scorer_version(), **fields
+        )
+
+    def url(self, analysis):
+        return f'/api/analysis/{analysis.id}/'
+
+    def test_matching_etag_returns_304(self):
+        analysis = self.analysis()
+        response = self.client.get(self.url(analysis))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{analysis.id.hex}-{analysis.scorer_version}"')
+        self.assertIn('max-age', response['Cache-Control'])
+
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(header=header), self.assertNumQueries(0):
+                response = self.client.get(self.url(analysis), HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_stale_etag_returns_payload(self):
+        analysis = self.analysis()
+        response = self.client.get(self.url(analysis), HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], str(analysis.id))
+
+    def test_rows_on_older_scorer_version_are_cached(self):
+        analysis = self.analysis()
+        ATSAnalysis.objects.filter(id=analysis.id).update(scorer_version='old')
+        etag = self.client.get(self.url(analysis))['ETag']
+        self.assertEqual(etag, f'"{analysis.id.hex}-old"')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url(analysis), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_rescored_analysis_gets_new_etag_once_expired(self):
+        analysis = self.analysis()
+        etag = self.client.get(self.url(analysis))['ETag']
+        ATSAnalysis.objects.filter(id=analysis.id).update(scorer_version='next')
+        with mock.patch.object(ANALYSIS_CACHE, 'ttl', 0):
+            response = self.client.get(self.url(analysis), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{analysis.id.hex}-next"')
+
+    def test_unfinished_analysis_is_not_cached(self):
+        analysis = self.analysis(status=ATSAnalysis.STATUS_PENDING)
+        response = self.client.get(self.url(analysis), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertFalse(response.has_header('ETag'))
+
+
+class AdmissionTests(TestCase):
+    """Uploads beyond the parse slots and queue are refused with 503"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def controller(self, **kwargs):
+        options = {'limit': 1, 'queue_size': 0, 'timeout': 5, 'retry_after': 7, **kwargs}
+        return AdmissionController('test', **options)
+
+    def test_full_queue_raises_overloaded(self):
+        controller = self.controller()
+        with controller.slot():
+            with self.assertRaises(Overloaded) as raised:
+                with controller.slot():
+                    pass
+        self.assertEqual(raised.exception.retry_after, 7)
+        with controller.slot():  # the slot was released
+            pass
+
+    def test_queued_request_times_out(self):
+        controller = self.controller(queue_size=1, timeout=0.05)
+        with controller.slot():
+            started = time.monotonic()
+            with self.assertRaises(Overloaded):
+                with controller.slot():
+                    pass
+            self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual((controller._active, controller._queued), (0, 0))
+
+    def test_upload_is_refused_with_retry_after(self):
+        controller = self.controller()
+        upload = SimpleUploadedFile('cv.pdf', _pdf_bytes())
+        with mock.patch('api.views.PARSE_ADMISSION', controller), controller.slot():
+            response = self.client.post('/api/upload-cv/', {'file': upload})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertFalse(CVUpload.objects.exists())
+
+    def test_check_warns_when_uploads_can_take_every_thread(self):
+        with override_settings(CV_PARSE_CONCURRENCY=4, CV_PARSE_QUEUE_SIZE=8, CV_WEB_THREADS=16):
+            self.assertEqual(check_admission_threads(None), [])
+        with override_settings(CV_PARSE_CONCURRENCY=4, CV_PARSE_QUEUE_SIZE=8, CV_WEB_THREADS=12):
+            self.assertEqual([w.id for w in check_admission_threads(None)], ['api.W001'])
+
+    def test_check_warns_when_admitted_parses_can_wait_for_a_sandbox(self):
+        with override_settings(CV_PARSE_CONCURRENCY=4, CV_SANDBOX_WORKERS=2):
+            self.assertEqual([w.id for w in check_sandbox_workers(None)], ['api.W003'])
+            with override_settings(CV_PARSE_SANDBOX=False):
+                self.assertEqual(check_sandbox_workers(None), [])
+
+
+@override_settings(CV_PARSE_SANDBOX=False, CV_GROUP_COMMIT=False)
+class AsyncViewTests(TestCase):
+    """The ASGI upload and retrieval views answer like the sync ones"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        ANALYSIS_CACHE.clear()
+        self.addCleanup(ANALYSIS_CACHE.clear)
+        self.factory = AsyncRequestFactory()
+
+    async def upload(self, data=None, name='cv.pdf', query=''):
+        request = self.factory.post(
+            f'/api/upload-cv/{query}', {'file': SimpleUploadedFile(name, data or _pdf_bytes())}
+        )
+        response = await async_views.upload_and_analyze_cv(request)
+        return response, json.loads(response.content)
+
+    async def get(self, analysis_id, **headers):
+        request = self.factory.get(f'/api/analysis/{analysis_id}/', headers=headers)
+        return await async_views.get_analysis(request, analysis_id)
+
+    async def test_upload_creates_then_reuses_an_analysis(self):
+        response, created = await self.upload()
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('parse', response['Server-Timing'])
+        analysis = await ATSAnalysis.objects.aget(pk=created['id'])
+        self.assertEqual(analysis.status, ATSAnalysis.STATUS_DONE)
+        self.assertEqual(analysis.overall_score, created['overall_score'])
+        self.assertTrue(await ExtractedText.objects.filter(analysis=analysis).aexists())
+
+        response, cached = await self.upload(name='renamed.pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cached['id'], created['id'])
+
+    async def test_upload_can_be_queued(self):
+        response, queued = await self.upload(query='?async=true')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(queued['status'], ATSAnalysis.STATUS_PENDING)
+        self.assertTrue(await AnalysisJob.objects.filter(analysis_id=queued['id']).aexists())
+
+    async def test_rejected_uploads_create_no_rows(self):
+        response, body = await self.upload(data=b'plain text', name='cv.txt')
+        self.assertEqual(response.status_code, 400)
+
+        limit = ParseLimitExceeded('Document took longer than 20s to parse')
+        with mock.patch('api.async_views.parse_upload', side_effect=limit):
+            response, body = await self.upload()
+        self.assertEqual((response.status_code, body['error']), (422, str(limit)))
+
+        with mock.patch('api.async_views.PARSE_ADMISSION.reserve', side_effect=Overloaded('busy', retry_after=3)):
+            response, body = await self.upload()
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '3'))
+        self.assertFalse(await CVUpload.objects.aexists())
+
+    async def test_get_analysis_revalidates_with_etag(self):
+        _, created = await self.upload()
+        response = await self.get(created['id'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['id'], created['id'])
+        etag = response['ETag']
+
+        response = await self.get(created['id'], if_none_match=etag)
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+
+    async def test_get_analysis_of_pending_and_missing_analyses(self):
+        _, queued = await self.upload(query='?async=true')
+        response = await self.get(queued['id'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertFalse(response.has_header('ETag'))
+
+        response = await self.get('00000000-0000-0000-0000-000000000000')
+        self.assertEqual(response.status_code, 404)
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Each distinct file is stored once, under its SHA-256"""
+
+    def setUp(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        self.storage = ContentAddressedStorage(location=location.name)
+        self.data = random.Random(0).randbytes(3 * ContentAddressedStorage.CHUNK_SIZE + 1)
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.storage.location)
+            for directory, _, names in os.walk(self.storage.location) for name in names
+        )
+
+    def test_identical_content_is_stored_once(self):
+        upload = SimpleUploadedFile('cv.pdf', self.data)
+        name, content_hash = self.storage.store(upload, 'cv.pdf')
+        self.assertEqual(content_hash, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(name, f'cvs/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.pdf')
+        self.assertEqual(upload.read(), self.data)  # rewound for parsing
+
+        again, _ = self.storage.store(SimpleUploadedFile('renamed.PDF', self.data), 'renamed.PDF')
+        self.assertEqual(again, name)
+        self.assertEqual(self.stored_files(), [name])
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_different_content_gets_its_own_blob(self):
+        first, _ = self.storage.store(SimpleUploadedFile('a.pdf', self.data), 'a.pdf')
+        second, _ = self.storage.store(SimpleUploadedFile('b.pdf', self.data + b'!'), 'b.pdf')
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.stored_files(), sorted([first, second]))
+
+    def test_file_field_saves_are_deduplicated(self):
+        with override_settings(MEDIA_ROOT=self.storage.location):
+            uploads = []
+            for name in ('a.pdf', 'b.pdf'):
+                cv_upload = CVUpload(filename=name, file_type='pdf')
+                cv_upload.file.save(name, SimpleUploadedFile(name, self.data))
+                uploads.append(cv_upload)
+        self.assertEqual(uploads[0].file.name, uploads[1].file.name)
+        self.assertEqual(len(self.stored_files()), 1)
+
+
+class PurgeCVsTests(TestCase):
+    """purge_cvs applies the retention policy and sweeps orphaned files"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def upload(self, days_old=0, content_hash='', status=ATSAnalysis.STATUS_DONE, file=''):
+        cv_upload = CVUpload.objects.create(
+            filename='cv.pdf', file_type='pdf', content_hash=content_hash, file=file,
+            uploaded_at=timezone.now() - timedelta(days=days_old)
+        )
+        ATSAnalysis.objects.create(cv_upload=cv_upload, status=status)
+        return cv_upload
+
+    def blob(self, name, age):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'%PDF')
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def purge(self, *args):
+        call_command('purge_cvs', *args, '--pause', '0', '--vacuum', 'none', stdout=io.StringIO())
+
+    def remaining(self):
+        return set(CVUpload.objects.values_list('pk', flat=True))
+
+    def test_older_than_keeps_recent_and_active_uploads(self):
+        old = self.upload(days_old=400)
+        old_pending = self.upload(days_old=400, status=ATSAnalysis.STATUS_PENDING)
+        old_running = self.upload(days_old=400, status=ATSAnalysis.STATUS_RUNNING)
+        recent = self.upload(days_old=10)
+        self.purge('--older-than', '365', '--batch-size', '1', '--skip-orphans')
+        self.assertEqual(self.remaining(), {old_pending.pk, old_running.pk, recent.pk})
+        self.assertFalse(ATSAnalysis.objects.filter(cv_upload_id=old.pk).exists())
+
+    def test_keep_latest_keeps_newest_of_each_content(self):
+        same = [self.upload(days_old=days, content_hash='a' * 64) for days in (1, 2, 3, 4)]
+        active = self.upload(days_old=5, content_hash='a' * 64, status=ATSAnalysis.STATUS_PENDING)
+        other = self.upload(days_old=9, content_hash='b' * 64)
+        self.purge('--older-than', '0', '--keep-latest', '2', '--skip-orphans')
+        self.assertEqual(self.remaining(), {same[0].pk, same[1].pk, active.pk, other.pk})
+
+    def test_orphan_sweep_respects_grace_period(self):
+        referenced = self.blob('cvs/aa/bb/referenced.pdf', age=7200)
+        orphan = self.blob('cvs/cc/dd/orphan.pdf', age=7200)
+        fresh = self.blob('cvs/ee/ff/fresh.pdf', age=60)  # its row may not be saved yet
+        self.upload(file='cvs/aa/bb/referenced.pdf')
+        self.purge('--older-than', '0', '--keep-latest', '0')
+        self.assertTrue(os.path.exists(referenced))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(fresh))
+
+    def test_dry_run_deletes_nothing(self):
+        uploads = {self.upload(days_old=400, content_hash='a' * 64).pk for _ in range(3)}
+        orphan = self.blob('cvs/cc/dd/orphan.pdf', age=7200)
+        self.purge('--older-than', '365', '--keep-latest', '1', '--dry-run')
+        self.assertEqual(self.remaining(), uploads)
+        self.assertTrue(os.path.exists(orphan))
+
+
+class GroupCommitTests(TestCase):
+    """Group commit is only used where requests can share a batch"""
+
+    def test_threaded_server_writes_through_writer(self):
+        committed = Future()
+        committed.set_result(3)
+        with override_settings(CV_GROUP_COMMIT=True, CV_WEB_THREADS=16), \
+                mock.patch.object(GROUP_WRITER, 'submit', return_value=committed) as submit:
+            self.assertEqual(commit(sum, [1, 2]), 3)
+        submit.assert_called_once_with(sum, [1, 2])
+
+    def test_sync_workers_write_directly(self):
+        with override_settings(CV_GROUP_COMMIT=True, CV_WEB_THREADS=1), \
+                mock.patch.object(GROUP_WRITER, 'submit') as submit:
+            self.assertEqual(commit(sum, [1, 2]), 3)
+            self.assertEqual([w.id for w in check_group_commit_threads(None)], ['api.W002'])
+        submit.assert_not_called()
+        with override_settings(CV_GROUP_COMMIT=True, CV_WEB_THREADS=1, CV_ASYNC_VIEWS=True):
+            self.assertEqual(check_group_commit_threads(None), [])
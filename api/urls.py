@@ -1,8 +1,19 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# Under ASGI, uploads and reads can be served without holding a thread each
+upload_view = async_views.upload_and_analyze_cv if settings.CV_ASYNC_VIEWS else views.upload_and_analyze_cv
+analysis_view = async_views.get_analysis if settings.CV_ASYNC_VIEWS else views.get_analysis
 
 urlpatterns = [
-    path('upload-cv/', views.upload_and_analyze_cv, name='upload-cv'),
-    path('analysis/<uuid:analysis_id>/', views.get_analysis, name='get-analysis'),
+    path('upload-cv/', upload_view, name='upload-cv'),
+    path('upload-cv/batch/', views.upload_batch, name='upload-cv-batch'),
+    path('match-jd/', views.match_job_description, name='match-jd'),
+    path('rank/', views.rank_cvs, name='rank-cvs'),
+    path('search/', views.search_cvs, name='search-cvs'),
+    path('analyses/', views.list_analyses, name='list-analyses'),
+    path('analysis/<uuid:analysis_id>/', analysis_view, name='get-analysis'),
     path('health/', views.health_check, name='health-check'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
@@ -1,13 +1,39 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, parser_classes
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
-from django.core.files.uploadedfile import UploadedFile
-from .models import CVUpload, ATSAnalysis
-from .serializers import ATSAnalysisSerializer
-from .cv_parser import CVParser
+from django.conf import settings
+from django.http import HttpResponse
+from django.db import transaction
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+from django.utils import timezone
+from .models import CVUpload, ATSAnalysis, ExtractedText, CVFeatures
+from .serializers import ATSAnalysisSerializer, ATSAnalysisListSerializer
 from .ats_scorer import ATSScorer
+from .services import (
+    compute_content_hash, store_upload, find_cached_analysis, find_cached_analyses,
+    find_stored_text, build_analysis, build_analysis_inputs, create_analysis, parse_upload,
+)
+from .jd_matcher import JDMatcher, CORPUS_IDF
+from .corpus_index import get_corpus_index
+from .search import SearchQueryError, search_available, index_texts, search as search_texts
+from .parse_sandbox import ParseLimitExceeded, get_batch_sandbox, analyze_documents
+from .pagination import KeysetPagination, InvalidCursor
+from .admission import PARSE_ADMISSION, Overloaded
+from .group_commit import commit
+from .analysis_cache import ANALYSIS_CACHE
+from .metrics import (
+    StageTimer, render_metrics,
+    UPLOADS, UPLOAD_ERRORS, CACHE_HITS, PARSE_PEAK_MEMORY, ANALYSIS_READS,
+)
+from .jobs import enqueue_analysis
+import logging
 import os
+import uuid
+
+logger = logging.getLogger(__name__)
 
 
 @api_view(['POST'])
@@ -17,69 +43,309 @@ def upload_and_analyze_cv(request):
     API endpoint to upload CV and get ATS analysis
     
     POST /api/upload-cv/
+    
+    With `async=true` (or CV_ANALYSIS_ASYNC enabled) the analysis is queued
+    and 202 is returned with the pending analysis id; poll
+    GET /api/analysis/<id>/ until its status is `done` or `failed`.
     """
+    timer = StageTimer()
+    
     if 'file' not in request.FILES:
-        return Response(
+        UPLOAD_ERRORS.inc('invalid')
+        return timer.apply(Response(
             {'error': 'No file provided'},
             status=status.HTTP_400_BAD_REQUEST
-        )
+        ))
     
     uploaded_file = request.FILES['file']
-    
-    # Validate file type
     filename = uploaded_file.name
     file_extension = os.path.splitext(filename)[1].lower()
     
-    if file_extension not in ['.pdf', '.docx', '.doc']:
-        return Response(
-            {'error': 'Invalid file type. Please upload PDF or DOCX file.'},
+    validation_error = _validate_upload(uploaded_file)
+    if validation_error:
+        UPLOAD_ERRORS.inc('invalid')
+        return timer.apply(Response(
+            {'error': validation_error},
             status=status.HTTP_400_BAD_REQUEST
-        )
+        ))
     
-    # Validate file size (5MB limit)
-    if uploaded_file.size > 5 * 1024 * 1024:
-        return Response(
-            {'error': 'File size exceeds 5MB limit'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    UPLOADS.inc(file_extension[1:])
     
     try:
-        # Save CV upload
-        cv_upload = CVUpload.objects.create(
-            file=uploaded_file,
+        # Store the file (once per distinct content), hashing it on the way
+        with timer.stage('store'):
+            stored_name, content_hash = store_upload(uploaded_file)
+        
+        # Identical content already scored by this scorer version
+        with timer.stage('cache_lookup'):
+            cached_analysis = find_cached_analysis(content_hash)
+        if cached_analysis is not None:
+            CACHE_HITS.inc()
+            with timer.stage('serialize'):
+                data = ATSAnalysisSerializer(cached_analysis).data
+            return timer.apply(Response(data, status=status.HTTP_200_OK))
+        
+        # Saved together with its analysis, in one transaction
+        cv_upload = CVUpload(
+            file=stored_name,
             filename=filename,
-            file_type=file_extension[1:]  # Remove the dot
+            file_type=file_extension[1:],  # Remove the dot
+            content_hash=content_hash
         )
         
-        # Parse CV
-        file_type = file_extension[1:]  # Remove dot from extension
-        cv_upload.file.seek(0)  # Reset file pointer
-        extracted_text = CVParser.parse_cv(cv_upload.file, file_type)
+        if _wants_async(request):
+            with timer.stage('enqueue'):
+                analysis = commit(enqueue_analysis, cv_upload)
+            return timer.apply(Response(
+                {'id': analysis.id, 'status': analysis.status},
+                status=status.HTTP_202_ACCEPTED
+            ))
         
-        # Score CV
-        scorer = ATSScorer(extracted_text)
-        analysis_results = scorer.calculate_overall_score()
+        # Wait for a parse slot before any row is written, so a shed request leaves none
+        with PARSE_ADMISSION.slot():
+            # Parse CV from the uploaded buffer, not the stored copy
+            file_type = file_extension[1:]  # Remove dot from extension
+            with timer.stage('parse'):
+                parse_result = parse_upload(uploaded_file, file_type)
+            extracted_text = parse_result.text
+            if parse_result.peak_memory is not None:
+                PARSE_PEAK_MEMORY.observe(parse_result.peak_memory)
+            logger.info(
+                "Parsed %s: %s pages, %d chars, truncated=%s, peak memory %s bytes",
+                filename, parse_result.pages, len(extracted_text),
+                parse_result.truncated, parse_result.peak_memory
+            )
+            
+            # Score CV
+            with timer.stage('score_init'):
+                scorer = ATSScorer(extracted_text)
+            analysis_results = scorer.calculate_overall_score(timer=timer)
         
-        # Create analysis record
-        analysis = ATSAnalysis.objects.create(
-            cv_upload=cv_upload,
-            overall_score=analysis_results['overall_score'],
-            keyword_score=analysis_results['category_scores']['keyword_score'],
-            formatting_score=analysis_results['category_scores']['formatting_score'],
-            experience_score=analysis_results['category_scores']['experience_score'],
-            education_score=analysis_results['category_scores']['education_score'],
-            skills_score=analysis_results['category_scores']['skills_score'],
-            contact_score=analysis_results['category_scores']['contact_score'],
-            extracted_text=extracted_text[:5000],  # Store first 5000 chars
-            strengths=analysis_results['strengths'],
-            improvements=analysis_results['improvements'],
-            missing_elements=analysis_results['missing_elements']
-        )
+        # Create upload and analysis records (group-committed if enabled)
+        with timer.stage('save_analysis'):
+            analysis = commit(
+                create_analysis, cv_upload, extracted_text, analysis_results,
+                ATSScorer.feature_fields(scorer.document)
+            )
         
         # Serialize and return
-        serializer = ATSAnalysisSerializer(analysis)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        with timer.stage('serialize'):
+            data = ATSAnalysisSerializer(analysis).data
+        return timer.apply(Response(data, status=status.HTTP_201_CREATED))
         
+    except Overloaded as e:
+        UPLOAD_ERRORS.inc('overloaded')
+        return timer.apply(_overloaded(e))
+    except ParseLimitExceeded as e:
+        UPLOAD_ERRORS.inc('parse_limit')
+        return timer.apply(Response(
+            {'error': str(e)},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        ))
+    except ValueError as e:
+        UPLOAD_ERRORS.inc('invalid')
+        return timer.apply(Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        ))
+    except Exception as e:
+        UPLOAD_ERRORS.inc('internal')
+        return timer.apply(Response(
+            {'error': f'Error processing CV: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        ))
+
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser, FormParser])
+def upload_batch(request):
+    """
+    API endpoint to upload many CVs in one request
+    
+    POST /api/upload-cv/batch/  (multipart, repeated `files` field)
+    
+    Parsing and scoring fan out across the batch sandbox processes and
+    the rows are inserted with bulk_create. Returns one result per file,
+    in upload order, with status `created`, `cached` or `error`; errors
+    carry the status code the file would get on its own (400, 422, 500
+    or 503).
+    """
+    uploaded_files = request.FILES.getlist('files')
+    if not uploaded_files:
+        return Response(
+            {'error': 'No files provided'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(uploaded_files) > settings.CV_BATCH_MAX_FILES:
+        return Response(
+            {'error': f'A batch may contain at most {settings.CV_BATCH_MAX_FILES} files'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    results = [{'filename': uploaded_file.name} for uploaded_file in uploaded_files]
+    
+    # Validate and store every file
+    accepted = []
+    for index, uploaded_file in enumerate(uploaded_files):
+        validation_error = _validate_upload(uploaded_file)
+        if validation_error:
+            UPLOAD_ERRORS.inc('invalid')
+            results[index].update(
+                status='error', error=validation_error, status_code=status.HTTP_400_BAD_REQUEST
+            )
+        else:
+            UPLOADS.inc(_file_type(uploaded_file))
+            accepted.append((index, uploaded_file, *store_upload(uploaded_file)))
+    
+    cached = find_cached_analyses([content_hash for _, _, _, content_hash in accepted])
+    
+    # Analyze each distinct uncached document once
+    pending = {}
+    for index, uploaded_file, stored_name, content_hash in accepted:
+        if content_hash in cached:
+            CACHE_HITS.inc()
+            results[index].update(
+                status='cached',
+                analysis=ATSAnalysisSerializer(cached[content_hash]).data
+            )
+        else:
+            pending.setdefault(content_hash, []).append((index, uploaded_file, stored_name))
+    
+    # Files are read one by one as sandbox processes become free
+    documents = [
+        (entries[0][1], _file_type(entries[0][1])) for entries in pending.values()
+    ]
+    # The whole batch takes one parse slot; the sandbox bounds its fan-out
+    outcomes = []
+    if documents:
+        try:
+            with PARSE_ADMISSION.slot():
+                outcomes = analyze_documents(get_batch_sandbox(), documents)
+        except Overloaded as e:
+            UPLOAD_ERRORS.inc('overloaded', amount=len(documents))
+            return _overloaded(e)
+    
+    uploads = []
+    analyses = []
+    analysis_inputs = []
+    search_documents = []
+    created_indexes = []
+    for (content_hash, entries), outcome in zip(pending.items(), outcomes):
+        if isinstance(outcome, Exception):
+            reason, status_code, message = _batch_error(outcome)
+            UPLOAD_ERRORS.inc(reason, amount=len(entries))
+            for index, _, _ in entries:
+                results[index].update(status='error', error=message, status_code=status_code)
+            continue
+        
+        extracted_text, analysis_results, feature_fields = outcome
+        for index, uploaded_file, stored_name in entries:
+            cv_upload = CVUpload(
+                file=stored_name,
+                filename=uploaded_file.name,
+                file_type=_file_type(uploaded_file),
+                content_hash=content_hash
+            )
+            analysis = build_analysis(cv_upload, extracted_text, analysis_results)
+            uploads.append(cv_upload)
+            analyses.append(analysis)
+            analysis_inputs.append(build_analysis_inputs(analysis, extracted_text, feature_fields))
+            search_documents.append((analysis, extracted_text))
+            created_indexes.append(index)
+    
+    try:
+        with transaction.atomic():
+            CVUpload.objects.bulk_create(uploads)
+            ATSAnalysis.objects.bulk_create(analyses)
+            ExtractedText.objects.bulk_create([text for text, _ in analysis_inputs])
+            CVFeatures.objects.bulk_create([features for _, features in analysis_inputs])
+            index_texts(search_documents)
+    except Exception as e:
+        return Response(
+            {'error': f'Error saving batch: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    for index, analysis in zip(created_indexes, analyses):
+        results[index].update(status='created', analysis=ATSAnalysisSerializer(analysis).data)
+    
+    return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser, FormParser, JSONParser])
+def match_job_description(request):
+    """
+    API endpoint to match a CV against a job description
+    
+    POST /api/match-jd/
+    
+    Takes `job_description` plus either `analysis_id` of a stored analysis
+    or a CV `file`. Stored extracted text is reused (an uploaded file whose
+    content was analyzed before is not parsed again); new files are parsed
+    but not saved.
+    """
+    job_description = request.data.get('job_description', '')
+    if not isinstance(job_description, str) or not job_description.strip():
+        return Response(
+            {'error': 'No job description provided'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(job_description) > settings.CV_JD_MAX_CHARS:
+        return Response(
+            {'error': f'Job description exceeds {settings.CV_JD_MAX_CHARS} characters'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    analysis = None
+    try:
+        if request.data.get('analysis_id'):
+            try:
+                analysis = ATSAnalysis.objects.get(id=request.data['analysis_id'])
+            except (ATSAnalysis.DoesNotExist, DjangoValidationError):
+                return Response(
+                    {'error': 'Analysis not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            cv_text = analysis.get_full_text()
+            if cv_text is None:
+                return Response(
+                    {'error': 'Analysis has no stored text'},
+                    status=status.HTTP_409_CONFLICT
+                )
+        elif 'file' in request.FILES:
+            uploaded_file = request.FILES['file']
+            validation_error = _validate_upload(uploaded_file)
+            if validation_error:
+                return Response(
+                    {'error': validation_error},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            analysis, cv_text = find_stored_text(compute_content_hash(uploaded_file))
+            if cv_text is None:
+                with PARSE_ADMISSION.slot():
+                    cv_text = parse_upload(uploaded_file, _file_type(uploaded_file)).text
+        else:
+            return Response(
+                {'error': 'Provide an analysis_id or a CV file'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        idf, idf_documents = CORPUS_IDF.get()
+        result = JDMatcher(job_description, idf).match(cv_text)
+        result.update(
+            analysis_id=analysis.id if analysis is not None else None,
+            idf_documents=idf_documents,
+        )
+        return Response(result, status=status.HTTP_200_OK)
+        
+    except Overloaded as e:
+        return _overloaded(e)
+    except ParseLimitExceeded as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
     except ValueError as e:
         return Response(
             {'error': str(e)},
@@ -87,27 +353,376 @@ def upload_and_analyze_cv(request):
         )
     except Exception as e:
         return Response(
-            {'error': f'Error processing CV: {str(e)}'},
+            {'error': f'Error matching CV: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+@api_view(['POST'])
+@parser_classes([JSONParser, FormParser])
+def rank_cvs(request):
+    """
+    API endpoint to rank every stored CV against a job description
+    
+    POST /api/rank/
+    
+    Takes `job_description` and optionally `limit` (default 50),
+    `min_score` / `max_score` (overall score) and `analyzed_after` /
+    `analyzed_before` (ISO 8601). Uses the corpus index, which the
+    analysis workers keep up to date (see api/corpus_index.py).
+    """
+    job_description = request.data.get('job_description', '')
+    if not isinstance(job_description, str) or not job_description.strip():
+        return Response(
+            {'error': 'No job description provided'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(job_description) > settings.CV_JD_MAX_CHARS:
+        return Response(
+            {'error': f'Job description exceeds {settings.CV_JD_MAX_CHARS} characters'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        limit = int(request.data.get('limit', 50))
+        min_score = _optional_int(request.data.get('min_score'))
+        max_score = _optional_int(request.data.get('max_score'))
+        analyzed_after = _optional_datetime(request.data.get('analyzed_after'))
+        analyzed_before = _optional_datetime(request.data.get('analyzed_before'))
+    except (TypeError, ValueError) as e:
+        return Response(
+            {'error': f'Invalid filter: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not 1 <= limit <= settings.CV_RANK_MAX_RESULTS:
+        return Response(
+            {'error': f'limit must be between 1 and {settings.CV_RANK_MAX_RESULTS}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        ranked, indexed = get_corpus_index().rank(
+            job_description, limit=limit,
+            min_score=min_score, max_score=max_score,
+            analyzed_after=analyzed_after, analyzed_before=analyzed_before,
+        )
+    except Exception as e:
+        logger.exception("Ranking failed")
+        return Response(
+            {'error': f'Error ranking CVs: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    return Response({
+        'indexed': indexed,
+        'results': [
+            {
+                'analysis_id': analysis.id,
+                'filename': analysis.cv_upload.filename,
+                'overall_score': analysis.overall_score,
+                'analyzed_at': analysis.analyzed_at,
+                'similarity': round(similarity, 4),
+            }
+            for analysis, similarity in ranked
+        ],
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def search_cvs(request):
+    """
+    API endpoint for full-text search over analyzed CVs
+    
+    GET /api/search/?q=<query>&page=1&page_size=20
+    
+    `q` uses SQLite FTS5 syntax: words, "quoted phrases", AND / OR / NOT,
+    prefix* terms and parentheses. Results are ranked by BM25 and include
+    a snippet with matches wrapped in **.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response(
+            {'error': 'No search query provided'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        page = int(request.query_params.get('page', 1))
+        page_size = int(request.query_params.get('page_size', 20))
+    except ValueError:
+        return Response(
+            {'error': 'page and page_size must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if page < 1 or not 1 <= page_size <= settings.CV_SEARCH_MAX_PAGE_SIZE:
+        return Response(
+            {'error': f'page must be at least 1 and page_size between 1 and {settings.CV_SEARCH_MAX_PAGE_SIZE}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not search_available():
+        return Response(
+            {'error': 'Full-text search requires the SQLite database'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    
+    try:
+        total, hits = search_texts(query, offset=(page - 1) * page_size, limit=page_size)
+    except SearchQueryError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    analyses = ATSAnalysis.objects.select_related('cv_upload').in_bulk(
+        [analysis_id for analysis_id, _, _ in hits]
+    )
+    results = []
+    for analysis_id, score, snippet in hits:
+        analysis = analyses.get(uuid.UUID(analysis_id))
+        if analysis is None:
+            continue
+        results.append({
+            'analysis_id': analysis.id,
+            'filename': analysis.cv_upload.filename,
+            'overall_score': analysis.overall_score,
+            'analyzed_at': analysis.analyzed_at,
+            'score': round(score, 4),
+            'snippet': snippet,
+        })
+    
+    return Response({
+        'query': query,
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+        'results': results,
+    }, status=status.HTTP_200_OK)
+
+
+def _optional_int(value):
+    """Parse an optional integer request parameter"""
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def _optional_datetime(value):
+    """Parse an optional ISO 8601 request parameter (naive values use the current time zone)"""
+    if value in (None, ''):
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"'{value}' is not an ISO 8601 datetime")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _overloaded(error):
+    """Return the 503 response for a request shed by admission control"""
+    return Response(
+        {'error': str(error)},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+def _batch_error(error):
+    """Return (metrics reason, status code, message) for a failed batch document"""
+    if isinstance(error, ParseLimitExceeded):
+        return 'parse_limit', status.HTTP_422_UNPROCESSABLE_ENTITY, str(error)
+    if isinstance(error, Overloaded):
+        return 'overloaded', status.HTTP_503_SERVICE_UNAVAILABLE, str(error)
+    if isinstance(error, ValueError):
+        return 'invalid', status.HTTP_400_BAD_REQUEST, str(error)
+    return (
+        'internal', status.HTTP_500_INTERNAL_SERVER_ERROR,
+        f'Error processing CV: {str(error) or type(error).__name__}'
+    )
+
+
+def _validate_upload(uploaded_file):
+    """Return an error message if the upload is not an acceptable CV, else None"""
+    # Validate file type
+    file_extension = os.path.splitext(uploaded_file.name)[1].lower()
+    if file_extension not in ['.pdf', '.docx', '.doc']:
+        return 'Invalid file type. Please upload PDF or DOCX file.'
+    
+    # Validate file size (5MB limit)
+    if uploaded_file.size > 5 * 1024 * 1024:
+        return 'File size exceeds 5MB limit'
+    
+    return None
+
+
+def _file_type(uploaded_file):
+    """Return the file type of an upload from its extension, without the dot"""
+    return os.path.splitext(uploaded_file.name)[1].lower()[1:]
+
+
+def _wants_async(request):
+    """
+    Return True if the upload should be queued instead of analyzed inline
+
+    Takes a DRF request or, from the async views, a plain Django request
+    """
+    params = getattr(request, 'query_params', request.GET)
+    data = getattr(request, 'data', request.POST)
+    requested = params.get('async', data.get('async'))
+    if requested is None:
+        return settings.CV_ANALYSIS_ASYNC
+    return str(requested).lower() in ('1', 'true', 'yes')
+
+
+# Orderings of the analysis listing; each matches an ATSAnalysis index
+LIST_ORDERINGS = {
+    'recent': KeysetPagination('recent', ('-analyzed_at', '-id')),
+    'score': KeysetPagination('score', ('-overall_score', '-analyzed_at', '-id')),
+}
+
+
+@api_view(['GET'])
+def list_analyses(request):
+    """
+    API endpoint to list analyses
+    
+    GET /api/analyses/?order=recent&limit=20&cursor=<next_cursor>
+    
+    Filters: `status` (default done), `min_score` / `max_score` (overall
+    score), `score_category`, `file_type` and `analyzed_after` /
+    `analyzed_before` (ISO 8601). `order` is `recent` (newest first) or
+    `score` (best first). Pages are keyset-paginated: pass the returned
+    `next_cursor` to get the next page; it is null on the last page.
+    """
+    params = request.query_params
+    pagination = LIST_ORDERINGS.get(params.get('order', 'recent'))
+    if pagination is None:
+        return Response(
+            {'error': f"order must be one of: {', '.join(LIST_ORDERINGS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    analysis_status = params.get('status', ATSAnalysis.STATUS_DONE)
+    if analysis_status not in dict(ATSAnalysis.STATUS_CHOICES):
+        return Response(
+            {'error': f"status must be one of: {', '.join(dict(ATSAnalysis.STATUS_CHOICES))}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        limit = int(params.get('limit', 20))
+        min_score = _optional_int(params.get('min_score'))
+        max_score = _optional_int(params.get('max_score'))
+        analyzed_after = _optional_datetime(params.get('analyzed_after'))
+        analyzed_before = _optional_datetime(params.get('analyzed_before'))
+    except (TypeError, ValueError) as e:
+        return Response(
+            {'error': f'Invalid filter: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not 1 <= limit <= settings.CV_LIST_MAX_PAGE_SIZE:
+        return Response(
+            {'error': f'limit must be between 1 and {settings.CV_LIST_MAX_PAGE_SIZE}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    analyses = (
+        ATSAnalysis.objects
+        .filter(status=analysis_status)
+        .select_related('cv_upload')
+        .defer('extracted_text', 'strengths', 'improvements', 'missing_elements', 'error_message')
+    )
+    if params.get('score_category'):
+        score_range = ATSAnalysis.score_range(params['score_category'])
+        if score_range is None:
+            return Response(
+                {'error': f"score_category must be one of: {', '.join(c for c, _ in ATSAnalysis.SCORE_CATEGORIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        analyses = analyses.filter(overall_score__gte=score_range[0])
+        if score_range[1] is not None:
+            analyses = analyses.filter(overall_score__lte=score_range[1])
+    if min_score is not None:
+        analyses = analyses.filter(overall_score__gte=min_score)
+    if max_score is not None:
+        analyses = analyses.filter(overall_score__lte=max_score)
+    if params.get('file_type'):
+        analyses = analyses.filter(cv_upload__file_type=params['file_type'].lower().lstrip('.'))
+    if analyzed_after is not None:
+        analyses = analyses.filter(analyzed_at__gte=analyzed_after)
+    if analyzed_before is not None:
+        analyses = analyses.filter(analyzed_at__lte=analyzed_before)
+    
+    try:
+        page, next_cursor = pagination.paginate(analyses, params.get('cursor'), limit)
+    except InvalidCursor as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response({
+        'results': ATSAnalysisListSerializer(page, many=True).data,
+        'next_cursor': next_cursor,
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 def get_analysis(request, analysis_id):
     """
     API endpoint to retrieve analysis results
     
     GET /api/analysis/<id>/
+    
+    Queued analyses report `status` pending, running, done or failed.
+    Finished analyses carry an ETag and a long Cache-Control max-age; a
+    request whose If-None-Match has the current ETag gets 304 Not Modified,
+    without a database read while the analysis is in the process's cache.
     """
+    known_etags = _known_etags(request)
+    cached = ANALYSIS_CACHE.get(analysis_id)
+    if cached is not None:
+        etag, payload = cached
+        if etag in known_etags or '*' in known_etags:
+            ANALYSIS_READS.inc('not_modified')
+            return _cacheable(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        ANALYSIS_READS.inc('cache')
+        return _cacheable(Response(payload, status=status.HTTP_200_OK), etag)
+    
     try:
-        analysis = ATSAnalysis.objects.get(id=analysis_id)
-        serializer = ATSAnalysisSerializer(analysis)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        analysis = ATSAnalysis.objects.select_related('cv_upload').get(id=analysis_id)
     except ATSAnalysis.DoesNotExist:
         return Response(
             {'error': 'Analysis not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+    ANALYSIS_READS.inc('database')
+    if analysis.status != ATSAnalysis.STATUS_DONE:
+        # Still changing: clients must poll
+        return Response(
+            ATSAnalysisSerializer(analysis).data,
+            status=status.HTTP_200_OK,
+            headers={'Cache-Control': 'no-cache'}
+        )
+    
+    payload = ATSAnalysisSerializer(analysis).data
+    etag = ANALYSIS_CACHE.put(analysis, payload)
+    if etag in known_etags or '*' in known_etags:
+        return _cacheable(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+    return _cacheable(Response(payload, status=status.HTTP_200_OK), etag)
+
+
+def _known_etags(request):
+    """Return the ETags of a request's If-None-Match header"""
+    # If-None-Match uses weak comparison: proxies may have marked the tag W/
+    return {
+        tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))
+    }
+
+
+def _cacheable(response, etag):
+    """Add the caching headers of a finished analysis to a response"""
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.CV_ANALYSIS_MAX_AGE}'
+    return response
 
 
 @api_view(['GET'])
@@ -118,3 +733,13 @@ def health_check(request):
     GET /api/health/
     """
     return Response({'status': 'ok'}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def metrics(request):
+    """
+    Prometheus metrics endpoint (text exposition format)
+    
+    GET /api/metrics/
+    """
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
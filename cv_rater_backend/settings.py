@@ -85,6 +85,36 @@ DATABASES = {
     }
 }
 
+# SQLite production profile, for several gunicorn workers sharing the file:
+# - WAL lets readers run alongside the single writer
+# - synchronous=NORMAL is safe with WAL (no corruption, at worst the last
+#   commits are lost on power failure)
+# - writers wait for the lock (busy timeout) instead of failing with
+#   "database is locked", and take it at BEGIN (IMMEDIATE) so a
+#   read-then-write transaction cannot deadlock on the lock upgrade
+# - connections persist across requests, so the pragmas run once each
+# - auto_vacuum only applies to a database that has no pages yet, and
+#   switching to WAL writes the first page, so it must come first (older
+#   databases need `purge_cvs --vacuum full`)
+if os.environ.get('CV_SQLITE_PRODUCTION', 'True') == 'True':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('CV_SQLITE_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': float(os.environ.get('CV_SQLITE_BUSY_TIMEOUT', '20')),  # seconds
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA auto_vacuum=INCREMENTAL;'
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-65536;'  # KiB, i.e. 64 MiB per connection
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA journal_size_limit=67108864;'
+            ),
+        },
+    })
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -138,6 +168,114 @@ CORS_ALLOWED_ORIGINS = [
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880
+DATA_UPLOAD_MAX_NUMBER_FILES = 500
+
+# CV parsing limits: stop extracting once either cap is reached
+CV_PARSE_MAX_PAGES = int(os.environ.get('CV_PARSE_MAX_PAGES', '50'))
+CV_PARSE_MAX_CHARS = int(os.environ.get('CV_PARSE_MAX_CHARS', '200000'))
+# 'stream' reads word/*.xml directly (tables, text boxes, headers, footers);
+# 'python-docx' uses the python-docx object model (body paragraphs only)
+CV_DOCX_EXTRACTOR = os.environ.get('CV_DOCX_EXTRACTOR', 'stream')
+# Trace allocations during each parse to report its own peak memory
+# (adds overhead; otherwise no peak memory is reported)
+CV_PARSE_TRACE_MEMORY = os.environ.get('CV_PARSE_TRACE_MEMORY', 'False') == 'True'
+
+# Page-parallel PDF extraction for long documents parsed in-process
+# (sandboxed parses always extract pages sequentially)
+CV_PDF_PARALLEL = os.environ.get('CV_PDF_PARALLEL', 'False') == 'True'
+CV_PDF_PARALLEL_MIN_PAGES = int(os.environ.get('CV_PDF_PARALLEL_MIN_PAGES', '20'))
+CV_PDF_PAGES_PER_TASK = 8
+
+# Parse sandbox: parse uploads in reusable child processes with a
+# per-document wall-clock timeout and an address space (RLIMIT_AS) cap
+# (the number of processes, CV_SANDBOX_WORKERS, follows the parse slots below)
+CV_PARSE_SANDBOX = os.environ.get('CV_PARSE_SANDBOX', 'True') == 'True'
+CV_SANDBOX_TIMEOUT = float(os.environ.get('CV_SANDBOX_TIMEOUT', '20'))  # seconds
+CV_SANDBOX_MEMORY_LIMIT = int(os.environ.get('CV_SANDBOX_MEMORY_LIMIT', str(512 * 1024 * 1024)))  # bytes
+
+# Skill taxonomy: scoring vocabularies and synonyms, reloaded when the file changes
+CV_TAXONOMY_PATH = os.environ.get('CV_TAXONOMY_PATH', str(BASE_DIR / 'api' / 'data' / 'taxonomy.json'))
+CV_TAXONOMY_CHECK_INTERVAL = 5.0  # seconds between mtime checks
+
+# Job description matching: IDF from the most recent stored CV texts
+CV_JD_MAX_CHARS = 20000
+CV_JD_IDF_SAMPLE = int(os.environ.get('CV_JD_IDF_SAMPLE', '2000'))
+CV_JD_IDF_MIN_DOCUMENTS = 20  # fewer stored texts: uniform term weights
+CV_JD_IDF_TTL = 600  # seconds
+
+# Corpus index for ranking stored CVs against a job description
+CV_CORPUS_INDEX_DIR = os.environ.get('CV_CORPUS_INDEX_DIR', str(BASE_DIR / 'corpus_index'))
+CV_CORPUS_INDEX_SEGMENT_SIZE = 10000  # texts per segment file
+CV_CORPUS_INDEX_MERGE_FACTOR = 8  # segments of one size tier merged together
+CV_CORPUS_INDEX_LAG = 300  # seconds of stored_at re-checked for late commits
+CV_CORPUS_INDEX_REFRESH_INTERVAL = 30  # seconds between catch-ups by an idle analysis worker
+CV_CORPUS_INDEX_REFRESH_LIMIT = 1000  # texts indexed per catch-up
+CV_RANK_MAX_RESULTS = 200
+
+# Full-text search (SQLite FTS5)
+CV_SEARCH_MAX_PAGE_SIZE = 100
+
+# Analysis listing (GET /api/analyses/)
+CV_LIST_MAX_PAGE_SIZE = 100
+
+# Reads of finished analyses (GET /api/analysis/<id>/)
+CV_ANALYSIS_CACHE_SIZE = int(os.environ.get('CV_ANALYSIS_CACHE_SIZE', '1024'))  # payloads kept per process
+CV_ANALYSIS_CACHE_TTL = 300  # seconds before a cached payload is re-read
+CV_ANALYSIS_MAX_AGE = int(os.environ.get('CV_ANALYSIS_MAX_AGE', '86400'))  # Cache-Control max-age
+
+# Threads per web server process (gunicorn --worker-class gthread
+# --threads, see Procfile). Slots are counted per process, so with sync
+# workers (one thread) no request ever waits for one.
+CV_WEB_THREADS = int(os.environ.get('WEB_THREADS', '16'))
+
+# Admission control for parsing and scoring (api/admission.py). The
+# defaults keep concurrency + queue size at three quarters of the
+# threads, so health checks and reads still get a thread when uploads
+# saturate the server.
+CV_PARSE_CONCURRENCY = int(os.environ.get('CV_PARSE_CONCURRENCY', max(CV_WEB_THREADS // 4, 1)))  # documents analyzed at once
+CV_PARSE_QUEUE_SIZE = int(os.environ.get('CV_PARSE_QUEUE_SIZE', CV_WEB_THREADS // 2))  # requests waiting for a slot
+CV_PARSE_QUEUE_TIMEOUT = float(os.environ.get('CV_PARSE_QUEUE_TIMEOUT', '10'))  # seconds a request may wait
+CV_PARSE_RETRY_AFTER = 5  # seconds, sent in Retry-After with 503
+# One sandbox process per slot: fewer would leave admitted requests waiting
+# for a process, unseen by the queue limit and timeout
+CV_SANDBOX_WORKERS = int(os.environ.get('CV_SANDBOX_WORKERS', CV_PARSE_CONCURRENCY))
+
+# Retention (manage.py purge_cvs)
+CV_RETENTION_DAYS = int(os.environ.get('CV_RETENTION_DAYS', '0'))  # delete older uploads; 0 keeps all
+CV_RETENTION_KEEP_PER_HASH = int(os.environ.get('CV_RETENTION_KEEP_PER_HASH', '0'))  # newest uploads kept per content; 0 keeps all
+CV_PURGE_BATCH_SIZE = 500  # uploads deleted per transaction
+CV_PURGE_PAUSE = 0.05  # seconds between batches, so uploads can take the write lock
+CV_PURGE_ORPHAN_GRACE = 3600  # seconds before an unreferenced file may be removed
+CV_PURGE_VACUUM_PAGES = 1000  # pages released per incremental vacuum step
+
+# Batch uploads (parsed and scored in sandbox processes, with the
+# CV_SANDBOX_MEMORY_LIMIT cap; a document over the timeout has its process killed)
+CV_BATCH_MAX_FILES = 500
+CV_BATCH_DOCUMENT_TIMEOUT = 60  # seconds per document
+CV_BATCH_WORKERS = int(os.environ.get('CV_BATCH_WORKERS', os.cpu_count() or 1))  # sandbox processes
+
+# Process pool for page-parallel PDF extraction and `manage.py rescore`
+CV_PROCESS_POOL_WORKERS = int(os.environ.get('CV_PROCESS_POOL_WORKERS', os.cpu_count() or 1))
+
+# Group commit: uploads hand their upload and analysis inserts to one
+# writer thread per process, which commits many requests in one transaction.
+# Needs a threaded server (WEB_THREADS > 1) or ASGI, else it is ignored.
+CV_GROUP_COMMIT = os.environ.get('CV_GROUP_COMMIT', 'False') == 'True'
+CV_GROUP_COMMIT_MAX_BATCH = 64  # writes per transaction
+CV_GROUP_COMMIT_MAX_DELAY = 0.002  # seconds the writer waits for more writes
+CV_GROUP_COMMIT_TIMEOUT = 30  # seconds a request waits for its commit
+
+# Analysis job queue
+# When enabled, uploads are queued and processed by `manage.py run_analysis_workers`
+CV_ANALYSIS_ASYNC = os.environ.get('CV_ANALYSIS_ASYNC', 'False') == 'True'
+CV_ANALYSIS_WORKERS = int(os.environ.get('CV_ANALYSIS_WORKERS', '2'))
+CV_JOB_POLL_INTERVAL = 1.0  # seconds
+CV_JOB_STALE_SECONDS = 300  # running jobs older than this are requeued
+CV_JOB_MAX_ATTEMPTS = 3
+
+# Serve upload and retrieval with the async views (api/async_views.py); for ASGI servers
+CV_ASYNC_VIEWS = os.environ.get('CV_ASYNC_VIEWS', 'False') == 'True'
+CV_ASYNC_ANALYSIS_WORKERS = int(os.environ.get('CV_ASYNC_ANALYSIS_WORKERS', os.cpu_count() or 1))  # documents analyzed at a time
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'